@@ -1,34 +1,102 @@
 
 import os
-import httpx
-import json
 import re
+import json
+import asyncio
+import time
 import numpy as np
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 from mcp_tools import MCPToolHub
+from http_pool import HTTPClientPool, default_pool
+from embedding_store import EmbeddingStore
+from retrieval_index import build_index, normalize_rows
+from guardrails import GuardrailEngine, StreamAuditor
+from response_cache import ResponseCache
+from generation_scheduler import GenerationScheduler, SchedulerOverloaded
+from audit_log import get_audit_log
 from sentence_transformers import SentenceTransformer
 
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+BIAS_BLOCK_MESSAGE = "[REDACTED] Output withheld due to potential Gender Bias violation (UNESCO GBV Protocol)."
+
 class AIRouter:
-    def __init__(self):
+    def __init__(self, http: Optional[HTTPClientPool] = None):
         self.local_url = os.getenv("OLLAMA_URL", "http://host.docker.internal:11434")
         self.default_model = os.getenv("LOCAL_MODEL", "YemenJPT")
-        self.mcp = MCPToolHub()
+        # Application-lifetime pooled clients (keep-alive, limits, retries)
+        self.http = http or default_pool()
+        self.mcp = MCPToolHub(http=self.http)
+        # Concurrency limit + priority queue in front of the model backend
+        self.scheduler = GenerationScheduler.from_env()
+        self.guardrails = GuardrailEngine(os.getenv("GUARDRAIL_RULES", os.path.join(DATA_DIR, "guardrail_rules.json")))
+        # Every prompt/response and guardrail decision goes to audit_logs (queued, written in bulk)
+        self.audit = get_audit_log()
         
         # Sovereign RAG Initialization
         try:
-            self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+            self.embedder = SentenceTransformer(EMBEDDING_MODEL)
         except:
             print("Warning: Embedding model not found, falling back to keyword search.")
             self.embedder = None
             
-        self.knowledge_base_path = "backend/data/knowledge_base.json"
+        self.knowledge_base_path = os.path.join(DATA_DIR, "knowledge_base.json")
         
         # Ensure data directory exists
-        os.makedirs("backend/data", exist_ok=True)
+        os.makedirs(DATA_DIR, exist_ok=True)
+        
+        # Memory-mapped embedding index shared by all workers (re-embeds only changed entries)
+        self.embedding_store = EmbeddingStore(
+            os.getenv("KB_INDEX_DIR", os.path.join(DATA_DIR, "kb_index")), EMBEDDING_MODEL
+        )
         
-        self.kb_data = self._load_knowledge_base()
-        self.kb_embeddings = self._build_kb_embeddings()
+        # Response cache (exact + semantic); cleared whenever the KB changes
+        self.cache = ResponseCache(
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+            max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_MB", "64")) * 1024 * 1024,
+            semantic_threshold=float(os.getenv("RESPONSE_CACHE_SEMANTIC_THRESHOLD", "0.97"))
+        )
+        self._kb_checked_at = 0.0
+        self._kb_refresh: Optional[asyncio.Task] = None
+        self._swap_kb_state(self._build_kb_state())
+
+    def _kb_file_mtime(self) -> Optional[float]:
+        return os.path.getmtime(self.knowledge_base_path) if os.path.exists(self.knowledge_base_path) else None
+
+    def _build_kb_state(self):
+        """Loads and embeds the KB without touching the live state (runs in a worker thread)."""
+        mtime = self._kb_file_mtime()
+        kb_data = self._load_knowledge_base()
+        kb_embeddings = self._build_kb_embeddings(kb_data)
+        return mtime, kb_data, kb_embeddings, build_index(kb_embeddings)
+
+    def _swap_kb_state(self, state):
+        # One synchronous step on the event loop: no request sees a mix of old and new
+        self._kb_mtime, self.kb_data, self.kb_embeddings, self.kb_index = state
+
+    def _refresh_knowledge_base(self, min_interval: float = 5.0):
+        """
+        Starts a background reload of the KB when the file has changed. Requests
+        keep using the current index until the new one is embedded; it is then
+        swapped in and cached answers are invalidated.
+        """
+        now = time.monotonic()
+        if now - self._kb_checked_at < min_interval or (self._kb_refresh and not self._kb_refresh.done()):
+            return
+        self._kb_checked_at = now
+        if self._kb_file_mtime() != self._kb_mtime:
+            self._kb_refresh = asyncio.create_task(self._reload_knowledge_base())
+
+    async def _reload_knowledge_base(self):
+        try:
+            state = await asyncio.to_thread(self._build_kb_state)
+        except Exception as e:
+            print(f"Error reloading KB: {e}")
+            return
+        self._swap_kb_state(state)
+        self.cache.clear()
 
     def _load_knowledge_base(self) -> List[Dict[str, Any]]:
         if os.path.exists(self.knowledge_base_path):
@@ -39,28 +107,37 @@ class AIRouter:
                 print(f"Error loading KB: {e}")
         return []
 
-    def _build_kb_embeddings(self):
-        if not self.kb_data or not self.embedder:
+    def _build_kb_embeddings(self, kb_data: List[Dict[str, Any]]):
+        if not kb_data or not self.embedder:
             return None
-        texts = [f"{item.get('title', '')}: {item.get('content', '')}" for item in self.kb_data]
-        return self.embedder.encode(texts, convert_to_tensor=False)
+        texts = [f"{item.get('title', '')}: {item.get('content', '')}" for item in kb_data]
+        try:
+            return self.embedding_store.sync(
+                texts, lambda batch: self.embedder.encode(batch, convert_to_tensor=False)
+            )
+        except Exception as e:
+            print(f"Warning: Embedding store unavailable, encoding in memory: {e}")
+            return normalize_rows(self.embedder.encode(texts, convert_to_tensor=False))
+
+    def _embed_query(self, query: str) -> Optional[np.ndarray]:
+        if not self.embedder:
+            return None
+        # KB rows are pre-normalised, so only the query needs normalising
+        return normalize_rows(self.embedder.encode([query], convert_to_tensor=False))[0]
 
-    def _retrieve_context(self, query: str, top_k: int = 3) -> str:
-        if self.kb_embeddings is None or not self.kb_data or not self.embedder:
+    def _retrieve_context(self, query: str, top_k: int = 3, query_embedding: Optional[np.ndarray] = None) -> str:
+        if self.kb_index is None or not self.kb_data or not self.embedder:
             matches = [f"{i['title']}: {i['content']}" for i in self.kb_data if any(w.lower() in i['content'].lower() for w in query.split())]
             return "\n\n".join(matches[:top_k])
         
-        query_embedding = self.embedder.encode([query], convert_to_tensor=False)[0]
-        
-        similarities = np.dot(self.kb_embeddings, query_embedding) / (
-            np.linalg.norm(self.kb_embeddings, axis=1) * np.linalg.norm(query_embedding) + 1e-9
-        )
+        if query_embedding is None:
+            query_embedding = self._embed_query(query)
         
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        top_indices, similarities = self.kb_index.search(query_embedding, top_k)
         
         context_chunks = []
-        for i in top_indices:
-            if similarities[i] > 0.25: # Context relevance threshold
+        for i, score in zip(top_indices, similarities):
+            if score > 0.25: # Context relevance threshold
                 item = self.kb_data[i]
                 context_chunks.append(f"[{item.get('title')}]\n{item.get('content')}")
         
@@ -72,46 +149,27 @@ class AIRouter:
         """
         Guardrails Router:
         Enforces Ethical Constitution (Anti-GBV, Election Integrity, etc.)
+        Rule sets live in guardrail_rules.json and are matched in one pass per category.
         """
-        prompt_lower = prompt.lower()
-        response_lower = response.lower()
+        hits = self.guardrails.classify(prompt)
         
         # 1. Block Toxic Content / Deepfakes / GBV
-        prohibited_patterns = [
-            r"deepfake", r"fake video", r"voice clone", r"تزييف", r"فبركة",
-            r"kill", r"murder", r"hate speech", r"تحريض", r"عنف",
-            r"hack", r"bypass", r"exploit",
-            r"violence against women", r"gender bias", r"عنف ضد المرأة"
-        ]
-        
-        for pattern in prohibited_patterns:
-            if re.search(pattern, prompt_lower):
-                return {
-                    "allowed": False,
-                    "reason": "POLICY_VIOLATION",
-                    "category": "Toxic/Deepfake/GBV",
-                    "message": f"🚫 Policy Violation: Request blocked due to detection of restricted content ({pattern})."
-                }
+        if "prohibited" in hits:
+            return {
+                "allowed": False,
+                "reason": "POLICY_VIOLATION",
+                "category": self.guardrails.labels["prohibited"],
+                "message": f"🚫 Policy Violation: Request blocked due to detection of restricted content ({hits['prohibited'][0]})."
+            }
 
         # 2. Output Audit (If response is provided)
         if response:
-            bias_markers = ["men are superior", "women cannot", "weak gender"]
-            if any(m in response_lower for m in bias_markers):
-                return {
-                    "allowed": False,
-                    "reason": "OUTPUT_BIAS",
-                    "category": "Gender Bias",
-                    "message": "[REDACTED] Output withheld due to potential Gender Bias violation (UNESCO GBV Protocol)."
-                }
+            output_check = self.check_output(response)
+            if not output_check["allowed"]:
+                return output_check
 
         # 3. Detect Sensitive Topics (Elections, Politics)
-        sensitive_topics = [
-            "election", "vote", "ballot", "انتخابات", "تصويت",
-            "politician", "minister", "government", "حكومة", "وزير",
-            "scandal", "corruption", "فساد"
-        ]
-        
-        is_sensitive = any(topic in prompt_lower for topic in sensitive_topics)
+        is_sensitive = "sensitive" in hits
         
         return {
             "allowed": True,
@@ -119,25 +177,43 @@ class AIRouter:
             "mode": "STRICT_FACT_CHECK" if is_sensitive else "STANDARD"
         }
 
-    async def generate(self, prompt: str, model: str = None, history: list = None):
+    def check_output(self, response: str) -> Dict[str, Any]:
+        """Post-generation audit of model output only (the prompt was already screened)."""
+        hits = self.guardrails.classify(response, categories=("bias",))
+        if "bias" in hits:
+            return {
+                "allowed": False,
+                "reason": "OUTPUT_BIAS",
+                "category": self.guardrails.labels["bias"],
+                "message": BIAS_BLOCK_MESSAGE
+            }
+        return {"allowed": True}
+
+    def _blocked(self, message: str) -> Dict[str, Any]:
+        return {
+            "source": "Guardrails",
+            "content": message,
+            "model": "Constitutional-Guardrail",
+            "status": "BLOCKED",
+            "safety_flag": True
+        }
+
+    async def _prepare(self, prompt: str, model: str = None) -> Dict[str, Any]:
+        """Steps shared by the buffered and streaming paths: guardrails, RAG, prompt, tools."""
         # 1. Pre-Generation Safety Check
         safety_check = self.check_safety(prompt)
         
         if not safety_check["allowed"]:
-             # Log violation (Mock logging)
-             print(f"[AUDIT LOG] BLOCKED: {prompt} | Reason: {safety_check['reason']}")
-             return {
-                 "source": "Guardrails",
-                 "content": safety_check["message"],
-                 "model": "Constitutional-Guardrail",
-                 "status": "BLOCKED",
-                 "safety_flag": True
-             }
+             self.audit.record(prompt, safety_check["message"], safety_flag=True,
+                               flag_category=safety_check["category"])
+             return {"blocked": self._blocked(safety_check["message"])}
 
         target_model = model or self.default_model
         
-        # 2. RAG Context Retrieval
-        context = self._retrieve_context(prompt)
+        # 2. RAG Context Retrieval (the query embedding is reused by the semantic cache)
+        self._refresh_knowledge_base()
+        query_embedding = self._embed_query(prompt)
+        context = self._retrieve_context(prompt, query_embedding=query_embedding)
         
         # 3. Construct System Prompt based on Mode
         system_instruction = ""
@@ -156,56 +232,195 @@ class AIRouter:
                 f"CONTEXT:\n{context}\n"
             )
 
-        # 4. Tool Routing (Weather, etc.)
-        tool_call = None
-        if "weather" in prompt.lower() or "طقس" in prompt:
-            tool_call = {"name": "verify_weather_history", "args": {"location": "Sana'a", "date": datetime.now().strftime('%Y-%m-%d')}}
+        # 4. Tool Routing (Weather); calls go through the hub's cache and run concurrently
+        tool_calls = self._route_tools(prompt)
 
         tool_used_name = None
         final_prompt = f"{system_instruction}\nUSER QUESTION: {prompt}"
         
-        if tool_call:
-            tool_result = await self.mcp.execute_tool(tool_call["name"], tool_call["args"])
-            tool_used_name = tool_call["name"]
-            final_prompt += f"\nTOOL RESULT: {json.dumps(tool_result, ensure_ascii=False)}"
+        if tool_calls:
+            tool_results = await self.mcp.execute_tools(tool_calls)
+            tool_used_name = ", ".join(dict.fromkeys(call["name"] for call in tool_calls))
+            for tool_result in tool_results:
+                final_prompt += f"\nTOOL RESULT: {json.dumps(tool_result, ensure_ascii=False)}"
+
+        return {
+            "safety_check": safety_check,
+            "context": context,
+            "final_prompt": final_prompt,
+            "model": target_model,
+            "tool_used": tool_used_name,
+            "query_embedding": query_embedding,
+            # Tool results are time-dependent, so those answers are never cached
+            "cache_key": None if tool_used_name else ResponseCache.key(target_model, safety_check.get("mode"), context, prompt),
+            "cache_scope": ResponseCache.scope(target_model, safety_check.get("mode"), context)
+        }
+
+    def _route_tools(self, prompt: str) -> List[Dict[str, Any]]:
+        """Tool calls a prompt needs (weather history for Sana'a today)."""
+        calls = []
+        if "weather" in prompt.lower() or "طقس" in prompt:
+            calls.append({"name": "verify_weather_history", "args": {"location": "Sana'a", "date": datetime.now().strftime('%Y-%m-%d')}})
+        return calls
+
+    def _transparency(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        # Metadata for frontend transparency
+        context = plan["context"]
+        return {
+            "safety_mode": plan["safety_check"].get("mode"),
+            "citations": [item['title'] for item in self.kb_data if item['content'] in context] if context else [],
+            "confidence_score": "High" if context else "Medium" # Simple heuristic
+        }
+
+    async def generate(self, prompt: str, model: str = None, history: list = None):
+        plan = await self._prepare(prompt, model)
+        if "blocked" in plan:
+            return plan["blocked"]
+
+        cached = self._cache_lookup(plan)
+        if cached:
+            self.audit.record(prompt, cached.get("content"))
+            return cached
+
+        # 5. Generate (raises SchedulerOverloaded instead of queueing past the deadline)
+        try:
+            async with self.scheduler.slot(plan["safety_check"].get("mode")):
+                result = await self._call_local(plan["final_prompt"], plan["model"], tool_used=plan["tool_used"])
+        except SchedulerOverloaded:
+            self.audit.record(prompt)
+            raise
 
-        # 5. Generate
-        result = await self._call_local(final_prompt, target_model, tool_used=tool_used_name)
-        
         # 6. Post-Generation Audit
-        post_safety = self.check_safety(prompt, response=result.get("content", ""))
+        post_safety = self.check_output(result.get("content", ""))
+        # The withheld model output is what the audit trail must keep
+        self.audit.record(prompt, result.get("content"), safety_flag=not post_safety["allowed"],
+                          flag_category=post_safety.get("category"))
         if not post_safety["allowed"]:
-            return {
-                 "source": "Guardrails",
-                 "content": post_safety["message"],
-                 "model": "Constitutional-Guardrail",
-                 "status": "BLOCKED",
-                 "safety_flag": True
-             }
+            return self._blocked(post_safety["message"])
             
-        # Add metadata for frontend transparency
-        result["safety_mode"] = safety_check.get("mode")
-        result["citations"] = [item['title'] for item in self.kb_data if item['content'] in context] if context else []
-        result["confidence_score"] = "High" if context else "Medium" # Simple heuristic
+        result.update(self._transparency(plan))
+        if result.get("source") == "sovereign_local":
+            self._cache_store(plan, result)
 
         return result
 
+    def _cache_lookup(self, plan: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if plan["cache_key"] is None:
+            return None
+        cached, tier = self.cache.lookup(plan["cache_key"], plan["query_embedding"], plan["cache_scope"])
+        if cached:
+            cached["cache"] = tier
+        return cached
+
+    def _cache_store(self, plan: Dict[str, Any], result: Dict[str, Any]):
+        if plan["cache_key"] is not None:
+            self.cache.store(plan["cache_key"], result, plan["query_embedding"], plan["cache_scope"])
+
+    async def generate_stream(self, prompt: str, model: str = None, history: list = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of `generate`. Yields events:
+          {"type": "meta", ...}  once, before the first token
+          {"type": "token", "content": str}
+          {"type": "blocked", ...} if a guardrail trips (pre-check or mid-stream); the stream ends
+          {"type": "error", "content": str}   (scheduler rejections add status/retry_after)
+          {"type": "done", "model": str, "tool_used": str}
+        The output audit runs incrementally: text is held back by one audit window,
+        so a flagged phrase is cut before it reaches the client and generation is aborted.
+        """
+        try:
+            plan = await self._prepare(prompt, model)
+        except Exception as e:
+            # The 200 response has already started: report it as an event, like generation failures
+            self.audit.record(prompt)
+            yield {"type": "error", "content": f"Preparation Failure: {str(e)}", "source": "error"}
+            return
+        if "blocked" in plan:
+            yield {"type": "blocked", **plan["blocked"]}
+            return
+
+        transparency = self._transparency(plan)
+        yield {"type": "meta", "model": plan["model"], "tool_used": plan["tool_used"], **transparency}
+
+        cached = self._cache_lookup(plan)
+        if cached:
+            self.audit.record(prompt, cached["content"])
+            yield {"type": "token", "content": cached["content"]}
+            yield {"type": "done", "source": cached.get("source"), "model": plan["model"], "tool_used": None, "cache": cached["cache"]}
+            return
+
+        auditor = StreamAuditor(self.guardrails, categories=("bias",))
+        emitted = []
+        try:
+            async with self.scheduler.slot(plan["safety_check"].get("mode")):
+                async for piece in self._stream_local(plan["final_prompt"], plan["model"]):
+                    safe_text, hits = auditor.feed(piece)
+                    if hits:
+                        self.audit.record(prompt, "".join(emitted) + auditor.held + piece, safety_flag=True,
+                                          flag_category=self.guardrails.labels["bias"])
+                        # Leaving the loop closes the upstream response, which stops Ollama generating
+                        yield {"type": "blocked", **self._blocked(BIAS_BLOCK_MESSAGE)}
+                        return
+                    if safe_text:
+                        emitted.append(safe_text)
+                        yield {"type": "token", "content": safe_text}
+        except SchedulerOverloaded as e:
+            self.audit.record(prompt, "".join(emitted) or None)
+            yield {"type": "error", "content": e.reason, "source": "scheduler",
+                   "status": e.status_code, "retry_after": e.retry_after}
+            return
+        except Exception as e:
+            self.audit.record(prompt, "".join(emitted) or None)
+            yield {"type": "error", "content": f"Connection Failure: {str(e)}", "source": "error"}
+            return
+
+        remainder = auditor.flush()
+        if remainder:
+            emitted.append(remainder)
+            yield {"type": "token", "content": remainder}
+        self.audit.record(prompt, "".join(emitted))
+        self._cache_store(plan, {
+            "source": "sovereign_local",
+            "content": "".join(emitted),
+            "model": plan["model"],
+            "tool_used": plan["tool_used"],
+            **transparency
+        })
+        yield {"type": "done", "source": "sovereign_local", "model": plan["model"], "tool_used": plan["tool_used"]}
+
     async def _call_local(self, prompt, model, tool_used=None):
         try:
-            async with httpx.AsyncClient() as client:
-                res = await client.post(
-                    f"{self.local_url}/api/generate",
-                    json={"model": model, "prompt": prompt, "stream": False},
-                    timeout=120.0
-                )
-                if res.status_code != 200:
-                    return {"content": "Error: Local AI Core unreachable.", "source": "error"}
-                
-                return {
-                    "source": "sovereign_local",
-                    "content": res.json().get("response", ""),
-                    "model": model,
-                    "tool_used": tool_used
-                }
+            res = await self.http.request(
+                "ollama", "POST", "/api/generate",
+                json={"model": model, "prompt": prompt, "stream": False}
+            )
+            if res.status_code != 200:
+                return {"content": "Error: Local AI Core unreachable.", "source": "error"}
+            
+            return {
+                "source": "sovereign_local",
+                "content": res.json().get("response", ""),
+                "model": model,
+                "tool_used": tool_used
+            }
         except Exception as e:
             return {"content": f"Connection Failure: {str(e)}", "source": "error"}
+
+    async def _stream_local(self, prompt, model) -> AsyncIterator[str]:
+        """Yields response fragments from Ollama's NDJSON stream as they are generated."""
+        # Read timeout applies between chunks, not to the whole completion
+        async with self.http.stream(
+            "ollama", "POST", "/api/generate",
+            json={"model": model, "prompt": prompt, "stream": True}
+        ) as res:
+            if res.status_code != 200:
+                raise RuntimeError("Local AI Core unreachable.")
+            async for line in res.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    break
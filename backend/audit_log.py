@@ -0,0 +1,140 @@
+import os
+import atexit
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+from timeseries_writer import TABLES, BufferedWriter, make_sink
+
+AUDIT_COLUMNS = TABLES["audit_logs"]
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+class AuditLog:
+    """
+    سجل التدقيق (Audit Log)
+    Every prompt, response and guardrail decision is kept in the audit_logs
+    hypertable. `record()` is called on the request path and only appends a
+    row to a bounded ring buffer (no lock, no I/O). A drain thread moves the
+    ring into a BufferedWriter, which writes audit_logs in bulk and, when the
+    database is slow or down, spills to append-only JSONL files in
+    `spill_dir` that are replayed once it recovers. The ring only overflows
+    if the drain thread itself falls behind; the oldest rows are then
+    dropped and counted in `metrics()`.
+    """
+    def __init__(self, writer: BufferedWriter, capacity: int = 65536, drain_interval: float = 0.2,
+                 default_user_id: int = 0):
+        self.writer = writer
+        self.capacity = capacity
+        self.drain_interval = drain_interval
+        self.default_user_id = default_user_id
+        self._ring: deque = deque(maxlen=capacity)
+        self._wake = threading.Event()
+        self._closed = False
+        self.stats = {"recorded": 0, "dropped": 0, "drained": 0, "peak_depth": 0, "flagged": 0}
+        self._thread = threading.Thread(target=self._run, name="audit-drain", daemon=True)
+        self._thread.start()
+
+    def record(self, prompt: str, response: Optional[str] = None, safety_flag: bool = False,
+               flag_category: Optional[str] = None, user_id: Optional[int] = None,
+               human_override_reason: Optional[str] = None):
+        """Queues one audit row; never blocks (the oldest queued row is dropped if the ring is full)."""
+        if self._closed:
+            self.stats["dropped"] += 1
+            return
+        row = (datetime.now(timezone.utc), self.default_user_id if user_id is None else user_id,
+               prompt, response, bool(safety_flag), flag_category, human_override_reason)
+        ring = self._ring
+        if len(ring) >= self.capacity:
+            self.stats["dropped"] += 1
+        ring.append(row)
+        self.stats["recorded"] += 1
+        self.stats["flagged"] += bool(safety_flag)
+        depth = len(ring)
+        if depth > self.stats["peak_depth"]:
+            self.stats["peak_depth"] = depth
+        if depth >= self.writer.max_rows:
+            self._wake.set()
+
+    def _drain(self) -> int:
+        ring, rows = self._ring, []
+        while True:
+            try:
+                rows.append(ring.popleft())
+            except IndexError:
+                break
+        if rows:
+            self.writer.add_many("audit_logs", (dict(zip(AUDIT_COLUMNS, row)) for row in rows))
+            self.stats["drained"] += len(rows)
+        return len(rows)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.drain_interval)
+            self._wake.clear()
+            try:
+                self._drain()
+            except Exception as e:
+                print(f"Audit log drain error: {e}")
+
+    def flush(self) -> bool:
+        """Drains the ring and writes everything queued so far; False if the database refused it."""
+        self._drain()
+        return self.writer.flush()
+
+    def close(self, timeout: float = 10.0):
+        """Stops the drain thread; queued rows are written or spilled by the writer."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout)
+        self._drain()
+        self.writer.close(timeout)
+
+    def metrics(self) -> Dict[str, Any]:
+        writer = self.writer.metrics()
+        return {
+            **self.stats,
+            "queue_depth": len(self._ring),
+            "capacity": self.capacity,
+            "writer_buffered": writer["buffered"],
+            "rows_written": writer["rows_written"],
+            "rows_spilled": writer["rows_spilled"],
+            "rows_replayed": writer["rows_replayed"],
+            "failed_flushes": writer["failed_flushes"],
+            "last_flush_ms": writer["last_flush_ms"],
+            "last_error": writer["last_error"],
+            "sink": writer["sink"],
+        }
+
+
+_audit_log: Optional[AuditLog] = None
+
+
+def get_audit_log() -> AuditLog:
+    """
+    Process-wide audit log on AUDIT_DATABASE_URL (default DATABASE_URL, then a
+    local SQLite file so records are kept even without a database). It is
+    flushed (or spilled) at interpreter exit.
+    """
+    global _audit_log
+    if _audit_log is None:
+        url = os.getenv("AUDIT_DATABASE_URL") or os.getenv("DATABASE_URL") or \
+            "sqlite:///" + os.getenv("AUDIT_SQLITE_PATH", os.path.join(DATA_DIR, "audit_logs.db"))
+        if url.startswith("sqlite:///"):
+            os.makedirs(os.path.dirname(url[len("sqlite:///"):]) or ".", exist_ok=True)
+        writer = BufferedWriter(
+            make_sink(url),
+            tables={"audit_logs": AUDIT_COLUMNS},
+            max_rows=int(os.getenv("AUDIT_BATCH_ROWS", "1000")),
+            flush_interval=float(os.getenv("AUDIT_FLUSH_S", "1.0")),
+            max_buffered=int(os.getenv("AUDIT_MAX_BUFFERED", "50000")),
+            spill_dir=os.getenv("AUDIT_SPILL_DIR", os.path.join(DATA_DIR, "audit_spill")),
+            spill_after=float(os.getenv("AUDIT_SPILL_AFTER_S", "5")),
+            name="audit-writer",
+        )
+        _audit_log = AuditLog(writer, capacity=int(os.getenv("AUDIT_RING_SIZE", "65536")),
+                              default_user_id=int(os.getenv("AUDIT_DEFAULT_USER_ID", "0")))
+        atexit.register(_audit_log.close)
+    return _audit_log
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Audit log benchmark: request-path cost of AuditLog.record() against the
+old synchronous alternative (one INSERT per request), then an outage drill:
+records keep arriving at --rate per second while the database is healthy,
+then slow (every write stalls --slow-delay s), then down (every write
+fails), then back. Reported per phase: ring depth, rows buffered, written,
+spilled to JSONL and replayed. At the end every recorded row that was not
+dropped must be in audit_logs exactly once or more (replay is at-least-once).
+
+Uses a SQLite file by default; --url postgresql://... writes to a real
+audit_logs table (db_schema.sql section 5, TimescaleDB optional).
+Run from backend/:  python benchmarks/bench_audit_log.py --rate 2000
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import datetime, timezone
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from timeseries_writer import BufferedWriter, make_sink
+from audit_log import AuditLog, AUDIT_COLUMNS
+
+
+class FlakySink:
+    """Wraps a real sink; `mode` switches it between healthy, slow and down."""
+    def __init__(self, sink, slow_delay: float):
+        self.sink = sink
+        self.name = sink.name
+        self.slow_delay = slow_delay
+        self.mode = "healthy"
+
+    def write(self, table, columns, rows):
+        if self.mode == "down":
+            raise ConnectionError("database unavailable")
+        if self.mode == "slow":
+            time.sleep(self.slow_delay)
+        self.sink.write(table, columns, rows)
+
+    def close(self):
+        pass
+
+
+def count_rows(url, sink):
+    if url.startswith("sqlite"):
+        rows = sink.conn.execute("SELECT prompt_text FROM audit_logs").fetchall()
+    else:
+        with sink.pool.connection() as conn:
+            rows = conn.execute("SELECT prompt_text FROM audit_logs WHERE prompt_text LIKE 'bench %'").fetchall()
+    return len(rows), len({r[0] for r in rows})
+
+
+def clear(url, sink):
+    if url.startswith("sqlite"):
+        with sink.conn:
+            sink.conn.execute("DELETE FROM audit_logs")
+    else:
+        sink.write("audit_logs", AUDIT_COLUMNS, [])  # opens the pool
+        with sink.pool.connection() as conn:
+            conn.execute("DELETE FROM audit_logs WHERE prompt_text LIKE 'bench %'")
+
+
+def request_path(args, url):
+    sink = make_sink(url)
+    clear(url, sink)
+    n = args.requests
+    sync = []
+    for i in range(min(n, 2000)):
+        t0 = time.perf_counter()
+        sink.write("audit_logs", AUDIT_COLUMNS,
+                   [(datetime.now(timezone.utc), 0, "bench prompt", "bench response " * 20, False, None, None)])
+        sync.append(time.perf_counter() - t0)
+    audit = AuditLog(BufferedWriter(sink, tables={"audit_logs": AUDIT_COLUMNS}, max_rows=1000,
+                                    spill_dir=tempfile.mkdtemp(), name="audit-writer"))
+    queued = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        audit.record(f"bench {i}", "bench response " * 20)
+        queued.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    audit.close()
+    drained = time.perf_counter() - t0
+    print(f"\nrequest path ({sink.name}):")
+    for label, values in (("INSERT per request", sync), ("AuditLog.record", queued)):
+        print(f"  {label:<19} p50 {np.percentile(values, 50) * 1e6:8.1f} us  p99 {np.percentile(values, 99) * 1e6:8.1f} us  "
+              f"max {max(values) * 1e3:7.2f} ms")
+    print(f"  {n:,} queued rows written in bulk within {drained:.2f} s of close()")
+
+
+def drill(args, url):
+    sink = make_sink(url)
+    clear(url, sink)
+    flaky = FlakySink(sink, args.slow_delay)
+    spill_dir = tempfile.mkdtemp()
+    writer = BufferedWriter(flaky, tables={"audit_logs": AUDIT_COLUMNS}, max_rows=1000, flush_interval=0.5,
+                            max_buffered=args.max_buffered, spill_dir=spill_dir, spill_after=args.spill_after,
+                            name="audit-writer")
+    audit = AuditLog(writer, capacity=args.ring)
+    phases = [("healthy", args.phase), ("slow", args.phase), ("down", 2 * args.phase), ("healthy", 2 * args.phase)]
+    print(f"\noutage drill ({sink.name}), {args.rate:.0f} records/s, ring {args.ring:,}, "
+          f"spill after {args.spill_after:.0f} s of failures:")
+    i, latencies = 0, []
+    for mode, seconds in phases:
+        flaky.mode = mode
+        end = time.monotonic() + seconds
+        next_at = time.monotonic()
+        while time.monotonic() < end:
+            t0 = time.perf_counter()
+            audit.record(f"bench {i}", "response", safety_flag=i % 10 == 0)
+            latencies.append(time.perf_counter() - t0)
+            i += 1
+            next_at += 1.0 / args.rate
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        m = audit.metrics()
+        print(f"  after {mode:<8} {seconds:4.1f} s: recorded {m['recorded']:7,}  queue {m['queue_depth']:6,} "
+              f"(peak {m['peak_depth']:,})  buffered {m['writer_buffered']:6,}  written {m['rows_written']:7,}  "
+              f"spilled {m['rows_spilled']:7,}  replayed {m['rows_replayed']:7,}  dropped {m['dropped']}")
+    audit.close()
+    m = audit.metrics()
+    total, distinct = count_rows(url, sink)
+    print(f"  record() p99 {np.percentile(latencies, 99) * 1e6:.1f} us, max {max(latencies) * 1e3:.2f} ms")
+    print(f"  audit_logs: {total:,} rows, {distinct:,} distinct of {m['recorded'] - m['dropped']:,} kept "
+          f"-> complete {distinct == m['recorded'] - m['dropped']}; spill files left {len(os.listdir(spill_dir))}")
+    sink.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="sqlite:///path.db (default: temp file) or postgresql://...")
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--rate", type=float, default=2000.0)
+    parser.add_argument("--phase", type=float, default=3.0, help="seconds per drill phase")
+    parser.add_argument("--slow-delay", type=float, default=2.0)
+    parser.add_argument("--spill-after", type=float, default=2.0)
+    parser.add_argument("--max-buffered", type=int, default=50000)
+    parser.add_argument("--ring", type=int, default=65536)
+    args = parser.parse_args()
+    url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "audit.db")
+    request_path(args, url)
+    drill(args, url)
+
+
+if __name__ == "__main__":
+    main()
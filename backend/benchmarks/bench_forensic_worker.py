@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Per-image latency: spawning `python sherloq_cli.py IMAGE` for every file
+versus submitting jobs to the resident ForensicWorker pool.
+Run from backend/:  python benchmarks/bench_forensic_worker.py --images 20 --size 800
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from PIL import Image
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND)
+from forensic_worker import ForensicWorker
+
+
+def make_images(directory, count, size):
+    rng = np.random.default_rng(1)
+    paths = []
+    for i in range(count):
+        pixels = rng.integers(0, 255, (size, size, 3), dtype=np.uint8)
+        path = os.path.join(directory, f"sample_{i}.jpg")
+        Image.fromarray(pixels).save(path, quality=85)
+        paths.append(path)
+    return paths
+
+
+def summary(label, latencies):
+    lat = np.array(latencies) * 1000
+    print(f"  {label:<28} p50={np.percentile(lat, 50):8.1f} ms  p99={np.percentile(lat, 99):8.1f} ms  mean={lat.mean():8.1f} ms")
+
+
+def bench_spawn(paths):
+    latencies = []
+    for path in paths:
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(BACKEND, "sherloq_cli.py"), path],
+                       check=True, stdout=subprocess.DEVNULL)
+        latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+async def bench_worker(paths, workers):
+    worker = ForensicWorker(workers=workers)
+    await worker.start()
+    await worker.analyze(paths[0])  # pool is already warm; this only excludes first-fork noise
+    latencies = []
+    for path in paths:
+        t0 = time.perf_counter()
+        job_id = worker.submit(path)
+        while worker.get(job_id)["status"] in ("queued", "running"):
+            await asyncio.sleep(0.002)
+        latencies.append(time.perf_counter() - t0)
+    await worker.stop()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--size", type=int, nargs="+", default=[256, 1024])
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.size:
+            paths = make_images(tmp, args.images, size)
+            print(f"\n{args.images} images of {size}x{size}")
+            summary("spawn per file (subprocess)", bench_spawn(paths))
+            summary("resident worker (job+poll)", asyncio.run(bench_worker(paths, args.workers)))
+
+
+if __name__ == "__main__":
+    main()
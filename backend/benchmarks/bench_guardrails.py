@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Guardrail micro-benchmark: the original per-pattern `re.search` + `in` scans
+against the compiled single-pass GuardrailEngine, on short prompts and long
+model outputs (mixed Arabic/English, with diacritics and tatweel). First
+checks that texts whose terms overlap across categories are classified into
+the same categories as the per-pattern scan.
+Run from backend/:  python benchmarks/bench_guardrails.py
+"""
+
+import os
+import re
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from guardrails import GuardrailEngine
+
+RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "guardrail_rules.json")
+
+PROHIBITED = [
+    r"deepfake", r"fake video", r"voice clone", r"تزييف", r"فبركة",
+    r"kill", r"murder", r"hate speech", r"تحريض", r"عنف",
+    r"hack", r"bypass", r"exploit",
+    r"violence against women", r"gender bias", r"عنف ضد المرأة"
+]
+BIAS = ["men are superior", "women cannot", "weak gender"]
+SENSITIVE = [
+    "election", "vote", "ballot", "انتخابات", "تصويت",
+    "politician", "minister", "government", "حكومة", "وزير",
+    "scandal", "corruption", "فساد"
+]
+
+
+def legacy_check(prompt, response):
+    # Same work as the original check_safety: lowercase + one scan per pattern
+    prompt_lower, response_lower = prompt.lower(), response.lower()
+    for pattern in PROHIBITED:
+        if re.search(pattern, prompt_lower):
+            return False
+    if response and any(m in response_lower for m in BIAS):
+        return False
+    return any(t in prompt_lower for t in SENSITIVE)
+
+
+def legacy_categories(text):
+    lower = text.lower()
+    found = set()
+    for category, terms in (("prohibited", PROHIBITED), ("bias", BIAS), ("sensitive", SENSITIVE)):
+        if any(re.search(t, lower) for t in terms):
+            found.add(category)
+    return found
+
+
+# A term of one category overlapping or containing a term of another
+OVERLAPPING = [
+    "weak gender bias in the report",
+    "violence against women cannot be justified",
+    "the minister of election violence: عنف ضد المرأة",
+    "they devote time to the government archive",
+]
+
+
+def synthetic_text(n_chars, rng):
+    vocab = ["الصحافة", "اليمن", "تقرير", "مصدر", "الموانئ", "عَـدَن", "report", "the", "port",
+             "archive", "analysis", "source", "verified", "صنعاء", "المياه", "الكهرباء"]
+    words, size = [], 0
+    while size < n_chars:
+        w = rng.choice(vocab)
+        words.append(w)
+        size += len(w) + 1
+    return " ".join(words)
+
+
+def bench(label, fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    per_call = (time.perf_counter() - t0) / repeat * 1e6
+    print(f"  {label:<26} {per_call:10.1f} us/request")
+
+
+def main():
+    rng = random.Random(7)
+    engine = GuardrailEngine(RULES)
+    print("overlapping terms across categories:")
+    for text in OVERLAPPING:
+        legacy, found = legacy_categories(text), set(engine.classify(text))
+        print(f"  {'ok' if found == legacy else 'MISMATCH':<8} {sorted(found)!s:<36} {text}")
+        assert found == legacy, (text, legacy, found)
+    prompt = synthetic_text(200, rng) + " ما هي نتائج الانتخابات؟"
+    for n_chars, repeat in [(2000, 2000), (20000, 200), (200000, 20)]:
+        output = synthetic_text(n_chars, rng)
+        print(f"\nprompt={len(prompt)} chars, model output={len(output):,} chars")
+        # One request = pre-generation check on the prompt + post-generation audit of the output
+        bench("legacy pre+post", lambda: (legacy_check(prompt, ""), legacy_check(prompt, output)), repeat)
+        bench("engine pre+post", lambda: (engine.classify(prompt), engine.classify(output, ("bias",))), repeat)
+        # Classifying the whole output into every category (legacy: one scan per pattern)
+        bench("legacy all categories", lambda: legacy_check(output, output), repeat)
+        bench("engine all categories", lambda: engine.classify(output), repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Lexicon benchmark: the original per-keyword `k in text` loop (what
+InsightIngestEngine.analyze_weak_signals and nlp-engine's YEMENI_KEYWORDS did)
+and the guardrails trie regex against the Aho–Corasick Lexicon, with 10k+
+synthetic Arabic terms over a batch of news-sized texts.
+Run from backend/:  python benchmarks/bench_lexicon.py --terms 1000 10000 50000
+The legacy loop only answers "which keywords occur as substrings"; the
+lexicon also handles clitics, word boundaries and spelling variants.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from lexicon import Lexicon
+from guardrails import compile_terms, normalize_arabic
+
+LETTERS = "ابتثجحخدذرزسشصضطظعغفقكلمنهويءآأإةى"
+CLITICS = ["", "", "", "و", "ب", "ال", "وال", "لل"]
+FILLER = ["في", "من", "على", "قال", "مصدر", "اليوم", "المواطنين", "عن", "إلى", "بعد", "تقرير", "محلي"]
+
+
+def synthetic_terms(n, rng):
+    terms = set()
+    while len(terms) < n:
+        word = "".join(rng.choice(LETTERS) for _ in range(rng.randint(4, 8)))
+        if rng.random() < 0.15:
+            word += " " + "".join(rng.choice(LETTERS) for _ in range(rng.randint(3, 6)))
+        terms.add(word)
+    return sorted(terms)
+
+
+def synthetic_texts(count, n_chars, terms, rng, hit_rate=0.02):
+    texts = []
+    for _ in range(count):
+        words, size = [], 0
+        while size < n_chars:
+            w = rng.choice(CLITICS) + rng.choice(terms) if rng.random() < hit_rate else rng.choice(FILLER)
+            words.append(w)
+            size += len(w) + 1
+        texts.append(" ".join(words))
+    return texts
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--terms", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--chars", type=int, default=600, help="characters per text")
+    parser.add_argument("--skip-regex", action="store_true", help="the trie regex compiles slowly past ~20k terms")
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    for n_terms in args.terms:
+        terms = synthetic_terms(n_terms, rng)
+        texts = synthetic_texts(args.texts, args.chars, terms, rng)
+        total_mb = sum(len(t) for t in texts) * 2 / 1e6
+        print(f"\n{n_terms:,} terms, {len(texts):,} texts x {args.chars} chars")
+
+        build_s, lexicon = timed(lambda: Lexicon({"version": 0, "categories": {"synthetic": {"terms": terms}}}))
+        print(f"  lexicon build               {build_s * 1000:9.1f} ms  ({len(lexicon._goto):,} states)")
+
+        # Legacy cost grows with terms x texts, so time a sample and extrapolate
+        sample = texts[:max(1, min(len(texts), 200_000 // n_terms))]
+        legacy_s, _ = timed(lambda: [[k for k in terms if k in t] for t in sample])
+        legacy_s *= len(texts) / len(sample)
+        print(f"  legacy `k in text`          {legacy_s:9.2f} s   ({len(texts) / legacy_s:9.0f} texts/s, extrapolated from {len(sample)})")
+
+        if not args.skip_regex:
+            compile_s, pattern = timed(lambda: compile_terms({normalize_arabic(t) for t in terms}))
+            regex_s, _ = timed(lambda: [pattern.findall(t) for t in texts])
+            print(f"  guardrails trie regex       {regex_s:9.2f} s   ({len(texts) / regex_s:9.0f} texts/s, compile {compile_s:.1f} s)")
+
+        find_s, found = timed(lambda: [lexicon.find(t) for t in texts])
+        hits = sum(len(f) for f in found)
+        print(f"  lexicon.find                {find_s:9.2f} s   ({len(texts) / find_s:9.0f} texts/s, {total_mb / find_s:.1f} MB/s, {hits:,} matches)")
+        any_s, _ = timed(lambda: [lexicon.contains(t) for t in texts])
+        print(f"  lexicon.contains            {any_s:9.2f} s   ({len(texts) / any_s:9.0f} texts/s)")
+
+
+if __name__ == "__main__":
+    main()
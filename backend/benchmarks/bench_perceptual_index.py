@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate lookup benchmark for the perceptual-hash index.
+  scan:  popcount of the query against every stored 64-bit code
+  mih:   MultiIndexHash bucket probes + popcount of the candidates only
+Codes are synthetic (uniform 64-bit, i.e. the best case for bucket sizes;
+real pHashes cluster somewhat more). Queries are stored codes with 0..radius
+random bits flipped plus unrelated codes; recall is measured against the scan.
+The second part inserts images into a PerceptualIndex (SQLite file in a
+temp dir) one at a time and times lookups with name resolution.
+Run from backend/:  python benchmarks/bench_perceptual_index.py --sizes 100000 1000000 4000000
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from perceptual_index import MultiIndexHash, PerceptualIndex, popcount
+
+
+def flip(code, bits, rng):
+    for b in rng.choice(64, bits, replace=False):
+        code ^= 1 << int(b)
+    return code
+
+
+def queries(codes, radius, n, rng):
+    planted = [flip(int(codes[i]), int(rng.integers(0, radius + 1)), rng)
+               for i in rng.integers(0, len(codes), n // 2)]
+    unrelated = [int(c) for c in rng.integers(0, 2 ** 63, n - n // 2, dtype=np.int64).view(np.uint64)]
+    return planted + unrelated
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000, 4000000])
+    parser.add_argument("--radius", type=int, nargs="+", default=[6, 10])
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--db-images", type=int, default=20000, help="images inserted in the SQLite-backed part")
+    args = parser.parse_args()
+    rng = np.random.default_rng(5)
+
+    for n in args.sizes:
+        codes = rng.integers(0, 2 ** 63, n, dtype=np.int64).view(np.uint64) ^ \
+            (rng.integers(0, 2, n, dtype=np.uint64) << np.uint64(63))
+        t0 = time.perf_counter()
+        index = MultiIndexHash(codes)
+        build_s = time.perf_counter() - t0
+        print(f"\n{n:,} codes, multi-index build {build_s:.2f} s")
+        for radius in args.radius:
+            qs = queries(codes, radius, args.queries, rng)
+            scan_t, mih_t, found, expected = [], [], 0, 0
+            for q in qs:
+                t0 = time.perf_counter()
+                truth = np.nonzero(popcount(codes ^ np.uint64(q)) <= radius)[0]
+                scan_t.append(time.perf_counter() - t0)
+                t0 = time.perf_counter()
+                rows, _ = index.search(q, radius)
+                mih_t.append(time.perf_counter() - t0)
+                expected += len(truth)
+                found += len(np.intersect1d(rows, truth))
+            print(f"  radius {radius:>2}  scan p50 {percentile_ms(scan_t, 50):8.3f} ms  "
+                  f"mih p50 {percentile_ms(mih_t, 50):7.3f} ms  p99 {percentile_ms(mih_t, 99):7.3f} ms  "
+                  f"recall {found / max(expected, 1):.3f}")
+
+    path = os.path.join(tempfile.mkdtemp(), "phash.db")
+    index = PerceptualIndex(path)
+    n = args.db_images
+    codes = rng.integers(0, 2 ** 63, (n, 3, 2), dtype=np.int64).view(np.uint64)
+    t0 = time.perf_counter()
+    for i in range(n):
+        index.add_many([{"name": f"img_{i}.jpg", "hashes": [(c, int(p), int(d)) for c, (p, d)
+                                                             in zip((1.0, 0.9, 0.8), codes[i])]}])
+    insert_s = time.perf_counter() - t0
+    lat = []
+    for i in rng.integers(0, n, args.queries):
+        q = [(1.0, flip(int(codes[i, 0, 0]), 4, rng), int(codes[i, 0, 1]))]
+        t0 = time.perf_counter()
+        matches = index.lookup(q, radius=10, limit=5)
+        lat.append(time.perf_counter() - t0)
+        assert matches and matches[0]["name"] == f"img_{i}.jpg"
+    m = index.metrics()
+    print(f"\nPerceptualIndex (SQLite): {n:,} single-image inserts at {n / insert_s:,.0f}/s "
+          f"({m['merges']} merges, last {m['last_merge_ms']} ms); lookup with names "
+          f"p50 {percentile_ms(lat, 50)} ms, p99 {percentile_ms(lat, 99)} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Retrieval benchmark: legacy brute-force `_retrieve_context` maths vs FlatIndex vs IVFIndex.
+Run from backend/:  python benchmarks/bench_retrieval.py --sizes 10000 100000 1000000
+Vectors are synthetic (clustered, 384-dim like all-MiniLM-L6-v2); recall@k is
+measured against exact search.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from retrieval_index import FlatIndex, IVFIndex, normalize_rows
+
+
+def legacy_search(kb_embeddings, query_embedding, top_k):
+    # Verbatim maths of the original AIRouter._retrieve_context
+    similarities = np.dot(kb_embeddings, query_embedding) / (
+        np.linalg.norm(kb_embeddings, axis=1) * np.linalg.norm(query_embedding) + 1e-9
+    )
+    return np.argsort(similarities)[-top_k:][::-1]
+
+
+def synthetic_corpus(n, dim, rng, clusters=256):
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100000):
+        stop = min(start + 100000, n)
+        labels = rng.integers(0, clusters, stop - start)
+        vectors[start:stop] = centers[labels] + 0.6 * rng.standard_normal((stop - start, dim), dtype=np.float32)
+    return vectors
+
+
+def timed(fn, queries):
+    latencies, results = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        results.append(fn(q))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return np.array(latencies), results
+
+
+def report(label, latencies, recall=None):
+    extra = f"  recall@k={recall:.3f}" if recall is not None else ""
+    print(f"  {label:<22} p50={np.percentile(latencies, 50):8.3f} ms  p99={np.percentile(latencies, 99):8.3f} ms{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 32])
+    args = parser.parse_args()
+    rng = np.random.default_rng(42)
+
+    for n in args.sizes:
+        print(f"\nN={n:,} dim={args.dim}")
+        raw = synthetic_corpus(n, args.dim, rng)
+        queries = raw[rng.choice(n, args.queries, replace=False)] + 0.1 * rng.standard_normal((args.queries, args.dim), dtype=np.float32)
+
+        lat, _ = timed(lambda q: legacy_search(raw, q, args.top_k), queries)
+        report("legacy brute-force", lat)
+
+        normalized = normalize_rows(raw)
+        del raw
+        unit_queries = normalize_rows(queries)
+
+        flat = FlatIndex(normalized)
+        lat, exact = timed(lambda q: flat.search(q, args.top_k)[0], unit_queries)
+        report("flat + argpartition", lat)
+
+        t0 = time.perf_counter()
+        ivf = IVFIndex(normalized)
+        print(f"  ivf build: nlist={ivf.nlist} in {time.perf_counter() - t0:.1f} s")
+        for nprobe in args.nprobe:
+            lat, approx = timed(lambda q: ivf.search(q, args.top_k, nprobe=nprobe)[0], unit_queries)
+            recall = np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approx, exact)])
+            report(f"ivf nprobe={nprobe}", lat, recall)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Time and peak-RSS of the Sherloq ELA / FFT kernels across image sizes,
+legacy PIL chain (ImageChops + ImageEnhance, fft2 + masked copy) versus the
+strip-wise NumPy kernels in sherloq_cli. Every measurement runs in a fresh
+process so ru_maxrss is not polluted by earlier runs; the reported peak is
+the growth above the already-decoded input image.
+Run from backend/:  python benchmarks/bench_sherloq_kernels.py --megapixels 1 12 40
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import base64
+import resource
+import argparse
+import subprocess
+import numpy as np
+from PIL import Image, ImageChops, ImageEnhance
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND)
+import sherloq_cli
+
+
+def legacy_ela(original, quality=90):
+    buf = io.BytesIO()
+    original.save(buf, 'JPEG', quality=quality)
+    buf.seek(0)
+    compressed = Image.open(buf)
+    diff = ImageChops.difference(original, compressed)
+    max_diff = max(ex[1] for ex in diff.getextrema())
+    enhanced = ImageEnhance.Brightness(diff).enhance(255.0 / max_diff if max_diff > 0 else 1)
+    out = io.BytesIO()
+    enhanced.save(out, format='PNG')
+    return base64.b64encode(out.getvalue()).decode('utf-8'), max_diff
+
+
+def legacy_fft(image):
+    data = np.array(image.convert('L').resize((512, 512)))
+    magnitude = 20 * np.log(np.abs(np.fft.fftshift(np.fft.fft2(data))) + 1)
+    masked = magnitude.copy()
+    masked[196:316, 196:316] = 0
+    return np.std(masked)
+
+
+KERNELS = {
+    "ela_legacy": legacy_ela,
+    "ela_full": lambda img: sherloq_cli.analyze_ela(None, image=img, heatmap="full"),
+    "ela_downscale": lambda img: sherloq_cli.analyze_ela(None, image=img, heatmap="downscale"),
+    "ela_tiles": lambda img: sherloq_cli.analyze_ela(None, image=img, heatmap="tiles"),
+    "ela_none": lambda img: sherloq_cli.analyze_ela(None, image=img, heatmap="none"),
+    "ela_tiled": lambda img: sherloq_cli.analyze_ela_tiled(None, image=img),
+    "fft_legacy": legacy_fft,
+    "fft_rfft2": lambda img: sherloq_cli.detect_deepfake(None, image=img),
+}
+
+
+def make_image(megapixels):
+    # Smooth gradients plus noise: compresses like a photo, unlike pure noise
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    rng = np.random.default_rng(7)
+    image = Image.new('RGB', (width, height))
+    # Built in thin strips so construction does not inflate the RSS baseline
+    for top in range(0, height, 32):
+        rows = min(32, height - top)
+        y, x = np.mgrid[top:top + rows, 0:width]
+        strip = np.stack([(x * 0.05) % 256, (y * 0.07) % 256, ((x + y) * 0.03) % 256], axis=-1).astype(np.float32)
+        strip += rng.normal(0, 6, strip.shape).astype(np.float32)
+        image.paste(Image.fromarray(np.clip(strip, 0, 255).astype(np.uint8)), (0, top))
+    return image
+
+
+def run_child(kernel, megapixels, repeat):
+    image = make_image(megapixels)
+    image.load()
+    base_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        KERNELS[kernel](image)
+        times.append(time.perf_counter() - t0)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": min(times), "peak_mb": (peak_kb - base_kb) / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[1, 12, 40])
+    parser.add_argument("--kernels", nargs="+", default=list(KERNELS))
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--child", nargs=2, metavar=("KERNEL", "MP"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], float(args.child[1]), args.repeat)
+        return
+
+    for megapixels in args.megapixels:
+        print(f"\n{megapixels:g} MP")
+        for kernel in args.kernels:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--repeat", str(args.repeat),
+                                  "--child", kernel, str(megapixels)],
+                                 check=True, capture_output=True, text=True).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            print(f"  {kernel:<14} {1000 * result['seconds']:9.1f} ms   peak +{result['peak_mb']:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Streaming upload benchmark and check for StorageManager.upload_stream.
+  S3:    legacy   spool the body to a temp file, then blocking upload_file
+                  on the event loop (what a handler calling upload_file does)
+         stream   upload_stream: parallel multipart, SHA-256 in the same pass
+  local: legacy   spool to a temp file, then upload_file (hash pass + copy)
+         stream   upload_stream: one hashed write, renamed into place
+         dedup    the same bytes again: hardlinked to the stored object
+For each run: MB/s, peak Python heap (tracemalloc), the longest stall of a
+5 ms ticker on the event loop, and a read-back SHA-256 check. A wrong
+X-Content-SHA256 must be rejected without leaving an object or an open
+multipart upload behind.
+The S3 side runs against --endpoint (e.g. a MinIO at http://localhost:9000)
+or, by default, moto's S3-compatible server started as a subprocess (pip
+install "moto[server]"); moto is itself Python, so S3 rates are a lower bound.
+Run from backend/:  python benchmarks/bench_storage_upload.py --size-mb 256
+"""
+
+import os
+import sys
+import time
+import socket
+import subprocess
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+CHUNK = 64 * 1024
+
+
+async def body(size, seed):
+    """Request-body stand-in: `size` bytes in 64 KB chunks, never materialised whole."""
+    block = hashlib.sha256(seed.encode()).digest() * (CHUNK // 32)
+    sent, n = 0, 0
+    while sent < size:
+        piece = (n.to_bytes(8, "big") + block)[:min(CHUNK, size - sent)]
+        sent += len(piece)
+        n += 1
+        yield piece
+        if n % 64 == 0:
+            await asyncio.sleep(0)  # a socket read would yield here
+
+
+def expected_digest(size, seed):
+    async def collect():
+        h = hashlib.sha256()
+        async for piece in body(size, seed):
+            h.update(piece)
+        return h.hexdigest()
+    return asyncio.run(collect())
+
+
+async def measure(coro_factory):
+    stalls, done = [0.0], asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append(time.perf_counter() - t0 - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = await coro_factory()
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    done.set()
+    await tick
+    return result, elapsed, peak, max(stalls)
+
+
+async def spool_then_upload(storage, size, seed, name):
+    fd, path = tempfile.mkstemp()
+    with os.fdopen(fd, "wb") as f:
+        async for piece in body(size, seed):
+            f.write(piece)
+    try:
+        return storage.upload_file(path, name)  # blocking, as called from a handler today
+    finally:
+        os.unlink(path)
+
+
+def report(label, size, elapsed, peak, stall, extra=""):
+    print(f"  {label:<28} {size / elapsed / 2**20:8.1f} MB/s  peak heap {peak / 2**20:7.1f} MB  "
+          f"loop stall {stall * 1000:8.1f} ms  {extra}")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def s3_suite(args, digest):
+    server = None
+    endpoint = args.endpoint
+    if endpoint is None:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, "-m", "moto.server", "-H", "127.0.0.1", "-p", str(port)],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        endpoint = f"http://127.0.0.1:{port}"
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    os.environ.update({"ENABLE_S3": "true", "AWS_ENDPOINT": endpoint, "AWS_BUCKET": args.bucket,
+                       "AWS_DEFAULT_REGION": "us-east-1"})
+    import s3_utils
+    size = args.size_mb * 2**20
+    print(f"\nS3 at {endpoint} (bucket {args.bucket}), {args.size_mb} MB object")
+    storage = s3_utils.StorageManager()
+    try:
+        storage.s3_client.create_bucket(Bucket=args.bucket)
+    except Exception:
+        pass
+
+    def read_back(name):
+        h = hashlib.sha256()
+        for piece in storage.s3_client.get_object(Bucket=args.bucket, Key=name)["Body"].iter_chunks(1 << 20):
+            h.update(piece)
+        return h.hexdigest()
+
+    _, elapsed, peak, stall = asyncio.run(measure(lambda: spool_then_upload(storage, size, "s3", "bench/legacy.bin")))
+    report("legacy spool + upload_file", size, elapsed, peak, stall, f"read-back ok {read_back('bench/legacy.bin') == digest}")
+    for part_mb in args.part_mb:
+        for concurrency in args.concurrency:
+            s3_utils.PART_SIZE, s3_utils.UPLOAD_CONCURRENCY = part_mb * 2**20, concurrency
+            name = f"bench/stream-{part_mb}-{concurrency}.bin"
+            result, elapsed, peak, stall = asyncio.run(measure(
+                lambda: storage.upload_stream(body(size, "s3"), name)))
+            ok = result["sha256"] == digest and read_back(name) == digest
+            report(f"stream part={part_mb}MB x{concurrency}", size, elapsed, peak, stall,
+                   f"{result['method']} {result['parts']} parts, sha256 + read-back ok {ok}")
+
+    try:
+        asyncio.run(storage.upload_stream(body(size, "s3"), "bench/bad.bin", expected_sha256="0" * 64))
+        print("  checksum mismatch NOT rejected")
+    except s3_utils.ChecksumMismatch:
+        leftover = storage.s3_client.list_multipart_uploads(Bucket=args.bucket).get("Uploads", [])
+        exists = "Contents" in storage.s3_client.list_objects_v2(Bucket=args.bucket, Prefix="bench/bad.bin")
+        print(f"  checksum mismatch rejected: object created {exists}, open multipart uploads {len(leftover)}")
+    if server is not None:
+        server.terminate()
+
+
+def local_suite(args):
+    os.environ["ENABLE_S3"] = "false"
+    root = args.local_dir or tempfile.mkdtemp()
+    os.environ["STORAGE_LOCAL_PATH"] = root
+    os.environ.setdefault("FORENSIC_CACHE_DIR", os.path.join(root, ".forensic_cache"))
+    import s3_utils
+    size = args.size_mb * 2**20
+    storage = s3_utils.StorageManager()
+    print(f"\nlocal disk at {root}, {args.size_mb} MB object")
+
+    def read_back(name):
+        with open(os.path.join(root, name), "rb") as f:
+            return hashlib.file_digest(f, "sha256").hexdigest() if hasattr(hashlib, "file_digest") else \
+                hashlib.sha256(f.read()).hexdigest()
+
+    _, elapsed, peak, stall = asyncio.run(measure(lambda: spool_then_upload(storage, size, "legacy", "legacy.bin")))
+    report("legacy spool + upload_file", size, elapsed, peak, stall,
+           f"{storage.stats['methods']} read-back ok {read_back('legacy.bin') == expected_digest(size, 'legacy')}")
+    digest = expected_digest(size, "local")
+    for label, name in (("stream", "stream/a.bin"), ("stream, same bytes again", "stream/b.bin")):
+        result, elapsed, peak, stall = asyncio.run(measure(lambda: storage.upload_stream(body(size, "local"), name)))
+        report(label, size, elapsed, peak, stall, f"{result['method']}, read-back ok {read_back(name) == digest}")
+    a, b = os.stat(os.path.join(root, "stream/a.bin")), os.stat(os.path.join(root, "stream/b.bin"))
+    print(f"  second copy shares the inode: {a.st_ino == b.st_ino}")
+    try:
+        asyncio.run(storage.upload_stream(body(size, "local"), "bad.bin", expected_sha256="0" * 64))
+    except s3_utils.ChecksumMismatch:
+        print(f"  checksum mismatch rejected: leftover files "
+              f"{[n for n in os.listdir(root) if n.startswith('bad.bin')]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--part-mb", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--endpoint", default=None, help="S3/MinIO endpoint (default: in-process moto server)")
+    parser.add_argument("--bucket", default="bench-uploads")
+    parser.add_argument("--local-dir", default=None, help="local vault directory (default: temp dir)")
+    parser.add_argument("--skip-s3", action="store_true")
+    args = parser.parse_args()
+    os.environ.setdefault("PHASH_INDEX", "off")
+    local_suite(args)
+    if not args.skip_s3:
+        s3_suite(args, expected_digest(args.size_mb * 2**20, "s3"))
+
+
+if __name__ == "__main__":
+    main()
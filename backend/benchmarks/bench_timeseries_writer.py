@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Time-series ingestion benchmark: rows/second into insight_indicators for
+  row-at-a-time  one INSERT + commit per row (what a naive ingest loop does)
+  writer         BufferedWriter: add() per row, bulk flush by size/time
+                 (COPY on Postgres, multi-row insert on SQLite)
+Run from backend/:
+  python benchmarks/bench_timeseries_writer.py                     # in-process SQLite file
+  python benchmarks/bench_timeseries_writer.py --url postgresql://user:pw@localhost:5432/yemenjpt
+Tables are created if missing (plain tables; create_hypertable is left to
+db_schema.sql) and the benchmark rows are deleted afterwards.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from timeseries_writer import BufferedWriter, make_sink, TABLES
+
+TAG = "bench_timeseries_writer"
+
+
+def rows(n):
+    start = datetime.now(timezone.utc)
+    for i in range(n):
+        yield {"time": start + timedelta(milliseconds=i), "indicator_type": TAG, "value": float(i % 97),
+               "location_id": f"loc_{i % 22}", "confidence_interval": 0.9}
+
+
+def postgres_row_at_a_time(url, n):
+    import psycopg
+    columns = TABLES["insight_indicators"]
+    sql = f"INSERT INTO insight_indicators ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    with psycopg.connect(url) as conn:
+        for row in rows(n):
+            conn.execute(sql, [row[c] for c in columns])
+            conn.commit()
+
+
+def sqlite_row_at_a_time(sink, n):
+    columns = TABLES["insight_indicators"]
+    sql = f"INSERT INTO insight_indicators ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    for row in rows(n):
+        sink.conn.execute(sql, [row["time"].isoformat()] + [row[c] for c in columns[1:]])
+        sink.conn.commit()
+
+
+def prepare(url):
+    if url.startswith("sqlite"):
+        return
+    import psycopg
+    with psycopg.connect(url) as conn:
+        for table, columns in TABLES.items():
+            types = {"time": "TIMESTAMPTZ NOT NULL", "raw_data": "JSONB", "value": "FLOAT",
+                     "sentiment_score": "FLOAT", "confidence_interval": "FLOAT"}
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ("
+                         + ", ".join(f"{c} {types.get(c, 'TEXT')}" for c in columns) + ")")
+
+
+def cleanup(url):
+    if url.startswith("sqlite"):
+        sink = make_sink(url)
+        with sink.conn:
+            sink.conn.execute("DELETE FROM insight_indicators WHERE indicator_type = ?", (TAG,))
+        sink.close()
+        return
+    import psycopg
+    with psycopg.connect(url) as conn:
+        conn.execute("DELETE FROM insight_indicators WHERE indicator_type = %s", (TAG,))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="postgresql://... or sqlite:///file.db (default: temp SQLite file)")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--naive-rows", type=int, default=5000, help="rows for the row-at-a-time baseline")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1000, 5000, 20000])
+    args = parser.parse_args()
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    prepare(url)
+    print(f"store: {url.split('://')[0]}, {args.rows:,} rows (baseline {args.naive_rows:,})")
+
+    t0 = time.perf_counter()
+    if url.startswith("sqlite"):
+        sink = make_sink(url)
+        sqlite_row_at_a_time(sink, args.naive_rows)
+        sink.close()
+    else:
+        postgres_row_at_a_time(url, args.naive_rows)
+    naive_s = time.perf_counter() - t0
+    print(f"  row-at-a-time              {args.naive_rows / naive_s:10.0f} rows/s")
+    cleanup(url)
+
+    for batch in args.batch:
+        writer = BufferedWriter(make_sink(url), max_rows=batch, flush_interval=1.0)
+        t0 = time.perf_counter()
+        for row in rows(args.rows):
+            writer.add("insight_indicators", row)
+        added_s = time.perf_counter() - t0
+        writer.flush()
+        total_s = time.perf_counter() - t0
+        m = writer.metrics()
+        print(f"  writer batch={batch:<6}        {args.rows / total_s:10.0f} rows/s  "
+              f"(add() {added_s / args.rows * 1e6:.1f} us/row, {m['flushes']} flushes, {m['rows_written']:,} written)")
+        writer.close()
+        cleanup(url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+MCP tool cache benchmark against a local stub of the open-meteo archive API
+(answers GET /v1/archive after --latency seconds and counts upstream calls).
+
+  uncached  every call reaches the upstream (caching and coalescing disabled)
+  cached    memory LRU + permanent on-disk cache for final archive days,
+            TTL for recent days, identical in-flight calls coalesced
+  restart   a new hub (empty memory) over the same disk cache
+
+The workload is --calls weather lookups arriving at --rate per second, with
+(location, date) drawn Zipf-like from the six cities over two years; a
+--recent-share of calls ask about the last few days (TTL policy). Then:
+a burst of identical calls on a cold key (coalescing), and a prompt needing
+weather for several cities run one tool at a time vs with execute_tools.
+
+Run from backend/:  python benchmarks/bench_tool_cache.py --calls 2000 --rate 40
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from datetime import date, timedelta
+from urllib.parse import urlparse, parse_qs
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("ENABLE_S3", "false")
+os.environ.setdefault("STORAGE_LOCAL_PATH", tempfile.mkdtemp())
+os.environ.setdefault("PHASH_INDEX", "off")
+from http_pool import HTTPClientPool, Upstream
+from mcp_tools import MCPToolHub, ToolResultCache, NO_CACHE
+
+
+class StubOpenMeteo:
+    """Minimal HTTP/1.1 server answering the archive query with a fixed delay."""
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = (await reader.readuntil(b"\r\n\r\n")).decode()
+                target = head.split(" ", 2)[1]
+                query = parse_qs(urlparse(target).query)
+                self.requests += 1
+                await asyncio.sleep(self.latency * (0.5 + random.random()))
+                seed = hash((query["latitude"][0], query["start_date"][0])) % 1000
+                body = json.dumps({"daily": {"time": query["start_date"], "weathercode": [seed % 4],
+                                             "temperature_2m_max": [20 + seed % 20]}}).encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+def make_hub(port, cache_dir, cached=True):
+    pool = HTTPClientPool()
+    pool.register(Upstream("open_meteo", base_url=f"http://127.0.0.1:{port}", max_connections=100,
+                           max_keepalive=50, retries=0, timeout=httpx.Timeout(10.0)))
+    hub = MCPToolHub(http=pool, cache=ToolResultCache(root=cache_dir))
+    if not cached:
+        for tool in hub.tools.values():
+            tool.policy, tool.coalesce = NO_CACHE, False
+    return hub
+
+
+def workload(args, rng):
+    today = date.today()
+    cities = ["Sana'a", "Aden", "Taiz", "Hodeidah", "Mukalla", "Marib"]
+    days = [today - timedelta(days=10 + i) for i in range(730)]
+    keys = [(c, d) for d in days for c in cities]
+    rng.shuffle(keys)
+    weights = 1.0 / np.arange(1, len(keys) + 1) ** args.zipf
+    weights /= weights.sum()
+    picks = np.random.default_rng(3).choice(len(keys), size=args.calls, p=weights)
+    calls, t = [], 0.0
+    for i in picks:
+        t += rng.expovariate(args.rate)
+        if rng.random() < args.recent_share:
+            city, day = rng.choice(cities), today - timedelta(days=rng.randint(0, 3))
+        else:
+            city, day = keys[i]
+        calls.append((t, {"location": city, "date": day.isoformat()}))
+    return calls
+
+
+async def run(label, hub, stub, calls):
+    before = stub.requests
+    latencies = []
+
+    async def one(delay, call_args):
+        await asyncio.sleep(delay)
+        t0 = time.perf_counter()
+        result = await hub.execute_tool("verify_weather_history", call_args)
+        latencies.append(time.perf_counter() - t0)
+        assert "error" not in result, result
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(d, a) for d, a in calls))
+    wall = time.perf_counter() - started
+    s = hub.tools["verify_weather_history"].stats
+    print(f"  {label:<9} upstream calls {stub.requests - before:6,}  hit rate {hub.metrics()['tools']['verify_weather_history']['hit_rate']:.3f} "
+          f"(memory {s['memory_hits']:,}, disk {s['disk_hits']:,}, coalesced {s['coalesced']:,})  "
+          f"p50 {np.percentile(latencies, 50) * 1000:7.2f} ms  p99 {np.percentile(latencies, 99) * 1000:7.2f} ms  "
+          f"wall {wall:.1f} s")
+    await hub.http.aclose()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=40.0, help="calls per second")
+    parser.add_argument("--latency", type=float, default=0.15, help="mean upstream latency (s)")
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--recent-share", type=float, default=0.1)
+    parser.add_argument("--burst", type=int, default=50)
+    args = parser.parse_args()
+
+    stub = StubOpenMeteo(args.latency)
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    cache_dir = tempfile.mkdtemp()
+    calls = workload(args, random.Random(3))
+    async with server:
+        print(f"\n{args.calls:,} weather calls at {args.rate:.0f}/s, upstream latency ~{args.latency * 1000:.0f} ms")
+        await run("uncached", make_hub(port, cache_dir, cached=False), stub, calls)
+        await run("cached", make_hub(port, cache_dir), stub, calls)
+        await run("restart", make_hub(port, cache_dir), stub, calls)
+
+        hub = make_hub(port, tempfile.mkdtemp())
+        before = stub.requests
+        cold = {"location": "Taiz", "date": (date.today() - timedelta(days=400)).isoformat()}
+        results = await asyncio.gather(*(hub.execute_tool("verify_weather_history", dict(cold))
+                                         for _ in range(args.burst)))
+        print(f"\nburst of {args.burst} identical calls on a cold key: upstream calls {stub.requests - before}, "
+              f"identical results {all(r == results[0] for r in results)}")
+
+        prompt_calls = [{"name": "verify_weather_history", "args": {"location": city, "date": "2024-03-0%d" % d}}
+                        for city in ("Aden", "Taiz", "Marib", "Mukalla") for d in (1, 2)]
+        for label, concurrent in (("one at a time", False), ("execute_tools", True)):
+            hub = make_hub(port, tempfile.mkdtemp())
+            t0 = time.perf_counter()
+            if concurrent:
+                await hub.execute_tools(prompt_calls)
+            else:
+                for call in prompt_calls:
+                    await hub.execute_tool(call["name"], call["args"])
+            print(f"prompt needing {len(prompt_calls)} tool calls, {label:<13}: {(time.perf_counter() - t0) * 1000:7.1f} ms")
+            await hub.http.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
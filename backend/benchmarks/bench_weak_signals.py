@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Weak-signal scoring throughput: a stream of synthetic social posts (Arabic,
+~140 chars, 22 governorates, a share of reposts) arrives in time-ordered
+batches and the per-location rolling score over the last 24 hours is
+refreshed after every batch.
+  recompute: keep every post of the window and rescan all of it per batch
+             (per-text Python loop, what a from-scratch scorer has to do)
+  rolling:   RollingSignalWindow - each post is scanned once, identical
+             texts once per batch, hours expire out of ring buffers
+Run from backend/:  python benchmarks/bench_weak_signals.py --posts 200000 --batch 10000
+Add --terms 10000 to pad the lexicon with synthetic terms.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from collections import Counter, deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from lexicon import Lexicon, DEFAULT_LEXICON
+from weak_signals import RollingSignalWindow
+
+LETTERS = "ابتثجحخدذرزسشصضطظعغفقكلمنهويءآأإةى"
+FILLER = ["في", "من", "على", "قال", "الناس", "اليوم", "المواطنين", "عن", "إلى", "بعد", "السوق",
+          "الشارع", "الحي", "مصدر", "محلي", "الأخبار", "الوضع", "هناك", "منذ", "الصباح"]
+
+
+def load_spec(extra_terms, rng):
+    with open(DEFAULT_LEXICON, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    synthetic = set()
+    while len(synthetic) < extra_terms:
+        synthetic.add("".join(rng.choice(LETTERS) for _ in range(rng.randint(4, 8))))
+    spec["categories"]["weak_signals"]["terms"] += sorted(synthetic)
+    return spec
+
+
+def synthetic_posts(n, lexicon, rng, start_ts, hours, repost_rate=0.3, hit_rate=0.15):
+    signals = [t for t, cats in lexicon.terms if "weak_signals" in cats]
+    places = [t for t, cats in lexicon.terms if "places" in cats][:22]
+    texts, originals = [], []
+    for _ in range(n):
+        if originals and rng.random() < repost_rate:
+            texts.append(rng.choice(originals))
+            continue
+        words = [rng.choice(FILLER) for _ in range(rng.randint(14, 22))]
+        if rng.random() < hit_rate:
+            words.insert(rng.randrange(len(words)), rng.choice(["", "و", "ب", "ال"]) + rng.choice(signals))
+        text = " ".join(words)
+        texts.append(text)
+        originals.append(text)
+        if len(originals) > 5000:
+            originals = originals[-2500:]
+    locations = np.array([rng.choice(places) for _ in range(n)])
+    timestamps = np.sort(start_ts + np.array([rng.random() for _ in range(n)]) * hours * 3600).astype(np.int64)
+    return np.array(texts, dtype=object), locations, timestamps
+
+
+def recompute_scores(lexicon, window_posts, categories):
+    # From-scratch scorer: rescans every post still inside the window
+    texts, hits, terms = Counter(), Counter(), Counter()
+    for text, location in window_posts:
+        found = lexicon.find(text, categories)
+        texts[location] += 1
+        if found:
+            hits[location] += 1
+            terms.update((location, m["term"]) for m in found)
+    return {loc: hits[loc] / texts[loc] for loc in texts}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=10000)
+    parser.add_argument("--hours", type=int, default=48, help="time span of the synthetic stream")
+    parser.add_argument("--window", type=int, default=24)
+    parser.add_argument("--terms", type=int, default=0, help="synthetic terms added to the lexicon")
+    parser.add_argument("--recompute-posts", type=int, default=40000,
+                        help="stop the recompute baseline after this many posts (it grows quadratically)")
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    lexicon = Lexicon(load_spec(args.terms, rng))
+    texts, locations, timestamps = synthetic_posts(args.posts, lexicon, rng, 1_760_000_000, args.hours)
+    print(f"{len(texts):,} posts over {args.hours} h, {len(set(texts)):,} distinct, "
+          f"{len(lexicon.terms):,} lexicon terms, batches of {args.batch:,}")
+
+    window = RollingSignalWindow(lexicon, window_hours=args.window)
+    t0 = time.perf_counter()
+    score_s = 0.0
+    for start in range(0, len(texts), args.batch):
+        sl = slice(start, start + args.batch)
+        window.update({"text": texts[sl], "location": locations[sl], "timestamp": timestamps[sl]})
+        s0 = time.perf_counter()
+        window.scores()
+        score_s += time.perf_counter() - s0
+    rolling_s = time.perf_counter() - t0
+    print(f"  rolling     {rolling_s:8.2f} s  {len(texts) / rolling_s:9.0f} posts/s  "
+          f"({len(texts) / rolling_s * 3600 / 1e6:.1f} M posts/h; scores() {score_s / (len(texts) / args.batch) * 1000:.1f} ms/batch)")
+
+    n = min(args.recompute_posts, len(texts))
+    horizon = args.window * 3600
+    window_posts = deque()
+    t0 = time.perf_counter()
+    for start in range(0, n, args.batch):
+        stop = min(start + args.batch, n)
+        window_posts.extend(zip(texts[start:stop], locations[start:stop], timestamps[start:stop]))
+        while window_posts and window_posts[0][2] <= timestamps[stop - 1] - horizon:
+            window_posts.popleft()
+        recompute_scores(lexicon, [(t, l) for t, l, _ in window_posts], ("weak_signals",))
+    recompute_s = time.perf_counter() - t0
+    print(f"  recompute   {recompute_s:8.2f} s  {n / recompute_s:9.0f} posts/s  (first {n:,} posts; "
+          f"window holds {len(window_posts):,} posts at the end)")
+
+
+if __name__ == "__main__":
+    main()
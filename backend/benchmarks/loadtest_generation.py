@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Load-test harness for the generation path against a local stub Ollama.
+
+The stub models a single GPU as a processor-sharing server: each request needs
+`--work` seconds of exclusive compute, active requests share the device, and
+efficiency degrades once more than `--sweet-spot` run together (KV-cache
+thrashing / swapping), which is what happens to a real Ollama under bursts.
+
+Two client modes are compared on the same bursty arrival trace:
+  unbounded - every request goes straight to /api/generate (current behaviour)
+  scheduled - requests pass through GenerationScheduler (concurrency limit,
+              priority queue, 429/503 backpressure)
+
+Run from backend/:  python benchmarks/loadtest_generation.py --requests 200 --rate 4
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from http_pool import HTTPClientPool, Upstream
+from generation_scheduler import GenerationScheduler, SchedulerOverloaded
+
+
+class StubOllama:
+    """Minimal HTTP/1.1 server answering POST /api/generate with simulated GPU contention."""
+    def __init__(self, work: float, sweet_spot: int, penalty: float):
+        self.work = work
+        self.sweet_spot = sweet_spot
+        self.penalty = penalty
+        self.active = 0
+        self.peak_active = 0
+
+    def _rate(self) -> float:
+        # Share of the device each active request gets per second
+        over = max(0, self.active - self.sweet_spot)
+        efficiency = 1.0 / (1.0 + self.penalty * over)
+        return efficiency / max(self.active, 1)
+
+    async def _generate(self):
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        done, tick = 0.0, 0.01
+        try:
+            while done < self.work:
+                await asyncio.sleep(tick)
+                done += tick * self._rate()
+        finally:
+            self.active -= 1
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.decode().split("\r\n"):
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                await reader.readexactly(length)
+                await self._generate()
+                body = json.dumps({"response": "stub answer", "done": True}).encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+async def run_mode(mode: str, args, port: int, arrivals, modes):
+    pool = HTTPClientPool()
+    pool.register(Upstream("ollama", base_url=f"http://127.0.0.1:{port}", max_connections=1000,
+                           max_keepalive=1000, retries=0,
+                           timeout=httpx.Timeout(args.timeout, connect=5.0, pool=args.timeout)))
+    scheduler = GenerationScheduler(max_concurrency=args.concurrency, max_queue=args.max_queue,
+                                    deadlines={"STRICT_FACT_CHECK": args.deadline_strict,
+                                               "STANDARD": args.deadline_standard})
+    latencies = {"STRICT_FACT_CHECK": [], "STANDARD": []}
+    outcome = {"ok": 0, "timeout": 0, "rejected_429": 0, "rejected_503": 0}
+
+    async def one(delay, query_mode):
+        await asyncio.sleep(delay)
+        t0 = time.perf_counter()
+        try:
+            if mode == "scheduled":
+                async with scheduler.slot(query_mode):
+                    await pool.request("ollama", "POST", "/api/generate", json={"prompt": "q", "stream": False})
+            else:
+                await pool.request("ollama", "POST", "/api/generate", json={"prompt": "q", "stream": False})
+            outcome["ok"] += 1
+            latencies[query_mode].append(time.perf_counter() - t0)
+        except SchedulerOverloaded as e:
+            outcome[f"rejected_{e.status_code}"] += 1
+        except Exception:
+            outcome["timeout"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(d, m) for d, m in zip(arrivals, modes)))
+    wall = time.perf_counter() - started
+    await pool.aclose()
+
+    print(f"\n[{mode}] wall={wall:.1f}s throughput={outcome['ok'] / wall:.2f} req/s  {outcome}")
+    for query_mode, values in latencies.items():
+        if values:
+            print(f"  {query_mode:<18} n={len(values):4d} p50={np.percentile(values, 50):6.2f}s "
+                  f"p99={np.percentile(values, 99):6.2f}s")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=4.0, help="mean arrivals per second during bursts")
+    parser.add_argument("--work", type=float, default=0.5, help="GPU-seconds per generation")
+    parser.add_argument("--sweet-spot", type=int, default=4)
+    parser.add_argument("--penalty", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=32)
+    parser.add_argument("--deadline-strict", type=float, default=10.0)
+    parser.add_argument("--deadline-standard", type=float, default=30.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--strict-share", type=float, default=0.3)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    # Bursty trace: alternating bursts at 2x rate and lulls at 0.25x rate
+    arrivals, t = [], 0.0
+    for i in range(args.requests):
+        burst = (i // 40) % 2 == 0
+        t += rng.expovariate(args.rate * (2.0 if burst else 0.25))
+        arrivals.append(t)
+    modes = ["STRICT_FACT_CHECK" if rng.random() < args.strict_share else "STANDARD" for _ in arrivals]
+
+    for mode in ("unbounded", "scheduled"):
+        stub = StubOllama(args.work, args.sweet_spot, args.penalty)
+        server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            await run_mode(mode, args, port, arrivals, modes)
+        print(f"  stub peak concurrent generations: {stub.peak_active}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,141 @@
+import os
+import json
+import fcntl
+import hashlib
+import numpy as np
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Sequence
+from retrieval_index import normalize_rows
+
+
+class EmbeddingStore:
+    """
+    مخزن المتجهات الدائم (Persistent Embedding Store)
+    Keeps the knowledge-base embeddings on disk as a raw float32 matrix that is
+    memory-mapped read-only, so every uvicorn worker shares the same page cache
+    instead of holding a private copy. A manifest records the content hash of
+    each row, which lets a restart re-embed only entries that were added or edited.
+    Rows are stored L2-normalised so cosine similarity is a plain dot product.
+    """
+    FORMAT_VERSION = 2
+    VECTORS_FILE = "vectors.f32"
+    MANIFEST_FILE = "manifest.json"
+    LOCK_FILE = ".lock"
+
+    def __init__(self, store_dir: str, model_name: str):
+        self.store_dir = store_dir
+        self.model_name = model_name
+        self.vectors_path = os.path.join(store_dir, self.VECTORS_FILE)
+        self.manifest_path = os.path.join(store_dir, self.MANIFEST_FILE)
+        self.lock_path = os.path.join(store_dir, self.LOCK_FILE)
+        self.vectors: Optional[np.ndarray] = None
+        self.hashes: List[str] = []
+        self.stats = {"reused": 0, "embedded": 0}
+        os.makedirs(store_dir, exist_ok=True)
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def _exclusive_lock(self):
+        # Serialises rebuilds between workers booting at the same time
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> Optional[dict]:
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except Exception as e:
+            print(f"Warning: Embedding manifest unreadable, rebuilding: {e}")
+            return None
+        if manifest.get("format_version") != self.FORMAT_VERSION or manifest.get("model") != self.model_name:
+            return None
+        expected = manifest.get("count", 0) * manifest.get("dim", 0) * 4
+        if not os.path.exists(self.vectors_path) or os.path.getsize(self.vectors_path) != expected:
+            return None
+        return manifest
+
+    def _map(self, manifest: dict) -> Optional[np.ndarray]:
+        if manifest["count"] == 0:
+            return None
+        # Read-only mapping: zero copy, pages are shared across processes
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                         shape=(manifest["count"], manifest["dim"]))
+
+    def _write(self, matrix: np.ndarray, hashes: List[str]):
+        tmp_vectors = self.vectors_path + ".tmp"
+        tmp_manifest = self.manifest_path + ".tmp"
+        matrix.astype(np.float32, copy=False).tofile(tmp_vectors)
+        manifest = {
+            "format_version": self.FORMAT_VERSION,
+            "model": self.model_name,
+            "count": int(matrix.shape[0]),
+            "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+            "hashes": hashes,
+        }
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        # Vectors first, manifest last: readers validate size against the manifest
+        os.replace(tmp_vectors, self.vectors_path)
+        os.replace(tmp_manifest, self.manifest_path)
+        return manifest
+
+    def sync(self, texts: Sequence[str], encode: Callable[[List[str]], np.ndarray]) -> Optional[np.ndarray]:
+        """
+        Aligns the on-disk matrix with `texts` (row i <-> texts[i]).
+        Unchanged rows are copied from the existing mapping; only new or edited
+        texts are passed to `encode`. Returns the read-only memmap.
+        """
+        hashes = [self.content_hash(t) for t in texts]
+
+        manifest = self._read_manifest()
+        if manifest is not None and manifest["hashes"] == hashes:
+            # Fast path: nothing changed, no lock and no copy
+            self.stats = {"reused": len(hashes), "embedded": 0}
+            self.vectors, self.hashes = self._map(manifest), hashes
+            return self.vectors
+
+        with self._exclusive_lock():
+            # Another worker may have finished the rebuild while we waited
+            manifest = self._read_manifest()
+            if manifest is not None and manifest["hashes"] == hashes:
+                self.stats = {"reused": len(hashes), "embedded": 0}
+                self.vectors, self.hashes = self._map(manifest), hashes
+                return self.vectors
+
+            if not texts:
+                manifest = self._write(np.zeros((0, 0), dtype=np.float32), [])
+                self.stats = {"reused": 0, "embedded": 0}
+                self.vectors, self.hashes = None, []
+                return None
+
+            old = self._map(manifest) if manifest else None
+            old_rows = {h: i for i, h in enumerate(manifest["hashes"])} if manifest else {}
+
+            missing = [i for i, h in enumerate(hashes) if h not in old_rows]
+            fresh = None
+            if missing:
+                fresh = normalize_rows(encode([texts[i] for i in missing]))
+
+            dim = fresh.shape[1] if fresh is not None else old.shape[1]
+            matrix = np.empty((len(texts), dim), dtype=np.float32)
+            fresh_pos = {row: j for j, row in enumerate(missing)}
+            for i, h in enumerate(hashes):
+                if i in fresh_pos:
+                    matrix[i] = fresh[fresh_pos[i]]
+                else:
+                    matrix[i] = old[old_rows[h]]
+            del old
+
+            manifest = self._write(matrix, hashes)
+            self.stats = {"reused": len(texts) - len(missing), "embedded": len(missing)}
+            self.vectors, self.hashes = self._map(manifest), hashes
+            return self.vectors
@@ -0,0 +1,147 @@
+import os
+import json
+import hashlib
+import tempfile
+from typing import Dict, Any, Optional
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "forensic_cache")
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Streams the file through SHA-256 without holding it in memory."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ForensicCache:
+    """
+    ذاكرة التحليل الجنائي (Content-Addressed Forensic Cache)
+    On-disk store shared by every process on the host (API, forensic worker
+    pool, CLI batch runs):
+      results/ab/<key>.json  - forensic reports, key = SHA-256(file digest + analysis params)
+      objects/ab/<digest>.json - per storage backend, an object already holding these
+                               bytes (name + fingerprint to detect later overwrites),
+                               used by StorageManager to deduplicate uploads
+    Writes are atomic (temp file + rename). Results are evicted least recently
+    used (by mtime, refreshed on every hit) once they exceed `max_bytes`.
+    """
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or os.getenv("FORENSIC_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else \
+            int(os.getenv("FORENSIC_CACHE_MAX_MB", "512")) * 1024 * 1024
+        self.results_dir = os.path.join(self.root, "results")
+        self.objects_dir = os.path.join(self.root, "objects")
+        self._bytes_used: Optional[int] = None
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @staticmethod
+    def key(digest: str, params: Dict[str, Any]) -> str:
+        return hashlib.sha256(f"{digest}\x1f{json.dumps(params, sort_keys=True)}".encode("utf-8")).hexdigest()
+
+    def _path(self, directory: str, name: str, suffix: str = "") -> str:
+        return os.path.join(directory, name[:2], name + suffix)
+
+    def _write(self, path: str, payload: bytes) -> int:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return len(payload)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(self.results_dir, key, ".json")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        payload = json.dumps(value).encode("utf-8")
+        if len(payload) > self.max_bytes:
+            return
+        try:
+            size = self._write(self._path(self.results_dir, key, ".json"), payload)
+        except OSError as e:
+            print(f"Forensic cache write failed: {e}")
+            return
+        self.stats["stores"] += 1
+        if self._bytes_used is None:
+            self._bytes_used = self._scan_size()
+        else:
+            self._bytes_used += size
+        if self._bytes_used > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.results_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield st.st_mtime, st.st_size, path
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Other processes write to the same store: re-measure before deleting anything
+        entries = sorted(self._entries())
+        used = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in entries:
+            if used <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            used -= size
+            self.stats["evictions"] += 1
+        self._bytes_used = used
+
+    def object_for(self, digest: str, backend: str) -> Optional[Dict[str, Any]]:
+        """Last object stored on `backend` with exactly these bytes: {"name", "fingerprint"}."""
+        try:
+            with open(self._path(self.objects_dir, digest, ".json"), 'r', encoding='utf-8') as f:
+                return json.load(f).get(backend)
+        except (OSError, ValueError):
+            return None
+
+    def remember_object(self, digest: str, backend: str, name: str, fingerprint: str):
+        path = self._path(self.objects_dir, digest, ".json")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                known = json.load(f)
+        except (OSError, ValueError):
+            known = {}
+        known[backend] = {"name": name, "fingerprint": fingerprint}
+        try:
+            self._write(path, json.dumps(known).encode("utf-8"))
+        except OSError as e:
+            print(f"Forensic cache write failed: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "bytes_used": self._bytes_used,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,151 @@
+import os
+import time
+import uuid
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional
+
+import sherloq_cli
+
+
+def _warm_up():
+    """Runs once per pool process: pays the NumPy/PIL/exifread import and first-decode cost up front."""
+    import io
+    import numpy as np
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.fromarray(np.zeros((16, 16, 3), dtype=np.uint8)).save(buf, 'JPEG')
+    Image.open(io.BytesIO(buf.getvalue())).convert('RGB')
+    np.fft.rfft2(np.zeros((8, 8)))
+
+
+class ForensicQueueFull(Exception):
+    pass
+
+
+class ForensicWorker:
+    """
+    عامل التحليل الجنائي المقيم (Resident Forensic Worker)
+    Keeps a pool of warm processes with the Sherloq analysis modules already
+    imported, so a job costs only the ELA/FFT/EXIF work instead of a fresh
+    interpreter per image. Jobs are queued with an ID and polled for results;
+    images whose bytes were analysed before are served from the result cache.
+    Inputs submitted with `delete_after` are removed once their job finishes,
+    fails or is dropped at shutdown.
+    """
+    def __init__(self, workers: Optional[int] = None, max_queue: int = 256, result_ttl: float = 3600.0):
+        self.workers = workers or int(os.getenv("FORENSIC_WORKERS", str(os.cpu_count() or 2)))
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._owned_inputs: set = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._dispatchers = []
+
+    async def start(self):
+        if self._pool is not None:
+            return
+        # forkserver, not fork: by now the API process has torch loaded and runs threads
+        # (HTTP pool, writer/audit flushers), and forking it could leave their locks held
+        # in the child. The server is a fresh single-threaded interpreter that imports only
+        # this module (sherloq_cli, NumPy, PIL) once; workers fork from it already warm.
+        # __main__ is not preloaded: under `uvicorn main:app` it is uvicorn's entry point.
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload([__name__])
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=_warm_up)
+        # Spawn and warm every process now rather than on the first uploads
+        for _ in range(self.workers):
+            self._pool.submit(os.getpid)
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+        while self._queue is not None and not self._queue.empty():
+            _, image_path = self._queue.get_nowait()
+            self._discard_input(image_path)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def submit(self, image_path: str, delete_after: bool = False) -> str:
+        """Queues a job; raises ForensicQueueFull (the input is then left to the caller)."""
+        if self._queue is None:
+            raise RuntimeError("Forensic worker not started")
+        self._expire()
+        job_id = uuid.uuid4().hex
+        job = {"job_id": job_id, "status": "queued", "target": os.path.basename(image_path),
+               "created_at": time.time(), "finished_at": None, "result": None, "error": None}
+        try:
+            self._queue.put_nowait((job_id, image_path))
+        except asyncio.QueueFull:
+            raise ForensicQueueFull("Forensic queue is full, retry later")
+        self.jobs[job_id] = job
+        if delete_after:
+            self._owned_inputs.add(image_path)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.jobs.get(job_id)
+
+    def _discard_input(self, image_path: str):
+        if image_path in self._owned_inputs:
+            self._owned_inputs.discard(image_path)
+            try:
+                os.unlink(image_path)
+            except FileNotFoundError:
+                pass
+
+    async def analyze(self, image_path: str) -> Dict[str, Any]:
+        """Runs one analysis on the warm pool and waits for it (no job bookkeeping)."""
+        await self.start()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, sherloq_cli.analyze_file, image_path)
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id, image_path = await self._queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is None:
+                    continue
+                job["status"] = "running"
+                # Repeat submissions of the same bytes are answered here without a pool round trip
+                result = await asyncio.to_thread(sherloq_cli.cached_report, image_path)
+                if result is None:
+                    result = await loop.run_in_executor(self._pool, sherloq_cli.analyze_file, image_path)
+                job["result"] = result
+                job["status"] = "done"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+            finally:
+                if job is not None:
+                    job["finished_at"] = time.time()
+                self._discard_input(image_path)
+                self._queue.task_done()
+
+    def _expire(self):
+        cutoff = time.time() - self.result_ttl
+        for job_id in [j for j, job in self.jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+            del self.jobs[job_id]
+
+    def metrics(self) -> Dict[str, Any]:
+        cache = sherloq_cli.get_cache()
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "jobs": counts,
+            "cache": cache.metrics() if cache is not None else None,
+        }
@@ -0,0 +1,146 @@
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Tuple
+
+# Lower value = served first
+PRIORITY_CLASSES = {
+    "STRICT_FACT_CHECK": 0,
+    "STANDARD": 1,
+}
+
+
+class SchedulerOverloaded(Exception):
+    """
+    Raised instead of queueing a generation that cannot be served in time.
+    status_code 429: queue full at admission; 503: queue deadline expired.
+    """
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class GenerationScheduler:
+    """
+    جدولة التوليد (Generation Scheduler)
+    Bounds concurrent requests to the model backend. Requests beyond
+    `max_concurrency` wait in a priority queue (STRICT_FACT_CHECK first,
+    FIFO within a class) for at most their class deadline; when the queue
+    holds `max_queue` waiters new requests are rejected immediately with a
+    Retry-After estimate rather than piling up upstream timeouts.
+    """
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 64,
+                 deadlines: Dict[str, float] = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadlines = deadlines or {"STRICT_FACT_CHECK": 15.0, "STANDARD": 45.0}
+        self.active = 0
+        self.waiting = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._service_ewma = 5.0
+        self.stats = {"admitted": 0, "queued": 0, "rejected_queue_full": 0,
+                      "rejected_deadline": 0, "completed": 0}
+        self._queue_waits: Dict[str, List[float]] = {}
+
+    @classmethod
+    def from_env(cls) -> "GenerationScheduler":
+        return cls(
+            max_concurrency=int(os.getenv("GEN_MAX_CONCURRENCY", "4")),
+            max_queue=int(os.getenv("GEN_MAX_QUEUE", "64")),
+            deadlines={
+                "STRICT_FACT_CHECK": float(os.getenv("GEN_DEADLINE_STRICT", "15")),
+                "STANDARD": float(os.getenv("GEN_DEADLINE_STANDARD", "45")),
+            },
+        )
+
+    def retry_after(self) -> int:
+        # Time for the current queue to drain through the available slots
+        return max(1, math.ceil((self.waiting + 1) * self._service_ewma / self.max_concurrency))
+
+    def check_admission(self):
+        """Fails fast (429) when a new request would not even fit in the queue."""
+        if self.active >= self.max_concurrency and self.waiting >= self.max_queue:
+            self.stats["rejected_queue_full"] += 1
+            raise SchedulerOverloaded(429, self.retry_after(), "Generation queue is full")
+
+    def _record_wait(self, mode: str, seconds: float):
+        waits = self._queue_waits.setdefault(mode, [])
+        waits.append(seconds)
+        if len(waits) > 1024:
+            del waits[:512]
+
+    async def _acquire(self, mode: str):
+        if self.active < self.max_concurrency and self.waiting == 0:
+            self.active += 1
+            return
+        self.check_admission()
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITY_CLASSES.get(mode, 1), next(self._seq), fut))
+        self.waiting += 1
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=self.deadlines.get(mode, 45.0))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                # The slot was handed over just as we gave up: give it back
+                if isinstance(e, asyncio.CancelledError):
+                    self._release()
+                    raise
+                return
+            fut.cancel()
+            self.waiting -= 1
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.stats["rejected_deadline"] += 1
+            raise SchedulerOverloaded(503, self.retry_after(), f"Generation deadline exceeded for {mode}")
+
+    def _release(self):
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                # Hand the slot straight to the next waiter; `active` is unchanged
+                self.waiting -= 1
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, mode: str = "STANDARD"):
+        queued_at = time.monotonic()
+        await self._acquire(mode)
+        started = time.monotonic()
+        self._record_wait(mode, started - queued_at)
+        self.stats["admitted"] += 1
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._service_ewma = 0.8 * self._service_ewma + 0.2 * elapsed
+            self.stats["completed"] += 1
+            self._release()
+
+    def metrics(self) -> Dict[str, Any]:
+        waits = {}
+        for mode, values in self._queue_waits.items():
+            ordered = sorted(values)
+            waits[mode] = {
+                "p50_ms": round(1000 * ordered[len(ordered) // 2], 1),
+                "p99_ms": round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 1),
+            }
+        return {
+            **self.stats,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "service_time_ewma_s": round(self._service_ewma, 3),
+            "queue_wait": waits,
+        }
@@ -0,0 +1,201 @@
+import os
+import re
+import json
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Harakat, superscript alef and tatweel: ignored anywhere inside a word
+_ARABIC_MARKS = "\u064B-\u065F\u0670\u0640"
+_MARKS_RE = re.compile(f"[{_ARABIC_MARKS}]")
+_SKIP = f"[{_ARABIC_MARKS}]*"
+
+# Orthographic variants (alef, ya, ta marbuta) folded onto one canonical letter
+_VARIANTS = {
+    "ا": "اأإآٱ",
+    "ي": "يى",
+    "ه": "هة",
+}
+_FOLD = {v: k for k, group in _VARIANTS.items() for v in group}
+
+
+def normalize_arabic(text: str) -> str:
+    """Canonical form used for rule terms: lowercase, no diacritics/tatweel, folded letter variants."""
+    text = " ".join(_MARKS_RE.sub("", text.lower()).split())
+    return "".join(_FOLD.get(ch, ch) for ch in text)
+
+
+def _spellings(ch: str) -> str:
+    """Every raw character that normalises to `ch` (letter variants and upper case)."""
+    upper = ch.upper()
+    return _VARIANTS.get(ch, ch) + (upper if len(upper) == 1 and upper != ch else "")
+
+
+def _char_regex(ch: str) -> str:
+    if ch.isspace():
+        return r"\s+"
+    spellings = _spellings(ch)
+    atom = re.escape(ch) if len(spellings) == 1 else f"[{re.escape(spellings)}]"
+    return atom + _SKIP if "\u0600" <= ch <= "\u06FF" else atom
+
+
+def compile_terms(terms) -> Optional[re.Pattern]:
+    """
+    Compiles normalised terms into one trie-shaped alternation (shared prefixes
+    are matched once) that accepts every spelling variant and letter case
+    directly on the raw text, so neither lower() nor normalisation costs a pass.
+    """
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node) -> str:
+        branches = [_char_regex(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # Greedy optional tail: the longest term sharing this prefix wins
+        return f"(?:{body})?" if "" in node else body
+
+    if not trie:
+        return None
+    # Top-level branches start with plain literals (variants expanded) so the
+    # regex engine can build a first-character prefilter and skip in C
+    roots = []
+    for ch, child in sorted(trie.items()):
+        tail = (_SKIP if "\u0600" <= ch <= "\u06FF" else "") + emit(child)
+        for variant in _spellings(ch):
+            roots.append(re.escape(variant) + tail)
+    return re.compile("|".join(roots))
+
+
+class GuardrailEngine:
+    """
+    محرك حواجز الحماية (Compiled Guardrail Matcher)
+    Each rule category is compiled into one trie regex, so a text is scanned
+    once per category rather than once per term. Categories are scanned
+    independently: a term of one category overlapping a term of another (e.g.
+    "weak gender bias") cannot hide it, as with the original per-pattern
+    search. Rules are loaded from a JSON file and reloaded automatically when
+    it changes.
+    """
+    def __init__(self, rules_path: str, reload_interval: float = 2.0):
+        self.rules_path = rules_path
+        self.reload_interval = reload_interval
+        self.version = None
+        self.labels: Dict[str, str] = {}
+        self.max_term_length = 0
+        self._terms: Dict[str, str] = {}
+        self._patterns: Dict[str, re.Pattern] = {}
+        self._mtime = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self) -> bool:
+        try:
+            mtime = os.path.getmtime(self.rules_path)
+            with open(self.rules_path, "r", encoding="utf-8") as f:
+                rules = json.load(f)
+            self._compile(rules)
+            self._mtime = mtime
+            return True
+        except Exception as e:
+            # Keep serving the previous rule set if the new file is broken
+            print(f"Warning: Guardrail rules not (re)loaded from {self.rules_path}: {e}")
+            return False
+
+    def _compile(self, rules: Dict):
+        labels: Dict[str, str] = {}
+        terms: Dict[str, str] = {}
+        patterns: Dict[str, re.Pattern] = {}
+        for category, spec in rules.get("categories", {}).items():
+            labels[category] = spec.get("label", category)
+            keys = []
+            for original in spec.get("terms", []):
+                key = normalize_arabic(original)
+                if key:
+                    terms.setdefault(key, original)
+                    keys.append(key)
+            pattern = compile_terms(keys)
+            if pattern is not None:
+                patterns[category] = pattern
+        with self._lock:
+            self.version = rules.get("version")
+            self.labels, self._terms, self._patterns = labels, terms, patterns
+            self.max_term_length = max((len(t) for t in terms), default=0)
+
+    def maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return
+        self._last_check = now
+        try:
+            if os.path.getmtime(self.rules_path) != self._mtime:
+                self.reload()
+        except OSError:
+            pass
+
+    def classify(self, text: str, categories=None) -> Dict[str, List[str]]:
+        """
+        Returns {category: [matched rule terms in order of first appearance]}.
+        `categories` restricts the scan to a subset (e.g. only "bias" for model output).
+        """
+        self.maybe_reload()
+        hits: Dict[str, List[str]] = {}
+        if not text:
+            return hits
+        patterns, terms = self._patterns, self._terms
+        for category, pattern in patterns.items():
+            if categories is not None and category not in categories:
+                continue
+            found = []
+            for m in pattern.finditer(text):
+                original = terms[normalize_arabic(m.group(0))]
+                if original not in found:
+                    found.append(original)
+            if found:
+                hits[category] = found
+        return hits
+
+
+class StreamAuditor:
+    """
+    Incremental output audit for streamed generations.
+    Each fragment is scanned together with a tail of the previous text (one
+    window long), so terms split across fragments are still caught and the
+    cost per fragment stays constant. Text is released only once it has left
+    the window, which keeps a flagged phrase from reaching the client.
+    """
+    def __init__(self, engine: GuardrailEngine, categories=None, window: Optional[int] = None):
+        self.engine = engine
+        self.categories = categories
+        # Raw matches may be longer than the term (diacritics, repeated spaces)
+        self.window = window or 2 * engine.max_term_length + 16
+        self._tail = ""
+        self.emitted = 0
+
+    def feed(self, fragment: str) -> Tuple[str, Dict[str, List[str]]]:
+        """Returns (text safe to emit now, hits). Non-empty hits mean the stream must stop."""
+        scan = self._tail + fragment
+        hits = self.engine.classify(scan, self.categories)
+        if hits:
+            return "", hits
+        release = max(len(scan) - self.window, 0)
+        safe, self._tail = scan[:release], scan[release:]
+        self.emitted += len(safe)
+        return safe, hits
+
+    @property
+    def held(self) -> str:
+        """Text scanned but not yet released (what a block withholds from the client)."""
+        return self._tail
+
+    def flush(self) -> str:
+        """Releases the held-back tail once the upstream stream has finished cleanly."""
+        rest, self._tail = self._tail, ""
+        self.emitted += len(rest)
+        return rest
@@ -0,0 +1,179 @@
+import os
+import time
+import random
+import asyncio
+import httpx
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+# Retried only when the request never reached the upstream (safe for POST too)
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+RETRYABLE_STATUS = {502, 503, 504}
+
+
+class Upstream:
+    """Connection policy for one upstream service."""
+    def __init__(self, name: str, base_url: str = "", max_connections: int = 20,
+                 max_keepalive: int = 10, timeout: Optional[httpx.Timeout] = None,
+                 retries: int = 2, backoff: float = 0.25):
+        self.name = name
+        self.base_url = base_url
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive,
+                                   keepalive_expiry=30.0)
+        self.timeout = timeout or httpx.Timeout(30.0, connect=5.0)
+        self.retries = retries
+        self.backoff = backoff
+        # Saturation metrics
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.pool_timeouts = 0
+        self.wait_time_total = 0.0
+
+
+class HTTPClientPool:
+    """
+    طبقة الاتصال المشتركة (Shared HTTP Client Layer)
+    One long-lived httpx.AsyncClient per upstream (Ollama, open-meteo, ...)
+    with bounded connection pools, keep-alive, per-upstream timeouts and
+    retry with exponential backoff. Opened/closed by the FastAPI lifespan;
+    clients are also created lazily so scripts can use it without an app.
+    """
+    def __init__(self):
+        self.upstreams: Dict[str, Upstream] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def register(self, upstream: Upstream):
+        self.upstreams[upstream.name] = upstream
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            upstream = self.upstreams[name]
+            client = httpx.AsyncClient(base_url=upstream.base_url, limits=upstream.limits,
+                                       timeout=upstream.timeout)
+            self._clients[name] = client
+        return client
+
+    async def start(self):
+        for name in self.upstreams:
+            self.client(name)
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        await asyncio.gather(*(c.aclose() for c in clients.values()), return_exceptions=True)
+
+    def _enter(self, upstream: Upstream):
+        upstream.requests += 1
+        upstream.in_flight += 1
+        upstream.peak_in_flight = max(upstream.peak_in_flight, upstream.in_flight)
+
+    async def _backoff(self, upstream: Upstream, attempt: int):
+        upstream.retried += 1
+        await asyncio.sleep(upstream.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        upstream = self.upstreams[name]
+        client = self.client(name)
+        self._enter(upstream)
+        try:
+            for attempt in range(upstream.retries + 1):
+                started = time.perf_counter()
+                try:
+                    res = await client.request(method, url, **kwargs)
+                except RETRYABLE_ERRORS as e:
+                    if isinstance(e, httpx.PoolTimeout):
+                        upstream.pool_timeouts += 1
+                    if attempt == upstream.retries:
+                        upstream.failures += 1
+                        raise
+                    await self._backoff(upstream, attempt)
+                    continue
+                finally:
+                    upstream.wait_time_total += time.perf_counter() - started
+                if res.status_code in RETRYABLE_STATUS and attempt < upstream.retries:
+                    await self._backoff(upstream, attempt)
+                    continue
+                return res
+        finally:
+            upstream.in_flight -= 1
+
+    @asynccontextmanager
+    async def stream(self, name: str, method: str, url: str, **kwargs):
+        """Streaming request; retried only until the response headers arrive."""
+        upstream = self.upstreams[name]
+        client = self.client(name)
+        self._enter(upstream)
+        try:
+            for attempt in range(upstream.retries + 1):
+                started = time.perf_counter()
+                try:
+                    req = client.build_request(method, url, **kwargs)
+                    res = await client.send(req, stream=True)
+                except RETRYABLE_ERRORS as e:
+                    if isinstance(e, httpx.PoolTimeout):
+                        upstream.pool_timeouts += 1
+                    if attempt == upstream.retries:
+                        upstream.failures += 1
+                        raise
+                    await self._backoff(upstream, attempt)
+                    continue
+                finally:
+                    # Time to response headers (time-to-first-byte for streams)
+                    upstream.wait_time_total += time.perf_counter() - started
+                if res.status_code in RETRYABLE_STATUS and attempt < upstream.retries:
+                    await res.aclose()
+                    await self._backoff(upstream, attempt)
+                    continue
+                try:
+                    yield res
+                finally:
+                    await res.aclose()
+                return
+        finally:
+            upstream.in_flight -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        report = {}
+        for name, u in self.upstreams.items():
+            max_conn = u.limits.max_connections
+            report[name] = {
+                "max_connections": max_conn,
+                "max_keepalive": u.limits.max_keepalive_connections,
+                "in_flight": u.in_flight,
+                "peak_in_flight": u.peak_in_flight,
+                "saturation": round(u.in_flight / max_conn, 3) if max_conn else None,
+                "peak_saturation": round(u.peak_in_flight / max_conn, 3) if max_conn else None,
+                "requests": u.requests,
+                "retried": u.retried,
+                "failures": u.failures,
+                "pool_timeouts": u.pool_timeouts,
+                "avg_latency_ms": round(1000 * u.wait_time_total / u.requests, 2) if u.requests else 0.0,
+            }
+        return report
+
+
+def default_pool() -> HTTPClientPool:
+    """Upstreams used by the Sovereign Core, sized from env."""
+    pool = HTTPClientPool()
+    pool.register(Upstream(
+        "ollama",
+        base_url=os.getenv("OLLAMA_URL", "http://host.docker.internal:11434"),
+        max_connections=int(os.getenv("OLLAMA_POOL_SIZE", "32")),
+        max_keepalive=int(os.getenv("OLLAMA_POOL_KEEPALIVE", "16")),
+        # Long read timeout for buffered generations; connect fails fast
+        timeout=httpx.Timeout(120.0, connect=5.0, pool=10.0),
+        retries=int(os.getenv("OLLAMA_RETRIES", "2")),
+    ))
+    pool.register(Upstream(
+        "open_meteo",
+        base_url="https://archive-api.open-meteo.com",
+        max_connections=int(os.getenv("TOOLS_POOL_SIZE", "10")),
+        max_keepalive=5,
+        timeout=httpx.Timeout(10.0, connect=5.0, pool=5.0),
+        retries=2,
+    ))
+    return pool
@@ -3,8 +3,15 @@ import os
 import json
 import time
 import requests
-from datetime import datetime
-from typing import Dict, List, Any
+import numpy as np
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional
+from lexicon import get_lexicon
+from weak_signals import RollingSignalWindow, keyword_counts, batch_column
+from timeseries_writer import get_writer
+
+# Used only when the lexicon file cannot be loaded
+FALLBACK_KEYWORDS = ["إضراب", "انقطاع", "حشد", "أزمة", "طابور"]
 
 class InsightIngestEngine:
     """
@@ -14,6 +21,28 @@ class InsightIngestEngine:
     def __init__(self):
         self.db_url = os.getenv("DATABASE_URL")
         self.risk_threshold = 0.75
+        self.lexicon = get_lexicon()
+        # The scores are calibrated on "weak_signals"; add e.g. weak_signals_extended explicitly
+        self.signal_categories = tuple(os.getenv("INSIGHT_SIGNAL_CATEGORIES", "weak_signals").split(","))
+        self.signal_window = RollingSignalWindow(
+            self.lexicon, self.signal_categories,
+            window_hours=int(os.getenv("SIGNAL_WINDOW_HOURS", "24")),
+        ) if self.lexicon is not None else None
+        # Buffered bulk writer to the TimescaleDB hypertables (None without DATABASE_URL)
+        self.writer = get_writer()
+
+    def record_indicator(self, indicator_type: str, value: float, location_id: Optional[str] = None,
+                         confidence: Optional[float] = None, at: Optional[datetime] = None):
+        """يسجل مؤشراً في insight_indicators (buffered; no-op without a database)."""
+        if self.writer is None:
+            return
+        self.writer.add("insight_indicators", {
+            "time": at or datetime.now(timezone.utc),
+            "indicator_type": indicator_type,
+            "value": value,
+            "location_id": location_id,
+            "confidence_interval": confidence,
+        })
 
     def scan_bgp_anomalies(self) -> Dict[str, Any]:
         """مجس مراقبة الإنترنت (BGP) لكشف محاولات الحجب أو تغيير المسارات."""
@@ -40,23 +69,56 @@ class InsightIngestEngine:
             "capacity_utilization": 0.82
         }
 
+    def signal_hits(self, text_batch: List[str]) -> np.ndarray:
+        """Per text: does it contain a weak-signal term?"""
+        if self.lexicon is not None:
+            counts = keyword_counts(self.lexicon, text_batch, self.signal_categories)
+            return np.diff(counts.indptr) > 0
+        return np.array([any(k in text for k in FALLBACK_KEYWORDS) for text in text_batch], dtype=bool)
+
     def analyze_weak_signals(self, text_batch: List[str]) -> float:
         """تحليل المشاعر والكلمات المفتاحية (OSINT Sentiment)."""
-        keywords = ["إضراب", "انقطاع", "حشد", "أزمة", "طابور"]
-        score = 0.0
-        for text in text_batch:
-            if any(k in text for k in keywords):
-                score += 0.2
-        return min(score, 1.0)
+        hits = int(np.count_nonzero(self.signal_hits(text_batch)))
+        return min(0.2 * hits, 1.0)
+
+    def ingest_posts(self, batch) -> Dict[str, Any]:
+        """
+        يضيف دفعة منشورات إلى النافذة المتحركة (Rolling ingest).
+        `batch` is columnar: {"text", "location", "timestamp"} arrays or a pyarrow Table.
+        Returns the updated rolling score of every location.
+        """
+        if self.signal_window is None:
+            raise RuntimeError("Lexicon not loaded: rolling signal scores are unavailable")
+        self.signal_window.update(batch)
+        scores = self.signal_window.scores()
+        if self.writer is not None:
+            texts, locations = batch_column(batch, "text"), batch_column(batch, "location")
+            timestamps = batch_column(batch, "timestamp")
+            if not np.issubdtype(timestamps.dtype, np.datetime64):
+                timestamps = (timestamps.astype(np.float64) * 1e6).astype("datetime64[us]")
+            times = timestamps.astype("datetime64[us]").astype(datetime)
+            self.writer.add_many("insight_raw_signals", (
+                {"time": t.replace(tzinfo=timezone.utc), "source": "social", "category": "OSINT",
+                 "raw_data": {"text": text, "location": str(loc)}}
+                for text, loc, t in zip(texts, locations, times)
+            ))
+            now = datetime.now(timezone.utc)
+            for location, entry in scores.items():
+                self.record_indicator("weak_signal_score", entry["score"], location, at=now)
+        return scores
 
     def run_inference(self):
         """محرك الاستنتاج الموحد (Causal Reasoning)."""
         bgp = self.scan_bgp_anomalies()
         signals_score = self.analyze_weak_signals(["يوجد ازدحام غير طبيعي أمام المخابز"])
-        
-        # الارتباط السببي (Correlation logic from PDF)
+        self.record_indicator(bgp["type"], bgp["value"], confidence=bgp["confidence"])
+        self.record_indicator("weak_signal_score", signals_score)
+        return self.fuse(bgp["value"], signals_score)
+
+    def fuse(self, bgp_anomalies: float, signals_score: float) -> Dict[str, Any]:
+        """الارتباط السببي (Correlation logic from PDF); cheap enough to re-run on every new signal."""
         # انخفاض BGP + ارتفاع التوتر الاجتماعي = احتمال اضطرابات مدنية
-        probability = (bgp['value'] / 20.0) * 0.4 + (signals_score * 0.6)
+        probability = (bgp_anomalies / 20.0) * 0.4 + (signals_score * 0.6)
         
         prediction = {
             "target": "Civil_Unrest_Probability",
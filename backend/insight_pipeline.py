@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Continuous Insight Engine pipeline.
+
+  python insight_pipeline.py                         live sensors (INSIGHT_*_INTERVAL_S)
+  python insight_pipeline.py --osint-feed posts.jsonl  live, plus OSINT posts appended to a JSONL feed
+  python insight_pipeline.py --record signals.jsonl  live, and record every signal
+  python insight_pipeline.py --replay signals.jsonl [--speed 0]
+      replays a recording (speed 0 = as fast as possible, 1 = real time)
+      and prints the alerts and stage metrics
+
+Recorded signals are JSONL: {"time": epoch seconds, "sensor": "bgp" | "satellite" | "osint", "data": {...}}
+with `data` as returned by the engine's sensor (osint: {"text": ..., "location": ...}).
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional, Callable
+
+import numpy as np
+
+from insight_ingest import InsightIngestEngine
+
+SENSORS = ("bgp", "satellite", "osint")
+
+
+class StageStats:
+    """Counters and a rolling latency sample (seconds) for one pipeline stage."""
+    def __init__(self, queue: Optional[asyncio.Queue] = None, sample: int = 1024):
+        self.queue = queue
+        self.processed = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=sample)
+
+    def observe(self, seconds: float, items: int = 1):
+        self.processed += items
+        self.latencies.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lat = np.array(self.latencies) * 1000 if self.latencies else None
+        return {
+            "processed": self.processed,
+            "errors": self.errors,
+            "queue_depth": self.queue.qsize() if self.queue is not None else None,
+            "queue_max": self.queue.maxsize if self.queue is not None else None,
+            "latency_ms_p50": round(float(np.percentile(lat, 50)), 3) if lat is not None else None,
+            "latency_ms_p99": round(float(np.percentile(lat, 99)), 3) if lat is not None else None,
+        }
+
+
+class InsightPipeline:
+    """
+    خط الاستبصار المستمر (Streaming Insight Pipeline)
+    Each sensor is an independent producer feeding its own bounded queue
+    (a slow stage makes its producer wait instead of growing memory). Sensor
+    stages turn raw signals into readings and push them to the fusion
+    stage, which keeps the latest reading per sensor and re-runs
+    `engine.fuse` on every update. A prediction row goes to
+    insight_predictions only when the probability crosses `alert_threshold`
+    upwards, or falls back below it by `hysteresis` (all clear), so a value
+    hovering at the threshold does not flood the table.
+    OSINT texts are matched in micro-batches of up to `osint_batch`; their
+    reading is the share of the last `osint_window` texts carrying a signal
+    term, relative to `osint_saturation` (as in RollingSignalWindow).
+    """
+    def __init__(self, engine: InsightIngestEngine, queue_size: int = 1000, alert_threshold: float = 0.6,
+                 hysteresis: float = 0.05, osint_batch: int = 256, osint_window: int = 500,
+                 osint_saturation: float = 0.25, horizon_hours: float = 24.0,
+                 record_path: Optional[str] = None, on_alert: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.engine = engine
+        self.alert_threshold = alert_threshold
+        self.hysteresis = hysteresis
+        self.osint_batch = osint_batch
+        self.osint_saturation = osint_saturation
+        self._osint_recent: deque = deque(maxlen=osint_window)
+        self._osint_hits = 0
+        self.horizon = timedelta(hours=horizon_hours)
+        self.record_path = record_path
+        self.on_alert = on_alert
+        self.queues = {name: asyncio.Queue(maxsize=queue_size) for name in SENSORS}
+        self.fusion_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.stats = {name: StageStats(q) for name, q in self.queues.items()}
+        self.stats["fusion"] = StageStats(self.fusion_queue)
+        # Latest reading per sensor; BGP and OSINT feed the probability
+        self.state: Dict[str, Any] = {"bgp_anomalies": 0.0, "signals_score": 0.0, "shadow_depth": None}
+        self.prediction: Optional[Dict[str, Any]] = None
+        self.alerting = False
+        self.alerts: deque = deque(maxlen=100)
+        self._producers: List[asyncio.Task] = []
+        self._stages: List[asyncio.Task] = []
+        self._record = None
+
+    # --- producers -------------------------------------------------------
+
+    async def emit(self, sensor: str, data: Dict[str, Any], at: Optional[float] = None):
+        """Queues one raw signal (waits while the sensor's queue is full)."""
+        signal = {"time": at if at is not None else time.time(), "sensor": sensor, "data": data}
+        if self._record is not None:
+            self._record.write(json.dumps(signal, ensure_ascii=False) + "\n")
+        await self.queues[sensor].put((time.perf_counter(), signal))
+
+    async def poll(self, sensor: str, read: Callable[[], Any], interval: float):
+        """Producer that calls a blocking sensor every `interval` seconds, off the event loop."""
+        while True:
+            started = time.monotonic()
+            try:
+                data = await asyncio.to_thread(read)
+            except Exception as e:
+                self.stats[sensor].errors += 1
+                print(f"[pipeline] {sensor} sensor failed: {e}")
+            else:
+                for item in (data if isinstance(data, list) else [data]):
+                    await self.emit(sensor, item)
+            await asyncio.sleep(max(interval - (time.monotonic() - started), 0))
+
+    async def replay(self, path: str, speed: float = 0.0, lockstep: bool = True):
+        """
+        Producer that re-emits a recording; with speed > 0 the original gaps are kept (scaled).
+        `lockstep` lets the stages settle whenever the sensor changes and after every OSINT
+        micro-batch, so signals are fused in recorded order and a replay raises the same
+        alerts every time (at some cost in throughput).
+        """
+        first_signal = first_wall = None
+        previous, run = None, 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                signal = json.loads(line)
+                if speed > 0:
+                    if first_signal is None:
+                        first_signal, first_wall = signal["time"], time.monotonic()
+                    delay = (signal["time"] - first_signal) / speed - (time.monotonic() - first_wall)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                if lockstep:
+                    if signal["sensor"] != previous or run == self.osint_batch:
+                        await self._settle()
+                        previous, run = signal["sensor"], 0
+                    run += 1
+                await self.emit(signal["sensor"], signal["data"], at=signal["time"])
+
+    async def _settle(self):
+        for queue in self.queues.values():
+            await queue.join()
+        await self.fusion_queue.join()
+
+    async def follow(self, sensor: str, path: str, poll_interval: float = 1.0):
+        """Producer that tails a JSONL feed (one signal payload per line), like `tail -f`."""
+        with open(path, "r", encoding="utf-8") as f:
+            f.seek(0, os.SEEK_END)
+            while True:
+                line = f.readline()
+                if not line:
+                    await asyncio.sleep(poll_interval)
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    self.stats[sensor].errors += 1
+                    continue
+                await self.emit(sensor, data)
+
+    # --- stages ----------------------------------------------------------
+
+    def _read_bgp(self, signal: Dict[str, Any]):
+        data = signal["data"]
+        self.state["bgp_anomalies"] = float(data["value"])
+        self.engine.record_indicator(data.get("type", "bgp_anomalies"), float(data["value"]),
+                                     confidence=data.get("confidence"), at=_utc(signal["time"]))
+
+    def _read_satellite(self, signal: Dict[str, Any]):
+        data = signal["data"]
+        self.state["shadow_depth"] = float(data["value"])
+        self.engine.record_indicator(data.get("type", "shadow_depth"), float(data["value"]),
+                                     location_id=data.get("object"), at=_utc(signal["time"]))
+
+    async def _reading_stage(self, sensor: str, read: Callable[[Dict[str, Any]], None]):
+        queue, stats = self.queues[sensor], self.stats[sensor]
+        while True:
+            enqueued, signal = await queue.get()
+            try:
+                read(signal)
+            except Exception as e:
+                stats.errors += 1
+                print(f"[pipeline] bad {sensor} signal: {e}")
+            else:
+                await self.fusion_queue.put((enqueued, signal["time"], sensor))
+            stats.observe(time.perf_counter() - enqueued)
+            queue.task_done()
+
+    async def _osint_stage(self):
+        queue, stats = self.queues["osint"], self.stats["osint"]
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.osint_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            texts = [signal["data"].get("text", "") for _, signal in batch]
+            try:
+                hits = await asyncio.to_thread(self.engine.signal_hits, texts)
+            except Exception as e:
+                stats.errors += 1
+                print(f"[pipeline] osint stage failed on {len(batch)} texts: {e}")
+            else:
+                # Sliding share of the last `osint_window` texts that carry a signal term,
+                # so the reading does not depend on how the texts were batched
+                for hit in hits.tolist():
+                    if len(self._osint_recent) == self._osint_recent.maxlen:
+                        self._osint_hits -= self._osint_recent[0]
+                    self._osint_recent.append(hit)
+                    self._osint_hits += hit
+                share = self._osint_hits / len(self._osint_recent)
+                self.state["signals_score"] = min(share / self.osint_saturation, 1.0)
+                latest = max(signal["time"] for _, signal in batch)
+                self.engine.record_indicator("weak_signal_score", self.state["signals_score"], at=_utc(latest))
+                await self.fusion_queue.put((batch[0][0], latest, "osint"))
+            now = time.perf_counter()
+            for enqueued, _ in batch:
+                stats.latencies.append(now - enqueued)
+                queue.task_done()
+            stats.processed += len(batch)
+
+    async def _fusion_stage(self):
+        queue, stats = self.fusion_queue, self.stats["fusion"]
+        while True:
+            enqueued, signal_time, sensor = await queue.get()
+            prediction = self.engine.fuse(self.state["bgp_anomalies"], self.state["signals_score"])
+            prediction["updated_by"] = sensor
+            prediction["signal_time"] = signal_time
+            self.prediction = prediction
+            self._check_threshold(prediction, signal_time)
+            # End to end: from the signal entering its sensor queue to the updated prediction
+            stats.observe(time.perf_counter() - enqueued)
+            queue.task_done()
+
+    def _check_threshold(self, prediction: Dict[str, Any], signal_time: float):
+        probability = prediction["probability"]
+        if not self.alerting and probability >= self.alert_threshold:
+            self.alerting = True
+        elif self.alerting and probability < self.alert_threshold - self.hysteresis:
+            self.alerting = False
+            prediction = {**prediction, "threat_level": "Low"}
+        else:
+            return
+        at = _utc(signal_time)
+        alert = {
+            "created_at": at,
+            "target_event": prediction["target"],
+            "probability": round(probability, 4),
+            "causal_factors": {"factors": prediction["causal_factors"], "updated_by": prediction["updated_by"],
+                               "readings": dict(self.state)},
+            "time_window_start": at,
+            "time_window_end": at + self.horizon,
+            "threat_level": prediction["threat_level"],
+        }
+        self.alerts.append(alert)
+        if self.engine.writer is not None:
+            self.engine.writer.add("insight_predictions", alert)
+        if self.on_alert is not None:
+            self.on_alert(alert)
+
+    # --- lifecycle -------------------------------------------------------
+
+    async def start(self, producers: List[Any] = ()):
+        if self.record_path:
+            self._record = open(self.record_path, "a", encoding="utf-8", buffering=1)
+        self._stages = [
+            asyncio.create_task(self._reading_stage("bgp", self._read_bgp)),
+            asyncio.create_task(self._reading_stage("satellite", self._read_satellite)),
+            asyncio.create_task(self._osint_stage()),
+            asyncio.create_task(self._fusion_stage()),
+        ]
+        self._producers = [asyncio.create_task(p) for p in producers]
+
+    def live_producers(self) -> List[Any]:
+        """Polling producers for the engine's sensors (intervals from INSIGHT_*_INTERVAL_S)."""
+        return [
+            self.poll("bgp", self.engine.scan_bgp_anomalies, float(os.getenv("INSIGHT_BGP_INTERVAL_S", "60"))),
+            self.poll("satellite", lambda: self.engine.process_satellite_shadows(""),
+                      float(os.getenv("INSIGHT_SATELLITE_INTERVAL_S", "3600"))),
+        ]
+
+    async def drain(self):
+        """Waits for the producers to finish and every queued signal to reach the fusion stage."""
+        await asyncio.gather(*self._producers)
+        await self._settle()
+
+    async def stop(self):
+        for task in self._producers + self._stages:
+            task.cancel()
+        await asyncio.gather(*self._producers, *self._stages, return_exceptions=True)
+        self._producers, self._stages = [], []
+        if self._record is not None:
+            self._record.close()
+            self._record = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "stages": {name: stats.snapshot() for name, stats in self.stats.items()},
+            "prediction": self.prediction,
+            "alerting": self.alerting,
+            "alerts": len(self.alerts),
+        }
+
+
+def _utc(epoch: float) -> datetime:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+async def _main(args):
+    pipeline = InsightPipeline(InsightIngestEngine(), queue_size=args.queue_size, alert_threshold=args.threshold,
+                               record_path=args.record,
+                               on_alert=lambda a: print(f"[alert] {a['created_at'].isoformat()} "
+                                                        f"{a['threat_level']} p={a['probability']}"))
+    if args.replay:
+        started = time.perf_counter()
+        await pipeline.start([pipeline.replay(args.replay, args.speed)])
+        await pipeline.drain()
+        elapsed = time.perf_counter() - started
+        await pipeline.stop()
+        metrics = pipeline.metrics()
+        signals = sum(metrics["stages"][s]["processed"] for s in SENSORS)
+        metrics["replay"] = {"signals": signals, "seconds": round(elapsed, 3),
+                             "signals_per_s": round(signals / elapsed, 1) if elapsed else None}
+        print(json.dumps(metrics, indent=2, ensure_ascii=False, default=str))
+        return
+    producers = pipeline.live_producers()
+    if args.osint_feed:
+        producers.append(pipeline.follow("osint", args.osint_feed))
+    await pipeline.start(producers)
+    try:
+        while True:
+            await asyncio.sleep(args.report_every)
+            print(json.dumps(pipeline.metrics(), ensure_ascii=False, default=str))
+    finally:
+        await pipeline.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Continuous Insight Engine pipeline")
+    parser.add_argument("--replay", help="recorded signals (JSONL) to replay instead of live sensors")
+    parser.add_argument("--speed", type=float, default=0.0, help="replay speed factor (0 = no pacing)")
+    parser.add_argument("--record", help="append every signal seen to this JSONL file")
+    parser.add_argument("--osint-feed", help="JSONL file of {\"text\", \"location\"} posts to follow (live mode)")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("INSIGHT_ALERT_THRESHOLD", "0.6")))
+    parser.add_argument("--queue-size", type=int, default=1000)
+    parser.add_argument("--report-every", type=float, default=60.0)
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,324 @@
+import os
+import json
+from collections import deque
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+from guardrails import normalize_arabic
+
+DEFAULT_LEXICON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "lexicon", "yemen_lexicon.json")
+
+# Proclitics (conjunction, preposition, article) and pronoun enclitics, in normalised spelling
+ARTICLE_PREFIXES = {"ال", "وال", "فال", "بال", "كال", "لل", "ولل", "فلل"}
+PREFIXES = {"", "و", "ف", "ب", "ك", "ل", "وب", "فب", "ول", "فل", "وك", "فك"} | ARTICLE_PREFIXES
+SUFFIXES = {"", "ه", "ها", "هم", "هما", "هن", "ك", "كم", "كما", "كن", "ي", "نا"}
+MAX_PREFIX = max(map(len, PREFIXES))
+MAX_SUFFIX = max(map(len, SUFFIXES))
+# Shorter terms only match as whole words: "اب" behind "ب" would already be "باب"
+MIN_CLITIC_TERM = 3
+
+# Entry flags
+_PREFIX_OK = 1      # proclitics may precede the term
+_SUFFIX_OK = 2      # enclitics may follow it
+_DEFINITE = 4       # article stripped from the key: an article prefix is required
+_NEEDS_SUFFIX = 8   # ta marbuta spelled as ت: only valid before an enclitic
+
+
+def _is_arabic(ch: str) -> bool:
+    return "\u0600" <= ch <= "\u06FF"
+
+
+def _keys_for(key: str, original: str) -> List[Tuple[str, int]]:
+    """Automaton keys for one normalised term: the term itself plus its clitic-bound spellings."""
+    if len(key) < MIN_CLITIC_TERM:
+        return [(key, 0)]
+    flags = (_PREFIX_OK if _is_arabic(key[0]) else 0) | (_SUFFIX_OK if _is_arabic(key[-1]) else 0)
+    stem = key
+    if flags & _PREFIX_OK and key.startswith("ال") and len(key) - 2 >= MIN_CLITIC_TERM:
+        # "الحديدة" also appears as "للحديدة"; index the stem and demand an article prefix
+        stem, flags = key[2:], flags | _DEFINITE
+    keys = [(stem, flags)]
+    letters = [c for c in original if c.isalpha() and c != "\u0640"]
+    if flags & _SUFFIX_OK and letters and letters[-1] == "ة":
+        # ة becomes ت before an enclitic: "أزمة" -> "أزمتهم"
+        keys.append((stem[:-1] + "ت", flags | _NEEDS_SUFFIX))
+    return keys
+
+
+class Lexicon:
+    """
+    محرك المعجم (Arabic Lexicon Matcher)
+    Aho–Corasick automaton over normalised Arabic (see guardrails.normalize_arabic):
+    every term of every category is found in one pass over the text, whatever
+    the number of terms. Arabic terms also match with attached clitics
+    ("والحديدة", "للحديدة", "أزمتهم") but never inside another word. Match
+    spans are offsets into the original, un-normalised text.
+    The lexicon file has the guardrail rules layout:
+      {"version": ..., "categories": {name: {"label": ..., "terms": [...]}}}
+    """
+    def __init__(self, spec: Dict[str, Any], path: Optional[str] = None):
+        self.path = path
+        self.version = spec.get("version")
+        self.labels: Dict[str, str] = {}
+        # term index -> (original spelling, categories)
+        self.terms: List[Tuple[str, List[str]]] = []
+        by_key: Dict[str, int] = {}
+        for category, cat_spec in spec.get("categories", {}).items():
+            self.labels[category] = cat_spec.get("label", category)
+            for original in cat_spec.get("terms", []):
+                key = normalize_arabic(original)
+                if not key:
+                    continue
+                index = by_key.get(key)
+                if index is None:
+                    index = by_key[key] = len(self.terms)
+                    self.terms.append((original, []))
+                if category not in self.terms[index][1]:
+                    self.terms[index][1].append(category)
+        self.term_index: Dict[str, int] = {original: i for i, (original, _) in enumerate(self.terms)}
+
+        # entry = (term index, flags); a key may carry entries from several terms
+        self._entries: List[Tuple[int, int]] = []
+        keys: Dict[str, List[int]] = {}
+        for key, index in by_key.items():
+            for variant, flags in _keys_for(key, self.terms[index][0]):
+                keys.setdefault(variant, []).append(len(self._entries))
+                self._entries.append((index, flags))
+        self._build(keys)
+        self._fold: Dict[str, Tuple[Tuple[str, bool], ...]] = {}
+        self.max_key_length = max((len(k) for k in keys), default=0)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "Lexicon":
+        path = path or os.getenv("LEXICON_PATH", DEFAULT_LEXICON)
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f), path=path)
+
+    def _build(self, keys: Dict[str, List[int]]):
+        goto: List[Dict[str, int]] = [{}]
+        out: List[list] = [[]]
+        for key, entries in keys.items():
+            node = 0
+            for ch in key:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                node = nxt
+            out[node].extend((len(key), e) for e in entries)
+
+        # Breadth-first failure links; each node also reports the keys that end at its fallback
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[child] = target if target != child else 0
+                out[child].extend(out[fail[child]])
+                queue.append(child)
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(o) for o in out]
+
+    def _fold_char(self, ch: str) -> Tuple[Tuple[str, bool], ...]:
+        """Normalised form of one raw character as (char, is word character) pairs; memoised."""
+        folded = " " if ch.isspace() else normalize_arabic(ch)
+        value = tuple((c, c.isalnum()) for c in folded)
+        self._fold[ch] = value
+        return value
+
+    def stream(self, categories=None) -> "LexiconStream":
+        return LexiconStream(self, categories)
+
+    def scan(self, text: str, categories=None) -> Iterator[Dict[str, Any]]:
+        """Lazily yields matches (in order of the word they end in), so callers can stop early."""
+        scanner = LexiconStream(self, categories)
+        yield from scanner.feed(text)
+        yield from scanner.close()
+
+    def find(self, text: str, categories=None, longest: bool = True) -> List[Dict[str, Any]]:
+        """
+        All matches as {"term", "categories", "start", "end", "text"}, ordered by start.
+        With `longest`, a match lying inside a longer one ("أزمة" in "أزمة الوقود") is dropped.
+        """
+        matches = sorted(self.scan(text, categories), key=lambda m: (m["start"], -m["end"]))
+        if longest:
+            kept, reach = [], -1
+            for m in matches:
+                if m["end"] > reach:
+                    kept.append(m)
+                    reach = m["end"]
+            matches = kept
+        for m in matches:
+            m["text"] = text[m["start"]:m["end"]]
+        return matches
+
+    def terms_in(self, text: str, categories=None) -> List[str]:
+        """Distinct matched terms (original spelling) in order of first appearance."""
+        found: List[str] = []
+        for m in self.find(text, categories):
+            if m["term"] not in found:
+                found.append(m["term"])
+        return found
+
+    def contains(self, text: str, categories=None) -> bool:
+        return next(self.scan(text, categories), None) is not None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "version": self.version,
+            "terms": len(self.terms),
+            "keys": len(self._entries),
+            "states": len(self._goto),
+            "categories": {c: sum(c in cats for _, cats in self.terms) for c in self.labels},
+        }
+
+
+class LexiconStream:
+    """
+    Incremental matcher: text may arrive in arbitrary chunks (a streamed model
+    output, a feed read line by line) and matches are reported with offsets
+    into the concatenated input. A match is reported once the word it ends
+    in is complete, since an enclitic can only be judged then. Only a short
+    window of normalised text is kept, so memory stays constant.
+    """
+    def __init__(self, lexicon: Lexicon, categories=None):
+        self.lexicon = lexicon
+        self.categories = set(categories) if categories is not None else None
+        self.offset = 0
+        self._node = 0
+        self._buf: List[str] = []        # normalised characters
+        self._starts: List[int] = []     # original offset of each normalised character
+        self._ends: List[int] = []       # original offset just past it (and its diacritics)
+        self._base = 0                   # normalised index of _buf[0]
+        self._pending: List[Tuple[int, int, int]] = []  # (start, end, entry) awaiting the word end
+        self._after_space = True
+        self._window = lexicon.max_key_length + MAX_PREFIX + MAX_SUFFIX + 2
+
+    def feed(self, chunk: str) -> Iterator[Dict[str, Any]]:
+        goto, fail, out = self.lexicon._goto, self.lexicon._fail, self.lexicon._out
+        buf, starts, ends, pending = self._buf, self._starts, self._ends, self._pending
+        fold = self.lexicon._fold
+        node = self._node
+        after_space = self._after_space
+        offset = self.offset
+        n = self._base + len(buf)
+        trim_at = n + 4 * self._window + 1024
+        for i, ch in enumerate(chunk, offset):
+            folded = fold.get(ch)
+            if folded is None:
+                folded = self.lexicon._fold_char(ch)
+            if not folded:
+                # Diacritic or tatweel: part of the preceding letter's span
+                if ends and not after_space:
+                    ends[-1] = i + 1
+                continue
+            for c, is_word in folded:
+                if c == " ":
+                    if after_space:
+                        continue
+                    after_space = True
+                else:
+                    after_space = False
+                if pending:
+                    if not is_word:
+                        yield from self._resolve(n)
+                    elif n - min(e for _, e, _ in pending) >= MAX_SUFFIX:
+                        yield from self._resolve(n, overflow=True)
+                buf.append(c)
+                starts.append(i)
+                ends.append(i + 1)
+                n += 1
+
+                while node and c not in goto[node]:
+                    node = fail[node]
+                node = goto[node].get(c, 0)
+                for length, entry in out[node]:
+                    self._candidate(n - length, n, entry)
+
+            if n > trim_at:
+                self._trim()
+                trim_at = n + 4 * self._window + 1024
+        self._node = node
+        self._after_space = after_space
+        self.offset = offset + len(chunk)
+
+    def close(self) -> Iterator[Dict[str, Any]]:
+        """Ends the input: matches in the last word are judged and reported."""
+        yield from self._resolve(self._base + len(self._buf))
+        self._node = 0
+        self._after_space = True
+
+    def _trim(self):
+        keep_from = self._base + len(self._buf) - self._window
+        if self._pending:
+            keep_from = min(keep_from, min(s for s, _, _ in self._pending) - MAX_PREFIX - 1)
+        drop = keep_from - self._base
+        if drop > 0:
+            del self._buf[:drop], self._starts[:drop], self._ends[:drop]
+            self._base += drop
+
+    def _candidate(self, start: int, end: int, entry: int):
+        index, flags = self.lexicon._entries[entry]
+        if self.categories is not None and self.categories.isdisjoint(self.lexicon.terms[index][1]):
+            return
+        buf, base = self._buf, self._base
+        j = start - base
+        lo = max(j - MAX_PREFIX - 1, 0)
+        while j > lo and buf[j - 1].isalnum():
+            j -= 1
+        prefix = "".join(buf[j:start - base])
+        if j > 0 and j == lo and buf[j - 1].isalnum():
+            return  # the word runs on further back than any proclitic
+        if prefix:
+            if not flags & _PREFIX_OK or prefix not in PREFIXES or \
+                    (flags & _DEFINITE and prefix not in ARTICLE_PREFIXES):
+                return
+        elif flags & _DEFINITE:
+            return
+        self._pending.append((start, end, entry))
+
+    def _resolve(self, word_end: int, overflow: bool = False) -> Iterator[Dict[str, Any]]:
+        """Judges pending matches whose word ends at `word_end` (or has outgrown every enclitic)."""
+        buf, base = self._buf, self._base
+        still = []
+        for start, end, entry in self._pending:
+            if overflow and word_end - end < MAX_SUFFIX:
+                still.append((start, end, entry))
+                continue
+            index, flags = self.lexicon._entries[entry]
+            suffix = "" if overflow else "".join(buf[end - base:word_end - base])
+            if overflow or (suffix and (not flags & _SUFFIX_OK or suffix not in SUFFIXES)) or \
+                    (not suffix and flags & _NEEDS_SUFFIX):
+                continue
+            if flags & _DEFINITE:
+                # Span the article too: "الـ" in "والحديدة", the doubled "ل" in "للحديدة"
+                start -= 2 if buf[start - base - 2] == "ا" else 1
+            original, categories = self.lexicon.terms[index]
+            yield {
+                "term": original,
+                "categories": categories,
+                "start": self._starts[start - base],
+                "end": self._ends[end - 1 - base],
+            }
+        self._pending[:] = still
+
+
+_lexicon: Optional[Lexicon] = None
+
+
+def get_lexicon() -> Optional[Lexicon]:
+    """Process-wide lexicon from LEXICON_PATH (None, with a warning, if it cannot be loaded)."""
+    global _lexicon
+    if _lexicon is None:
+        try:
+            _lexicon = Lexicon.load()
+        except (OSError, ValueError) as e:
+            print(f"Warning: Lexicon not loaded: {e}")
+    return _lexicon
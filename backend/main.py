@@ -1,18 +1,45 @@
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import subprocess
 import os
 import json
+import uuid
 import shutil
-from datetime import datetime
-from typing import List, Dict, Any
+import asyncio
+import tempfile
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional
 from ai_router import AIRouter
+from generation_scheduler import SchedulerOverloaded
+from http_pool import default_pool
+from forensic_worker import ForensicWorker, ForensicQueueFull
+from timeseries_query import get_reader
+from perceptual_index import get_perceptual_index, image_hashes, open_for_hashing, DEFAULT_RADIUS, MAX_RADIUS
+from s3_utils import ChecksumMismatch
+
+# Shared HTTP connection pools (Ollama, MCP tools) for the whole app lifetime
+http_pool = default_pool()
+
+# Resident Sherloq worker pool (modules stay imported between jobs)
+forensic_worker = ForensicWorker()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_pool.start()
+    await forensic_worker.start()
+    yield
+    await forensic_worker.stop()
+    shutil.rmtree(FORENSIC_JOB_DIR, ignore_errors=True)
+    # Flush queued audit rows before exit (close joins the drain thread)
+    await asyncio.to_thread(ai_router.audit.close)
+    await http_pool.aclose()
 
 # إعداد التطبيق
-app = FastAPI(title="YemenJPT Sovereign Core v10.0 (Production Ph-Ye)")
+app = FastAPI(title="YemenJPT Sovereign Core v10.0 (Production Ph-Ye)", lifespan=lifespan)
 
 # CORS Configuration for Subdomains
 origins = [
@@ -38,14 +65,20 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # Mount Uploads directory
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+# Images submitted for forensic analysis stay private: a mode 0700 directory outside
+# the static mount, and each file is deleted by the worker when its job ends
+FORENSIC_JOB_DIR = tempfile.mkdtemp(prefix="forensic-jobs-", dir=os.getenv("FORENSIC_JOB_DIR"))
 
 # Initialize Sovereign AI Router
-ai_router = AIRouter()
+ai_router = AIRouter(http=http_pool)
+# The vault (local disk or S3) shared with the MCP tools
+storage = ai_router.mcp.storage
 
 # --- MODELS ---
 class ChatRequest(BaseModel):
     prompt: str
     model_name: str = "YemenJPT"
+    stream: bool = False
 
 # --- ENDPOINTS ---
 @app.get("/api/system/health")
@@ -58,14 +91,131 @@ async def health_check():
         "ai_gateway": "ai.ph-ye.org"
     }
 
+@app.get("/api/system/metrics")
+async def system_metrics():
+    return {
+        "http_pool": http_pool.metrics(),
+        "response_cache": ai_router.cache.metrics(),
+        "mcp_tools": ai_router.mcp.metrics(),
+        "audit_log": ai_router.audit.metrics(),
+        "generation_scheduler": ai_router.scheduler.metrics(),
+        "forensic_worker": forensic_worker.metrics(),
+        "storage": storage.metrics(),
+        "timeseries_reader": get_reader().metrics() if get_reader() else None,
+        "perceptual_index": get_perceptual_index().metrics() if get_perceptual_index() else None
+    }
+
 @app.post("/api/ai/agent_chat")
 async def agent_chat(request: ChatRequest):
+    if request.stream:
+        # Reject before the 200 status is committed if the queue is already full
+        try:
+            ai_router.scheduler.check_admission()
+        except SchedulerOverloaded as e:
+            raise HTTPException(status_code=e.status_code, detail=e.reason,
+                                headers={"Retry-After": str(e.retry_after)})
+        # Chunked NDJSON: one guardrail-audited event per line (see AIRouter.generate_stream)
+        async def event_lines():
+            async for event in ai_router.generate_stream(request.prompt, request.model_name):
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        return StreamingResponse(event_lines(), media_type="application/x-ndjson")
     try:
         result = await ai_router.generate(request.prompt, request.model_name)
         return result
+    except SchedulerOverloaded as e:
+        # Backpressure: tell the client when to retry instead of holding the connection
+        raise HTTPException(status_code=e.status_code, detail=e.reason,
+                            headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Sovereign AI Router Error: {str(e)}")
 
+@app.post("/api/forensics/jobs", status_code=202)
+async def submit_forensic_job(file: UploadFile = File(...)):
+    """Queues an image for ELA/FFT/EXIF analysis; poll GET /api/forensics/jobs/{job_id}."""
+    # Unique per upload: same-named files submitted together must not overwrite each other
+    target = os.path.join(FORENSIC_JOB_DIR, f"{uuid.uuid4().hex}_{os.path.basename(file.filename or 'upload')}")
+
+    def save():
+        with open(target, "wb") as out:
+            shutil.copyfileobj(file.file, out)
+
+    await asyncio.to_thread(save)
+    try:
+        job_id = forensic_worker.submit(target, delete_after=True)
+    except ForensicQueueFull as e:
+        os.unlink(target)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/api/forensics/jobs/{job_id}")
+async def get_forensic_job(job_id: str):
+    job = forensic_worker.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown forensic job")
+    return job
+
+@app.put("/api/storage/objects/{object_name:path}")
+async def put_storage_object(object_name: str, request: Request):
+    """
+    Streams the raw request body into the vault chunk by chunk (large video
+    evidence is never held in memory). Send X-Content-SHA256 to have the
+    upload verified; the computed SHA-256 is returned either way.
+    """
+    try:
+        result = await storage.upload_stream(request.stream(), object_name,
+                                             expected_sha256=request.headers.get("x-content-sha256"))
+    except ChecksumMismatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Storage Error: {str(e)}")
+    return {**result, "url": storage.get_file_url(object_name)}
+
+@app.post("/api/forensics/similar")
+async def find_similar_images(file: UploadFile = File(...), radius: int = Form(DEFAULT_RADIUS), limit: int = Form(10)):
+    """Stored images that are near duplicates (re-encode, resize, crop) of the upload, by perceptual hash."""
+    index = get_perceptual_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="Perceptual hash index is disabled")
+    data = await file.read()
+    try:
+        hashes = await asyncio.to_thread(lambda: image_hashes(open_for_hashing(data), index.crops))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable image: {e}")
+    matches = await asyncio.to_thread(index.lookup, hashes, max(0, min(radius, MAX_RADIUS)), limit)
+    return {"target": file.filename, "phash": f"{hashes[0][1]:016x}", "dhash": f"{hashes[0][2]:016x}",
+            "matches": matches, "lookup_ms": index.stats["last_lookup_ms"]}
+
+async def _series(table: str, start: Optional[datetime], end: Optional[datetime], resolution: Optional[str],
+                  max_points: int, **filters):
+    reader = get_reader()
+    if reader is None:
+        raise HTTPException(status_code=503, detail="No time-series database configured (DATABASE_URL)")
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(hours=24)
+    try:
+        # Blocking DB round trip: keep it off the event loop
+        return await asyncio.to_thread(reader.query, table, start, end, resolution, max_points, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/insight/indicators")
+async def indicator_series(indicator_type: Optional[str] = None, location_id: Optional[str] = None,
+                           start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           resolution: Optional[str] = None, max_points: int = 500):
+    """Bucketed insight_indicators (default: last 24 h); read from the coarsest rollup that fits `resolution` (30s/5m/1h/1d)."""
+    return await _series("insight_indicators", start, end, resolution, max_points,
+                         indicator_type=indicator_type, location_id=location_id)
+
+@app.get("/api/insight/signals")
+async def raw_signal_series(source: Optional[str] = None, category: Optional[str] = None,
+                            start: Optional[datetime] = None, end: Optional[datetime] = None,
+                            resolution: Optional[str] = None, max_points: int = 500):
+    """Bucketed counts and sentiment of insight_raw_signals, same resolution rules."""
+    return await _series("insight_raw_signals", start, end, resolution, max_points,
+                         source=source, category=category)
+
 @app.post("/token")
 async def login_for_access_token(form_data: Any = Depends()):
     # Unified Master Password Auth
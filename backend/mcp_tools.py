@@ -1,16 +1,136 @@
-
 import os
-import httpx
 import json
+import math
+import time
+import asyncio
+import hashlib
+import tempfile
 import subprocess
-from datetime import datetime
-from typing import Dict, Any, List
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
 from s3_utils import StorageManager
+from http_pool import HTTPClientPool, default_pool
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Archive days older than this are final in open-meteo (recent days are preliminary reanalysis)
+ARCHIVE_FINAL_DAYS = int(os.getenv("WEATHER_ARCHIVE_FINAL_DAYS", "7"))
+
+
+class CachePolicy:
+    """How long results of one tool call may be reused (ttl in seconds, math.inf = forever)."""
+    def __init__(self, ttl: float = 0.0, persistent: bool = False):
+        self.ttl = ttl
+        # Persistent results are also written to disk and survive restarts (immutable data only)
+        self.persistent = persistent
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+
+NO_CACHE = CachePolicy()
+PERMANENT = CachePolicy(ttl=math.inf, persistent=True)
+
+
+class Tool:
+    """
+    One registered tool: `handler(args)` returns the result dict (or {"error": ...},
+    which is never cached). `key(args)` normalises the arguments that identify a
+    result; `policy` is a CachePolicy or a function of the normalised arguments.
+    Identical in-flight calls share one execution unless `coalesce` is False
+    (tools with side effects).
+    """
+    def __init__(self, name: str, handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 policy=NO_CACHE, key: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+                 coalesce: bool = True):
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.key = key or (lambda args: args)
+        self.coalesce = coalesce
+        self.stats = {"calls": 0, "memory_hits": 0, "disk_hits": 0, "coalesced": 0, "executions": 0,
+                      "errors": 0, "execution_time_total": 0.0}
+
+    def policy_for(self, args: Dict[str, Any]) -> CachePolicy:
+        return self.policy(args) if callable(self.policy) else self.policy
+
+
+class ToolResultCache:
+    """
+    ذاكرة نتائج الأدوات (Tool Result Cache)
+    LRU of serialised tool results with per-entry expiry, in front of an
+    on-disk store for results that never change (historical weather for a
+    location and date). Disk entries live under <root>/<tool>/ab/<key>.json,
+    written atomically (temp file + rename) so several processes can share
+    them; a disk hit is promoted to memory.
+    """
+    def __init__(self, root: Optional[str] = None, max_entries: Optional[int] = None):
+        self.root = root or os.getenv("TOOL_CACHE_DIR", os.path.join(DATA_DIR, "tool_cache"))
+        self.max_entries = max_entries if max_entries is not None else \
+            int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "4096"))
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.stats = {"evictions": 0, "expirations": 0, "disk_writes": 0, "disk_errors": 0}
+
+    def _path(self, tool: str, key: str) -> str:
+        return os.path.join(self.root, tool, key[:2], key + ".json")
+
+    def get(self, tool: str, key: str, policy: CachePolicy) -> Tuple[Optional[str], Optional[str]]:
+        """Returns (serialised result, tier) with tier "memory" or "disk", or (None, None)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[0], "memory"
+            del self._entries[key]
+            self.stats["expirations"] += 1
+        if policy.persistent:
+            try:
+                with open(self._path(tool, key), 'r', encoding='utf-8') as f:
+                    payload = f.read()
+            except OSError:
+                return None, None
+            self._remember(key, payload, policy.ttl)
+            return payload, "disk"
+        return None, None
+
+    def put(self, tool: str, key: str, payload: str, policy: CachePolicy):
+        self._remember(key, payload, policy.ttl)
+        if policy.persistent:
+            path = self._path(tool, key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(payload)
+                os.replace(tmp, path)
+                self.stats["disk_writes"] += 1
+            except OSError as e:
+                self.stats["disk_errors"] += 1
+                print(f"Tool cache write failed: {e}")
+
+    def _remember(self, key: str, payload: str, ttl: float):
+        self._entries[key] = (payload, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self._entries), "max_entries": self.max_entries}
+
 
 class MCPToolHub:
-    def __init__(self):
+    def __init__(self, http: Optional[HTTPClientPool] = None, cache: Optional[ToolResultCache] = None):
+        # Shared pooled clients; a standalone hub gets its own pool
+        self.http = http or default_pool()
         # Initialize the agnostic storage manager (Local/S3)
         self.storage = StorageManager()
+        self.cache = cache or ToolResultCache()
         self.yemen_coords = {
             "sana'a": {"lat": 15.35, "lng": 44.20},
             "aden": {"lat": 12.78, "lng": 45.01},
@@ -19,58 +139,157 @@ class MCPToolHub:
             "mukalla": {"lat": 14.54, "lng": 49.12},
             "marib": {"lat": 15.46, "lng": 45.32}
         }
+        # Arabic names accepted for the same locations
+        self.location_aliases = {
+            "صنعاء": "sana'a", "عدن": "aden", "تعز": "taiz",
+            "الحديدة": "hodeidah", "المكلا": "mukalla", "مأرب": "marib"
+        }
+        self.tools: Dict[str, Tool] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        recent_ttl = float(os.getenv("TOOL_CACHE_RECENT_WEATHER_TTL", "3600"))
+        self.register(Tool("verify_weather_history", self._verify_weather_history,
+                           policy=lambda a: self._weather_policy(a, recent_ttl), key=self._weather_key))
+        self.register(Tool("extract_video_metadata", self._extract_video_metadata,
+                           policy=CachePolicy(ttl=float(os.getenv("TOOL_CACHE_VIDEO_TTL", "86400"))),
+                           key=lambda a: {"url": (a.get("url") or "").strip()}))
+        # Queues an archival job: never cached or merged
+        self.register(Tool("archive_url_local", self._archive_url_local, coalesce=False))
+
+    def register(self, tool: Tool):
+        self.tools[tool.name] = tool
+
+    def _tool_key(self, tool: Tool, args: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        normalized = tool.key(args)
+        digest = hashlib.sha256(json.dumps([tool.name, normalized], sort_keys=True, default=str)
+                                .encode("utf-8")).hexdigest()
+        return normalized, digest
 
     async def execute_tool(self, tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
-        """Executes the selected tool and returns results."""
-        
-        if tool_name == "verify_weather_history":
-            location = args.get("location", "Sana'a").lower()
-            date = args.get("date")
-            coords = self.yemen_coords.get(location, self.yemen_coords["sana'a"])
-            try:
-                url = f"https://archive-api.open-meteo.com/v1/archive?latitude={coords['lat']}&longitude={coords['lng']}&start_date={date}&end_date={date}&daily=weathercode,temperature_2m_max&timezone=auto"
-                async with httpx.AsyncClient() as client:
-                    resp = await client.get(url)
-                    data = resp.json()
-                    return {
-                        "status": "success",
-                        "location": location,
-                        "date": date,
-                        "summary": "Clear" if data["daily"]["weathercode"][0] == 0 else "Cloudy/Rainy",
-                        "max_temp": data["daily"]["temperature_2m_max"][0]
-                    }
-            except:
-                return {"error": "Weather service temporarily unavailable"}
-
-        elif tool_name == "extract_video_metadata":
-            url = args.get("url")
-            # Logic to invoke local yt-dlp simulation
+        """Executes the selected tool and returns results (served from cache when its policy allows)."""
+        tool = self.tools.get(tool_name)
+        if tool is None:
+            return {"error": "Unknown tool"}
+        tool.stats["calls"] += 1
+        normalized, key = self._tool_key(tool, args or {})
+        policy = tool.policy_for(normalized)
+
+        if policy.enabled:
+            payload, tier = self.cache.get(tool.name, key, policy)
+            if payload is not None:
+                tool.stats[f"{tier}_hits"] += 1
+                return json.loads(payload)
+
+        if not tool.coalesce:
+            return json.loads(await self._run(tool, normalized, key, policy))
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(tool, normalized, key, policy))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            tool.stats["coalesced"] += 1
+        # Shielded: a cancelled caller does not cancel the call the others are waiting on
+        return json.loads(await asyncio.shield(future))
+
+    async def _run(self, tool: Tool, args: Dict[str, Any], key: str, policy: CachePolicy) -> str:
+        tool.stats["executions"] += 1
+        started = time.perf_counter()
+        try:
+            result = await tool.handler(args)
+        except Exception as e:
+            result = {"error": f"Tool failure: {e}"}
+        finally:
+            tool.stats["execution_time_total"] += time.perf_counter() - started
+        payload = json.dumps(result, ensure_ascii=False)
+        if "error" in result:
+            tool.stats["errors"] += 1
+        elif policy.enabled:
+            self.cache.put(tool.name, key, payload, policy)
+        return payload
+
+    async def execute_tools(self, calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Runs several {"name", "args"} calls concurrently; results keep the order of `calls`."""
+        return list(await asyncio.gather(*(self.execute_tool(c["name"], c.get("args", {})) for c in calls)))
+
+    def metrics(self) -> Dict[str, Any]:
+        tools = {}
+        for name, tool in self.tools.items():
+            s = tool.stats
+            hits = s["memory_hits"] + s["disk_hits"] + s["coalesced"]
+            tools[name] = {
+                **{k: v for k, v in s.items() if k != "execution_time_total"},
+                "hit_rate": round(hits / s["calls"], 4) if s["calls"] else 0.0,
+                "avg_execution_ms": round(1000 * s["execution_time_total"] / s["executions"], 2)
+                if s["executions"] else 0.0,
+            }
+        return {"tools": tools, "in_flight": len(self._in_flight), "cache": self.cache.metrics()}
+
+    # --- TOOLS ---
+
+    def resolve_location(self, location: Optional[str]) -> str:
+        name = (location or "Sana'a").strip()
+        return self.location_aliases.get(name, name.lower())
+
+    def _weather_key(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        day = args.get("date") or datetime.now().strftime('%Y-%m-%d')
+        return {"location": self.resolve_location(args.get("location")), "date": str(day)}
+
+    @staticmethod
+    def _weather_policy(args: Dict[str, Any], recent_ttl: float) -> CachePolicy:
+        try:
+            day = date.fromisoformat(args["date"])
+        except ValueError:
+            return NO_CACHE
+        # Final archive days never change; recent ones are revised as reanalysis arrives
+        if day <= date.today() - timedelta(days=ARCHIVE_FINAL_DAYS):
+            return PERMANENT
+        return CachePolicy(ttl=recent_ttl)
+
+    async def _verify_weather_history(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        location = args["location"]
+        day = args["date"]
+        coords = self.yemen_coords.get(location, self.yemen_coords["sana'a"])
+        try:
+            url = f"/v1/archive?latitude={coords['lat']}&longitude={coords['lng']}&start_date={day}&end_date={day}&daily=weathercode,temperature_2m_max&timezone=auto"
+            resp = await self.http.request("open_meteo", "GET", url)
+            data = resp.json()
             return {
                 "status": "success",
-                "source": url,
-                "metadata": {
-                    "duration": "12:45",
-                    "upload_date": "20241012",
-                    "uploader": "Yemen Investigative Unit",
-                    "resolution": "1080p"
-                }
+                "location": location,
+                "date": day,
+                "summary": "Clear" if data["daily"]["weathercode"][0] == 0 else "Cloudy/Rainy",
+                "max_temp": data["daily"]["temperature_2m_max"][0]
             }
+        except Exception:
+            return {"error": "Weather service temporarily unavailable"}
 
-        elif tool_name == "archive_url_local":
-            url = args.get("url")
-            # Logic to trigger n8n or local headless browser to save URL to Storage
-            # Currently simulates a save
-            timestamp = datetime.now().strftime('%Y-%m-%d')
-            filename = f"snapshot_{int(datetime.now().timestamp())}.pdf"
-            
-            # Here we would actually save the file to self.storage.local_storage_path
-            
-            return {
-                "status": "queued",
-                "target_url": url,
-                "vault_path": f"archives/web/{timestamp}/{filename}",
-                "storage_mode": "Local Encrypted Volume" if not self.storage.use_s3 else "S3 Cloud Vault",
-                "message": "تم إدراج الرابط في طابور الأرشفة السيادية 'مُسند'."
+    async def _extract_video_metadata(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        url = args.get("url")
+        # Logic to invoke local yt-dlp simulation
+        return {
+            "status": "success",
+            "source": url,
+            "metadata": {
+                "duration": "12:45",
+                "upload_date": "20241012",
+                "uploader": "Yemen Investigative Unit",
+                "resolution": "1080p"
             }
+        }
+
+    async def _archive_url_local(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        url = args.get("url")
+        # Logic to trigger n8n or local headless browser to save URL to Storage
+        # Currently simulates a save
+        timestamp = datetime.now().strftime('%Y-%m-%d')
+        filename = f"snapshot_{int(datetime.now().timestamp())}.pdf"
 
-        return {"error": "Unknown tool"}
+        # Here we would actually save the file to self.storage.local_storage_path
+
+        return {
+            "status": "queued",
+            "target_url": url,
+            "vault_path": f"archives/web/{timestamp}/{filename}",
+            "storage_mode": "Local Encrypted Volume" if not self.storage.use_s3 else "S3 Cloud Vault",
+            "message": "تم إدراج الرابط في طابور الأرشفة السيادية 'مُسند'."
+        }
@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Perceptual-hash index for near-duplicate image lookup (re-uploads,
+recompressions, resizes and moderate crops of images already in storage).
+
+Usage (from backend/):
+  perceptual_index.py index [SOURCE] [--workers N] [--reindex]
+      Bulk-indexes everything in StorageManager (local uploads or the S3
+      bucket), or SOURCE: a directory, glob pattern or manifest as accepted
+      by sherloq_cli --batch. Already indexed objects are skipped.
+  perceptual_index.py lookup IMAGE [--radius R] [--limit K]
+
+  The index lives in PHASH_INDEX_PATH (SQLite); PHASH_RADIUS is the default
+  Hamming radius and PHASH_CROPS the centre-crop fractions hashed per image.
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from itertools import combinations
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+DCT_SIZE = 32
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "phash_index", "phash.db")
+DEFAULT_RADIUS = int(os.getenv("PHASH_RADIUS", "10"))
+# Beyond a quarter of the 64 bits unrelated images start to match
+MAX_RADIUS = 16
+# Extra hashes of centre crops, so a cropped copy lands near one of them
+CROPS = tuple(float(c) for c in os.getenv("PHASH_CROPS", "0.9,0.8").split(",") if c.strip())
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.webp', '.gif', '.heic'}
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    m = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m.astype(np.float32)
+
+
+_DCT = _dct_matrix(DCT_SIZE)
+
+if hasattr(np, "bitwise_count"):
+    def popcount(codes: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(codes)
+else:
+    _POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(codes: np.ndarray) -> np.ndarray:
+        codes = np.ascontiguousarray(codes, dtype=np.uint64)
+        return _POPCOUNT8[codes.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+
+def _gray(image, size: Tuple[int, int]) -> np.ndarray:
+    """Luma of the decoded image, box-averaged down to `size` (w, h)."""
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    return np.asarray(image.convert("L").resize(size, Image.BOX), dtype=np.float32)
+
+
+def _pack(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def dhash(image) -> int:
+    """64-bit difference hash: sign of the horizontal gradient on a 9x8 thumbnail."""
+    px = _gray(image, (9, 8))
+    return _pack(px[:, 1:] > px[:, :-1])
+
+
+def phash(image) -> int:
+    """64-bit DCT hash: the 8x8 lowest frequencies of a 32x32 thumbnail against their median."""
+    px = _gray(image, (DCT_SIZE, DCT_SIZE))
+    low = (_DCT @ px @ _DCT.T)[:8, :8]
+    return _pack(low > np.median(low.ravel()[1:]))
+
+
+def center_crop(image, fraction: float):
+    w, h = image.size
+    cw, ch = max(1, int(w * fraction)), max(1, int(h * fraction))
+    left, top = (w - cw) // 2, (h - ch) // 2
+    return image.crop((left, top, left + cw, top + ch))
+
+
+def image_hashes(image, crops: Sequence[float] = CROPS) -> List[Tuple[float, int, int]]:
+    """(crop fraction, pHash, dHash) of the whole image (1.0) and each centre crop."""
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    image = image.convert("L")
+    variants = [(1.0, image)] + [(c, center_crop(image, c)) for c in crops if 0 < c < 1]
+    return [(c, phash(v), dhash(v)) for c, v in variants]
+
+
+def open_for_hashing(source) -> Image.Image:
+    """
+    Decodes a path or bytes for hashing only. JPEGs are decoded in grayscale
+    at up to 8x reduced scale (draft mode): the hashes need 32 px per side.
+    """
+    image = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+    size = image.size
+    image.draft("L", (4 * DCT_SIZE, 4 * DCT_SIZE))
+    image = image.convert("L")
+    image.info["original_size"] = size
+    return image
+
+
+def _signed(code: int) -> int:
+    # SQLite integers are signed 64-bit
+    return code - (1 << 64) if code >= 1 << 63 else code
+
+
+class MultiIndexHash:
+    """
+    Multi-index hashing over 64-bit codes (Norouzi et al.): each code is split
+    into m chunks of about log2(N) bits with one bucket table per chunk. If
+    two codes are within Hamming distance r = s*m + t, then one of the first
+    t+1 chunks differs by at most s bits or one of the others by at most
+    s-1, so a query only probes the keys within that radius of its chunks
+    and verifies the few candidates with a popcount instead of scanning
+    every code.
+    """
+    _masks: Dict[Tuple[int, int], np.ndarray] = {}
+
+    def __init__(self, codes: np.ndarray, chunks: Optional[int] = None):
+        self.codes = codes
+        n = codes.shape[0]
+        self.chunks = chunks or int(min(8, max(3, round(64 / np.log2(max(n, 2))))))
+        widths = [64 // self.chunks + (1 if i < 64 % self.chunks else 0) for i in range(self.chunks)]
+        self.spans = [(sum(widths[:i]), w) for i, w in enumerate(widths)]
+        self.tables = []
+        index_type = np.int32 if n < 2 ** 31 else np.int64
+        for shift, width in self.spans:
+            keys = ((codes >> np.uint64(shift)) & np.uint64((1 << width) - 1)).astype(np.int64)
+            order = np.argsort(keys, kind="stable").astype(index_type)
+            # Direct-address bucket offsets: at most 2^22 entries since m >= 3
+            starts = np.zeros((1 << width) + 1, dtype=index_type)
+            np.cumsum(np.bincount(keys, minlength=1 << width), out=starts[1:])
+            self.tables.append((starts, order))
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    @classmethod
+    def masks(cls, width: int, bits: int) -> np.ndarray:
+        """Every `width`-bit value with at most `bits` bits set."""
+        if (width, bits) not in cls._masks:
+            values = [0]
+            for k in range(1, bits + 1):
+                values += [sum(1 << b for b in combo) for combo in combinations(range(width), k)]
+            cls._masks[(width, bits)] = np.array(values, dtype=np.int64)
+        return cls._masks[(width, bits)]
+
+    def probe_count(self, radius: int) -> int:
+        """Number of bucket keys `candidates` would probe, without building the masks."""
+        return sum(math.comb(w, k) for (_, w), b in zip(self.spans, self._probe_bits(radius)) for k in range(b + 1))
+
+    def _probe_bits(self, radius: int) -> List[int]:
+        s, t = divmod(radius, self.chunks)
+        return [s if j <= t else s - 1 for j in range(self.chunks)]
+
+    def candidates(self, query: int, radius: int) -> np.ndarray:
+        found = []
+        for (shift, width), (starts, order), bits in zip(self.spans, self.tables, self._probe_bits(radius)):
+            if bits < 0:
+                continue
+            probe = ((query >> shift) & ((1 << width) - 1)) ^ self.masks(width, bits)
+            lo = starts[probe]
+            lens = starts[probe + 1] - lo
+            total = int(lens.sum())
+            if total:
+                # Concatenated key ranges without a Python loop
+                rows = np.repeat(lo - np.cumsum(lens) + lens, lens) + np.arange(total)
+                found.append(order[rows])
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def search(self, query: int, radius: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows within `radius` of `query` and their distances."""
+        if self.probe_count(radius) > len(self) // 4:
+            rows = np.arange(len(self))  # wide radius: the probes would cost more than a scan
+        else:
+            rows = self.candidates(query, radius)
+        distances = popcount(self.codes[rows] ^ np.uint64(query))
+        keep = distances <= radius
+        # A row found through several chunks is verified more than once; report it once
+        rows, first = np.unique(rows[keep], return_index=True)
+        return rows, distances[keep][first]
+
+
+class PerceptualIndex:
+    """
+    فهرس البصمات الإدراكية (Perceptual Hash Index)
+    Every stored image has a pHash and dHash of the whole image and of a few
+    centre crops (PHASH_CROPS). Rows are persisted in SQLite, shared by the
+    API workers, StorageManager uploads and the bulk indexing command; each
+    process holds the codes in NumPy arrays behind a MultiIndexHash. New rows
+    (its own or another process's) are appended to a small linear-scan delta
+    that is merged into the multi-index once it grows past `merge_rows` or
+    1/32 of the index. Lookups go by pHash; dHash distance is reported as a
+    second opinion.
+    """
+    def __init__(self, path: Optional[str] = None, crops: Sequence[float] = CROPS,
+                 merge_rows: int = 4096, refresh_interval: float = 1.0):
+        self.path = path or os.getenv("PHASH_INDEX_PATH", DEFAULT_INDEX_PATH)
+        self.crops = tuple(crops)
+        self.merge_rows = merge_rows
+        self.refresh_interval = refresh_interval
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS images (
+                id INTEGER PRIMARY KEY, backend TEXT NOT NULL, name TEXT NOT NULL, sha256 TEXT,
+                width INTEGER, height INTEGER, indexed_at REAL, UNIQUE (backend, name));
+            CREATE INDEX IF NOT EXISTS images_sha256 ON images (sha256);
+            CREATE TABLE IF NOT EXISTS hashes (
+                id INTEGER PRIMARY KEY, image_id INTEGER NOT NULL, crop REAL, phash INTEGER, dhash INTEGER);
+        """)
+        self.conn.commit()
+        self._lock = threading.RLock()
+        self._phash = np.empty(0, dtype=np.uint64)
+        self._dhash = np.empty(0, dtype=np.uint64)
+        self._image_ids = np.empty(0, dtype=np.int64)
+        self._crops = np.empty(0, dtype=np.float32)
+        self._size = 0
+        self._main: Optional[MultiIndexHash] = None
+        self._last_row = 0
+        self._last_refresh = 0.0
+        self.stats = {"lookups": 0, "inserts": 0, "merges": 0, "last_lookup_ms": None, "last_merge_ms": None}
+        self.refresh(force=True)
+
+    def __len__(self):
+        return self._size
+
+    def refresh(self, force: bool = False):
+        """Pulls rows written since the last refresh (by any process) into memory."""
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return
+        with self._lock:
+            self._last_refresh = now
+            rows = self.conn.execute("SELECT id, image_id, crop, phash, dhash FROM hashes WHERE id > ? ORDER BY id",
+                                     (self._last_row,)).fetchall()
+            if not rows:
+                return
+            data = np.array(rows, dtype=object)
+            self._append(np.array(data[:, 3], dtype=np.int64).view(np.uint64),
+                         np.array(data[:, 4], dtype=np.int64).view(np.uint64),
+                         np.array(data[:, 1], dtype=np.int64), np.array(data[:, 2], dtype=np.float32))
+            self._last_row = rows[-1][0]
+
+    def _append(self, phashes, dhashes, image_ids, crops):
+        n, k = self._size, len(phashes)
+        if n + k > self._phash.shape[0]:
+            capacity = max(1024, 2 * (n + k))
+            for name in ("_phash", "_dhash", "_image_ids", "_crops"):
+                old = getattr(self, name)
+                grown = np.empty(capacity, dtype=old.dtype)
+                grown[:n] = old[:n]
+                setattr(self, name, grown)
+        self._phash[n:n + k] = phashes
+        self._dhash[n:n + k] = dhashes
+        self._image_ids[n:n + k] = image_ids
+        self._crops[n:n + k] = crops
+        self._size = n + k
+        indexed = len(self._main) if self._main is not None else 0
+        if self._size - indexed > max(self.merge_rows, indexed // 32):
+            started = time.perf_counter()
+            self._main = MultiIndexHash(self._phash[:self._size].copy())
+            self.stats["merges"] += 1
+            self.stats["last_merge_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    def add_many(self, records: Iterable[Dict[str, Any]], backend: str = "local") -> int:
+        """
+        Stores images in one transaction. A record is {"name", "hashes": [(crop,
+        phash, dhash), ...], "sha256"?, "width"?, "height"?}. Re-adding a name
+        replaces its hashes (the object was overwritten).
+        """
+        count = 0
+        with self._lock, self.conn:
+            for record in records:
+                old = self.conn.execute("SELECT id FROM images WHERE backend = ? AND name = ?",
+                                        (backend, record["name"])).fetchone()
+                if old is not None:
+                    self.conn.execute("DELETE FROM hashes WHERE image_id = ?", old)
+                    self.conn.execute("DELETE FROM images WHERE id = ?", old)
+                cur = self.conn.execute(
+                    "INSERT INTO images (backend, name, sha256, width, height, indexed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (backend, record["name"], record.get("sha256"), record.get("width"), record.get("height"), time.time()))
+                self.conn.executemany("INSERT INTO hashes (image_id, crop, phash, dhash) VALUES (?, ?, ?, ?)",
+                                      [(cur.lastrowid, c, _signed(p), _signed(d)) for c, p, d in record["hashes"]])
+                count += 1
+        with self._lock:
+            self.stats["inserts"] += count
+            self.refresh(force=True)
+        return count
+
+    def known_content(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Hashes and size of an already indexed image with these exact bytes (no decode needed)."""
+        with self._lock:
+            row = self.conn.execute("SELECT id, width, height FROM images WHERE sha256 = ? LIMIT 1",
+                                    (sha256,)).fetchone()
+            if row is None:
+                return None
+            rows = self.conn.execute("SELECT crop, phash, dhash FROM hashes WHERE image_id = ? ORDER BY id",
+                                     row[:1]).fetchall()
+        if not rows:
+            return None
+        return {"hashes": [(c, p & ((1 << 64) - 1), d & ((1 << 64) - 1)) for c, p, d in rows],
+                "width": row[1], "height": row[2]}
+
+    def add_file(self, source, name: str, backend: str = "local", sha256: Optional[str] = None) -> bool:
+        """Incremental insert of one stored object (path or bytes); False if it is not a readable image."""
+        record = self.known_content(sha256) if sha256 else None
+        if record is None:
+            try:
+                image = open_for_hashing(source)
+            except Exception:
+                return False
+            width, height = image.info["original_size"]
+            record = {"hashes": image_hashes(image, self.crops), "width": width, "height": height}
+        self.add_many([{**record, "name": name, "sha256": sha256}], backend=backend)
+        return True
+
+    def names(self, backend: str) -> set:
+        with self._lock:
+            return {row[0] for row in self.conn.execute("SELECT name FROM images WHERE backend = ?", (backend,))}
+
+    def lookup(self, hashes: Sequence[Tuple[float, int, int]], radius: int = DEFAULT_RADIUS,
+               limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Near duplicates of an image given its `image_hashes`: every stored image
+        with a hash (whole or crop) within `radius` bits of one of the query's
+        hashes, closest first.
+        """
+        started = time.perf_counter()
+        self.refresh()
+        best: Dict[int, Tuple[int, int, float]] = {}
+        with self._lock:
+            indexed = len(self._main) if self._main is not None else 0
+            delta = slice(indexed, self._size)
+            for _, query_p, _ in hashes:
+                rows, distances = self._main.search(query_p, radius) if indexed else (np.empty(0, np.int64),) * 2
+                extra = popcount(self._phash[delta] ^ np.uint64(query_p))
+                near = np.nonzero(extra <= radius)[0]
+                rows = np.concatenate([rows, near + indexed]).astype(np.int64)
+                distances = np.concatenate([distances, extra[near]])
+                for row, dist in zip(rows.tolist(), distances.tolist()):
+                    image_id = int(self._image_ids[row])
+                    if image_id not in best or dist < best[image_id][0]:
+                        d = min(int(popcount(self._dhash[row:row + 1] ^ np.uint64(q_d))[0]) for _, _, q_d in hashes)
+                        best[image_id] = (dist, d, round(float(self._crops[row]), 3))
+        ranked = sorted(best.items(), key=lambda item: (item[1][0], item[1][1]))
+        # Replaced or deleted images stay in memory until restart and no longer resolve,
+        # so ids are resolved in chunks until `limit` live matches are found
+        matches = []
+        chunk = min(4 * limit, 500)
+        for start in range(0, len(ranked), chunk):
+            batch = ranked[start:start + chunk]
+            ids = [image_id for image_id, _ in batch]
+            with self._lock:
+                meta = {row[0]: row[1:] for row in self.conn.execute(
+                    f"SELECT id, backend, name, sha256, width, height FROM images WHERE id IN ({','.join('?' * len(ids))})", ids)}
+            for image_id, (dist, d, crop) in batch:
+                if image_id not in meta:
+                    continue
+                backend, name, sha256, width, height = meta[image_id]
+                matches.append({"name": name, "backend": backend, "sha256": sha256, "width": width, "height": height,
+                                "phash_distance": dist, "dhash_distance": d, "matched_crop": crop})
+                if len(matches) == limit:
+                    break
+            if len(matches) == limit:
+                break
+        self.stats["lookups"] += 1
+        self.stats["last_lookup_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return matches
+
+    def lookup_image(self, source, radius: int = DEFAULT_RADIUS, limit: int = 10) -> List[Dict[str, Any]]:
+        return self.lookup(image_hashes(open_for_hashing(source), self.crops), radius, limit)
+
+    def metrics(self) -> Dict[str, Any]:
+        indexed = len(self._main) if self._main is not None else 0
+        return {**self.stats, "hashes": self._size, "multi_indexed": indexed, "delta": self._size - indexed}
+
+
+_index: Optional[PerceptualIndex] = None
+
+
+def get_perceptual_index() -> Optional[PerceptualIndex]:
+    """Per-process handle on the shared index (None when PHASH_INDEX=off or it cannot be opened)."""
+    global _index
+    if _index is None and os.getenv("PHASH_INDEX", "on").lower() != "off":
+        try:
+            _index = PerceptualIndex()
+        except Exception as e:
+            print(f"Warning: Perceptual hash index unavailable: {e}")
+    return _index
+
+
+def _hash_job(path: str):
+    """Pool worker: (path, sha256, hashes, size) or (path, None, error, None)."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        image = open_for_hashing(data)
+        return path, hashlib.sha256(data).hexdigest(), image_hashes(image), image.info["original_size"]
+    except Exception as e:
+        return path, None, str(e), None
+
+
+def _storage_objects(storage) -> Tuple[str, List[Tuple[str, str]]]:
+    """(backend, [(name, local path or S3 key)]) for every image object in StorageManager."""
+    if storage.use_s3:
+        paginator = storage.s3_client.get_paginator("list_objects_v2")
+        keys = [obj["Key"] for page in paginator.paginate(Bucket=storage.bucket_name)
+                for obj in page.get("Contents", [])]
+        return f"s3:{storage.bucket_name}", [(k, k) for k in keys
+                                            if os.path.splitext(k)[1].lower() in IMAGE_EXTENSIONS]
+    objects = []
+    for root, _, files in os.walk(storage.local_storage_path):
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                path = os.path.join(root, name)
+                objects.append((os.path.relpath(path, storage.local_storage_path), path))
+    return "local", objects
+
+
+def bulk_index(index: PerceptualIndex, source: Optional[str] = None, workers: Optional[int] = None,
+               reindex: bool = False, batch_size: int = 512, out=sys.stderr) -> Dict[str, Any]:
+    """
+    Indexes StorageManager's objects (or the images under `source`) with a
+    process pool for local files and a thread pool of downloads for S3;
+    rows are committed in batches of `batch_size`.
+    """
+    from multiprocessing import Pool
+    from concurrent.futures import ThreadPoolExecutor
+
+    storage = None
+    if source:
+        from sherloq_cli import iter_batch_paths
+        backend = "local"
+        objects = [(os.path.abspath(p), p) for p in iter_batch_paths(source)
+                   if os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS]
+    else:
+        from s3_utils import StorageManager
+        storage = StorageManager()
+        backend, objects = _storage_objects(storage)
+    known = set() if reindex else index.names(backend)
+    todo = [(name, ref) for name, ref in objects if name not in known]
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    summary = {"backend": backend, "objects": len(objects), "skipped": len(objects) - len(todo),
+               "indexed": 0, "failed": 0}
+    names = {ref: name for name, ref in todo}
+    batch: List[Dict[str, Any]] = []
+
+    def collect(results):
+        for ref, digest, hashes, size in results:
+            if digest is None:
+                summary["failed"] += 1
+                print(f"skip {ref}: {hashes}", file=out)
+                continue
+            batch.append({"name": names[ref], "sha256": digest, "hashes": hashes,
+                          "width": size[0], "height": size[1]})
+            if len(batch) >= batch_size:
+                summary["indexed"] += index.add_many(batch, backend=backend)
+                batch.clear()
+                print(f"{summary['indexed']}/{len(todo)} indexed", file=out)
+
+    if storage is not None and storage.use_s3:
+        def fetch(key):
+            try:
+                data = storage.s3_client.get_object(Bucket=storage.bucket_name, Key=key)["Body"].read()
+                image = open_for_hashing(data)
+                return key, hashlib.sha256(data).hexdigest(), image_hashes(image), image.info["original_size"]
+            except Exception as e:
+                return key, None, str(e), None
+        with ThreadPoolExecutor(max_workers=max(4, workers)) as pool:
+            collect(pool.map(fetch, [ref for _, ref in todo]))
+    elif workers > 1:
+        with Pool(processes=workers) as pool:
+            collect(pool.imap_unordered(_hash_job, [ref for _, ref in todo], chunksize=16))
+    else:
+        collect(map(_hash_job, [ref for _, ref in todo]))
+    if batch:
+        summary["indexed"] += index.add_many(batch, backend=backend)
+    elapsed = time.perf_counter() - started
+    summary["seconds"] = round(elapsed, 2)
+    summary["images_per_s"] = round(summary["indexed"] / elapsed, 1) if elapsed > 0 else None
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perceptual-hash near-duplicate index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    index_cmd = sub.add_parser("index", help="bulk-index StorageManager or SOURCE")
+    index_cmd.add_argument("source", nargs="?", help="directory, glob pattern or manifest (default: StorageManager)")
+    index_cmd.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    index_cmd.add_argument("--reindex", action="store_true", help="rehash objects that are already indexed")
+    lookup_cmd = sub.add_parser("lookup", help="near duplicates of IMAGE")
+    lookup_cmd.add_argument("image_path")
+    lookup_cmd.add_argument("--radius", type=int, default=DEFAULT_RADIUS)
+    lookup_cmd.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    index = PerceptualIndex()
+    if args.command == "index":
+        print(json.dumps(bulk_index(index, args.source, args.workers, args.reindex)))
+    else:
+        matches = index.lookup_image(args.image_path, args.radius, args.limit)
+        print(json.dumps({"target": os.path.basename(args.image_path), "matches": matches,
+                          "lookup_ms": index.stats["last_lookup_ms"]}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
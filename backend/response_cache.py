@@ -0,0 +1,117 @@
+import time
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+
+class ResponseCache:
+    """
+    ذاكرة الإجابات (Response Cache)
+    Two tiers in front of the local LLM:
+      * exact   - SHA-256 of (model, mode, retrieved context, prompt)
+      * semantic - cosine similarity between the (already computed) query
+                   embedding and cached queries that share the same model,
+                   mode and retrieved context; served above `semantic_threshold`.
+    Entries expire after `ttl` seconds and are evicted LRU once either
+    `max_entries` or `max_bytes` is exceeded. The owner calls `clear()`
+    whenever the knowledge base changes.
+    """
+    ENTRY_OVERHEAD = 256
+
+    def __init__(self, ttl: float = 3600.0, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 semantic_threshold: float = 0.97):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.semantic_threshold = semantic_threshold
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.bytes_used = 0
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0,
+                      "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @staticmethod
+    def key(model: str, mode: str, context: str, prompt: str) -> str:
+        h = hashlib.sha256()
+        for part in (model, mode, context, prompt):
+            h.update((part or "").encode("utf-8"))
+            h.update(b"\x1f")
+        return h.hexdigest()
+
+    @staticmethod
+    def scope(model: str, mode: str, context: str) -> str:
+        return hashlib.sha256(f"{model}\x1f{mode}\x1f{context}".encode("utf-8")).hexdigest()
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self.bytes_used -= entry["size"]
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return entry["expires"] <= now
+
+    def lookup(self, key: str, vector: Optional[np.ndarray] = None,
+               scope: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Returns (cached result, tier) where tier is "exact" or "semantic", or (None, None)."""
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if self._expired(entry, now):
+                self._drop(key)
+                self.stats["expirations"] += 1
+            else:
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return dict(entry["value"]), "exact"
+
+        if vector is not None and scope is not None and self.semantic_threshold > 0:
+            best_key, best_score = None, self.semantic_threshold
+            for k, e in list(self._entries.items()):
+                if e["scope"] != scope or e["vector"] is None:
+                    continue
+                if self._expired(e, now):
+                    self._drop(k)
+                    self.stats["expirations"] += 1
+                    continue
+                # Vectors are unit length, so the dot product is the cosine similarity
+                score = float(np.dot(e["vector"], vector))
+                if score >= best_score:
+                    best_key, best_score = k, score
+            if best_key is not None:
+                self._entries.move_to_end(best_key)
+                self.stats["semantic_hits"] += 1
+                return dict(self._entries[best_key]["value"]), "semantic"
+
+        self.stats["misses"] += 1
+        return None, None
+
+    def store(self, key: str, value: Dict[str, Any], vector: Optional[np.ndarray] = None,
+              scope: Optional[str] = None):
+        size = self.ENTRY_OVERHEAD + len(str(value.get("content", "")).encode("utf-8"))
+        if vector is not None:
+            vector = np.asarray(vector, dtype=np.float32)
+            size += vector.nbytes
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = {"value": dict(value), "vector": vector, "scope": scope,
+                              "size": size, "expires": time.monotonic() + self.ttl}
+        self.bytes_used += size
+        while len(self._entries) > self.max_entries or self.bytes_used > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes_used = 0
+        self.stats["invalidations"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "bytes_used": self.bytes_used,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
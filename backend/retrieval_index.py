@@ -0,0 +1,110 @@
+import os
+import numpy as np
+from typing import Optional, Tuple
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-9)
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Partial selection (O(N)) followed by a sort of only the k winners."""
+    if top_k >= scores.shape[0]:
+        return np.argsort(scores)[::-1]
+    part = np.argpartition(scores, -top_k)[-top_k:]
+    return part[np.argsort(scores[part])[::-1]]
+
+
+class FlatIndex:
+    """
+    Exact cosine search over pre-normalised vectors.
+    The matrix may be the read-only memmap from EmbeddingStore; it is never copied.
+    """
+    kind = "flat"
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def search(self, query: np.ndarray, top_k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self.vectors @ query
+        ids = _top_k(scores, top_k)
+        return ids, scores[ids]
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index (IVF-Flat).
+    Vectors are clustered with spherical k-means into `nlist` cells; a query only
+    scans the `nprobe` closest cells. `nprobe` is the recall/latency knob:
+    nprobe == nlist is exact search, small values trade recall for speed.
+    """
+    kind = "ivf"
+
+    def __init__(self, vectors: np.ndarray, nlist: Optional[int] = None, nprobe: int = 8,
+                 train_iters: int = 10, sample_per_list: int = 64, seed: int = 0):
+        self.vectors = vectors
+        n = vectors.shape[0]
+        self.nlist = max(1, min(nlist or int(4 * np.sqrt(n)), n))
+        self.nprobe = nprobe
+        rng = np.random.default_rng(seed)
+
+        # Train centroids on a bounded sample so build time stays flat at 1M+ rows
+        sample_size = min(n, self.nlist * sample_per_list)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, self.nlist, replace=False)].copy()
+        for _ in range(train_iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            present, starts = np.unique(assign[order], return_index=True)
+            # Cells that lost all members keep their previous centroid
+            sums = centroids.copy()
+            sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+            centroids = normalize_rows(sums)
+        self.centroids = centroids
+
+        # Assign the full collection in chunks to bound temporary memory
+        assign = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 65536):
+            block = np.asarray(vectors[start:start + 65536])
+            assign[start:start + 65536] = np.argmax(block @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        self.list_ids = order
+        self.list_offsets = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def search(self, query: np.ndarray, top_k: int = 3, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        cells = _top_k(self.centroids @ query, nprobe)
+        spans = [(self.list_offsets[c], self.list_offsets[c + 1]) for c in cells]
+        rows = np.concatenate([np.arange(a, b) for a, b in spans]) if spans else np.empty(0, dtype=np.int64)
+        if rows.size == 0:
+            return rows, np.empty(0, dtype=np.float32)
+        # Candidates are gathered from the shared matrix; no per-worker copy of the vectors
+        ids = np.sort(self.list_ids[rows])
+        scores = self.vectors[ids] @ query
+        best = _top_k(scores, top_k)
+        return ids[best], scores[best]
+
+
+def build_index(vectors: Optional[np.ndarray], kind: Optional[str] = None):
+    """
+    Factory driven by env: KB_INDEX=auto|flat|ivf, KB_IVF_NLIST, KB_IVF_NPROBE.
+    `auto` keeps exact search for small archives and switches to IVF above KB_IVF_MIN_SIZE.
+    """
+    if vectors is None or len(vectors) == 0:
+        return None
+    kind = (kind or os.getenv("KB_INDEX", "auto")).lower()
+    if kind == "auto":
+        kind = "ivf" if len(vectors) >= int(os.getenv("KB_IVF_MIN_SIZE", "50000")) else "flat"
+    if kind == "ivf":
+        nlist = os.getenv("KB_IVF_NLIST")
+        return IVFIndex(vectors, nlist=int(nlist) if nlist else None,
+                        nprobe=int(os.getenv("KB_IVF_NPROBE", "8")))
+    return FlatIndex(vectors)
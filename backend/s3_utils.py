@@ -1,20 +1,77 @@
 
 import os
+import uuid
+import fcntl
 import shutil
+import asyncio
+import hashlib
 import logging
-from typing import Optional
+import tempfile
+from typing import Optional, Dict, Any, AsyncIterator
+from forensic_cache import ForensicCache, file_sha256
+from perceptual_index import get_perceptual_index, IMAGE_EXTENSIONS
+
+# Streaming uploads: S3 multipart part size and parts in flight; local write buffer
+PART_SIZE = max(int(os.getenv("STORAGE_PART_MB", "16")), 5) * 1024 * 1024  # S3 minimum part is 5 MB
+UPLOAD_CONCURRENCY = int(os.getenv("STORAGE_UPLOAD_CONCURRENCY", "4"))
+WRITE_BUFFER = int(os.getenv("STORAGE_WRITE_BUFFER_MB", "4")) * 1024 * 1024
+FICLONE = 0x40049409  # linux/fs.h: share extents with another file (btrfs, XFS, overlayfs on them)
+
+
+class ChecksumMismatch(ValueError):
+    pass
+
+
+def clone_file(src: str, dst: str) -> str:
+    """
+    Copies src to dst without moving the bytes through Python: a reflink
+    (copy-on-write, no data copied) where the filesystem supports it, else
+    copy_file_range (in-kernel copy, server-side on NFS 4.2), else a buffered
+    copy. Returns the method used.
+    """
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        try:
+            fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+            method = "reflink"
+        except OSError:
+            method = None
+        if method is None and hasattr(os, "copy_file_range"):
+            try:
+                while os.copy_file_range(fin.fileno(), fout.fileno(), 1 << 30):
+                    pass
+                method = "copy_file_range"
+            except OSError:
+                fin.seek(0)
+                fout.seek(0)
+                fout.truncate()
+        if method is None:
+            shutil.copyfileobj(fin, fout, 1024 * 1024)
+            method = "copy"
+    shutil.copymode(src, dst)
+    return method
 
 class StorageManager:
     """
     Hybrid Storage Manager (Sovereign Vault)
     Supports both Local Disk and S3 (MinIO/AWS).
     Configured via ENABLE_S3 env var.
+    Identical files are stored once: uploads are looked up by SHA-256 in the
+    content index and become a hardlink (local) or a server-side copy (S3).
+    Disable with STORAGE_DEDUP=false.
+    Stored images are added to the perceptual-hash index (PHASH_INDEX=off disables).
+    `upload_stream` stores an async byte stream (a request body) without holding
+    it in memory: parallel multipart upload on S3, a hashed temp file renamed
+    into place on disk. Local copies of existing files are reflinked or copied
+    in-kernel (`clone_file`).
     """
     def __init__(self):
         self.use_s3 = os.getenv("ENABLE_S3", "false").lower() == "true"
-        self.local_storage_path = "/app/uploads"
+        self.local_storage_path = os.getenv("STORAGE_LOCAL_PATH", "/app/uploads")
         # Determine base URL for local files (Localhost or Domain)
         self.host_url = os.getenv("API_BASE_URL", "http://localhost:8000")
+        self.index = ForensicCache() if os.getenv("STORAGE_DEDUP", "true").lower() == "true" else None
+        self.phash_index = get_perceptual_index()
+        self.stats = {"uploads": 0, "bytes": 0, "methods": {}, "checksum_failures": 0}
         
         if self.use_s3:
             import boto3
@@ -30,7 +87,7 @@ class StorageManager:
                     aws_access_key_id=self.access_key,
                     aws_secret_access_key=self.secret_key,
                     endpoint_url=self.endpoint_url,
-                    config=Config(signature_version='s3v4')
+                    config=Config(signature_version='s3v4', max_pool_connections=max(10, 2 * UPLOAD_CONCURRENCY))
                 )
             except Exception as e:
                 logging.error(f"Failed to init S3: {e}")
@@ -44,9 +101,27 @@ class StorageManager:
         if object_name is None:
             object_name = os.path.basename(file_path)
 
+        digest = None
+        if self.index is not None:
+            try:
+                digest = file_sha256(file_path)
+            except OSError as e:
+                logging.error(f"Hashing Error: {e}")
+
         if self.use_s3:
+            backend = f"s3:{self.bucket_name}"
             try:
-                self.s3_client.upload_file(file_path, self.bucket_name, object_name)
+                if digest and self._s3_dedup(digest, backend, object_name):
+                    self._index_image(file_path, object_name, backend, digest)
+                    return True
+                from boto3.s3.transfer import TransferConfig
+                self.s3_client.upload_file(file_path, self.bucket_name, object_name, Config=TransferConfig(
+                    multipart_threshold=PART_SIZE, multipart_chunksize=PART_SIZE, max_concurrency=UPLOAD_CONCURRENCY))
+                self._count("s3_transfer", os.path.getsize(file_path))
+                if digest:
+                    etag = self.s3_client.head_object(Bucket=self.bucket_name, Key=object_name)["ETag"]
+                    self.index.remember_object(digest, backend, object_name, etag)
+                self._index_image(file_path, object_name, backend, digest)
                 return True
             except Exception as e:
                 logging.error(f"S3 Upload Error: {e}")
@@ -55,12 +130,256 @@ class StorageManager:
             # Local Storage Strategy
             try:
                 target_path = os.path.join(self.local_storage_path, object_name)
-                shutil.copy(file_path, target_path)
+                if digest and self._local_dedup(digest, target_path):
+                    self._index_image(target_path, object_name, "local", digest)
+                    return True
+                # Write beside the target and rename: the old name may be a hardlink
+                # shared with other objects, which must not be overwritten in place
+                tmp_path = f"{target_path}.{os.getpid()}.tmp"
+                self._count(clone_file(file_path, tmp_path), os.path.getsize(tmp_path))
+                os.replace(tmp_path, target_path)
+                if digest:
+                    self.index.remember_object(digest, "local", object_name, self._fingerprint(target_path))
+                self._index_image(target_path, object_name, "local", digest)
                 return True
             except Exception as e:
                 logging.error(f"Local Save Error: {e}")
                 return False
 
+    async def upload_file_async(self, file_path: str, object_name: Optional[str] = None) -> bool:
+        """`upload_file` on a worker thread, for async handlers."""
+        return await asyncio.to_thread(self.upload_file, file_path, object_name)
+
+    async def upload_stream(self, chunks: AsyncIterator[bytes], object_name: str,
+                            expected_sha256: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Stores an async stream of byte chunks as `object_name`, computing its
+        SHA-256 in the same pass. Memory stays bounded by the write buffer
+        (local) or (UPLOAD_CONCURRENCY + 1) parts (S3). With `expected_sha256`
+        a mismatching upload is discarded and ChecksumMismatch raised.
+        """
+        if not object_name or object_name.startswith("/") or ".." in object_name.split("/"):
+            raise ValueError(f"Invalid object name: {object_name!r}")
+        expected = expected_sha256.lower() if expected_sha256 else None
+        if self.use_s3:
+            result = await self._stream_to_s3(chunks, object_name, expected)
+        else:
+            result = await self._stream_to_local(chunks, object_name, expected)
+        self._count(result["method"], result["size"])
+        return result
+
+    def _count(self, method: str, size: int):
+        self.stats["uploads"] += 1
+        self.stats["bytes"] += size
+        self.stats["methods"][method] = self.stats["methods"].get(method, 0) + 1
+
+    def _verify(self, digest: str, expected: Optional[str]):
+        if expected and digest != expected:
+            self.stats["checksum_failures"] += 1
+            raise ChecksumMismatch(f"SHA-256 mismatch: received {digest}, expected {expected}")
+
+    @staticmethod
+    def _hash_part(sha, spool, data: bytes):
+        sha.update(data)
+        if spool is not None:
+            spool.write(data)
+
+    @staticmethod
+    def _write_hashed(f, sha, data: bytes):
+        sha.update(data)
+        f.write(data)
+
+    async def _stream_to_local(self, chunks, object_name: str, expected: Optional[str]) -> Dict[str, Any]:
+        root = os.path.realpath(self.local_storage_path)
+        target_path = os.path.realpath(os.path.join(root, object_name))
+        if not target_path.startswith(root + os.sep):
+            raise ValueError(f"Invalid object name: {object_name!r}")
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        # Written beside the target, then renamed: the bytes are written exactly once
+        tmp_path = f"{target_path}.{uuid.uuid4().hex}.tmp"
+        sha, size = hashlib.sha256(), 0
+        f = await asyncio.to_thread(open, tmp_path, 'wb')
+        try:
+            pending, pending_size = [], 0
+            async for chunk in chunks:
+                pending.append(chunk)
+                pending_size += len(chunk)
+                if pending_size >= WRITE_BUFFER:
+                    await asyncio.to_thread(self._write_hashed, f, sha, b"".join(pending))
+                    size += pending_size
+                    pending, pending_size = [], 0
+            if pending:
+                await asyncio.to_thread(self._write_hashed, f, sha, b"".join(pending))
+                size += pending_size
+            await asyncio.to_thread(f.close)
+            digest = sha.hexdigest()
+            self._verify(digest, expected)
+        except BaseException:
+            f.close()
+            os.unlink(tmp_path)
+            raise
+        method = await asyncio.to_thread(self._commit_local, tmp_path, target_path, object_name, digest)
+        await asyncio.to_thread(self._index_image, target_path, object_name, "local", digest)
+        return {"object_name": object_name, "backend": "local", "size": size, "sha256": digest, "method": method}
+
+    async def _stream_to_s3(self, chunks, object_name: str, expected: Optional[str]) -> Dict[str, Any]:
+        backend = f"s3:{self.bucket_name}"
+        sha, size = hashlib.sha256(), 0
+        upload_id, number = None, 0
+        parts, tasks = [], set()
+        slots = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+        # Images are also spooled to a private temp file in the hashing pass, so the
+        # perceptual hash is computed locally instead of reading the object back
+        spool = await asyncio.to_thread(tempfile.TemporaryFile) if self._indexable(object_name) else None
+
+        async def send(part_number: int, data: bytes):
+            try:
+                response = await asyncio.to_thread(
+                    self.s3_client.upload_part, Bucket=self.bucket_name, Key=object_name,
+                    UploadId=upload_id, PartNumber=part_number, Body=data)
+                parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+            finally:
+                slots.release()
+
+        async def dispatch(data: bytes):
+            nonlocal upload_id, number
+            if upload_id is None:
+                upload_id = (await asyncio.to_thread(
+                    self.s3_client.create_multipart_upload, Bucket=self.bucket_name, Key=object_name))["UploadId"]
+            # Backpressure: the body is not read further while UPLOAD_CONCURRENCY parts are in flight
+            await slots.acquire()
+            number += 1
+            tasks.add(asyncio.create_task(send(number, data)))
+            for task in [t for t in tasks if t.done()]:
+                tasks.discard(task)
+                task.result()  # surfaces a failed part early
+
+        try:
+            pending, pending_size = [], 0
+            async for chunk in chunks:
+                pending.append(chunk)
+                pending_size += len(chunk)
+                if pending_size >= PART_SIZE:
+                    data = b"".join(pending)
+                    pending, pending_size = [], 0
+                    await asyncio.to_thread(self._hash_part, sha, spool, data)
+                    size += len(data)
+                    await dispatch(data)
+            data = b"".join(pending)
+            await asyncio.to_thread(self._hash_part, sha, spool, data)
+            size += len(data)
+            digest = sha.hexdigest()
+            if upload_id is None:
+                # Fits in one part: a single PUT
+                self._verify(digest, expected)
+                await asyncio.to_thread(self.s3_client.put_object, Bucket=self.bucket_name, Key=object_name,
+                                        Body=data, Metadata={"sha256": digest})
+                method = "put"
+            else:
+                if data:
+                    await dispatch(data)
+                await asyncio.gather(*tasks)
+                self._verify(digest, expected)
+                await asyncio.to_thread(
+                    self.s3_client.complete_multipart_upload, Bucket=self.bucket_name, Key=object_name,
+                    UploadId=upload_id,
+                    MultipartUpload={"Parts": sorted(parts, key=lambda p: p["PartNumber"])})
+                method = "multipart"
+        except BaseException:
+            if spool is not None:
+                spool.close()
+            for task in tasks:
+                task.cancel()
+            if upload_id is not None:
+                try:
+                    await asyncio.to_thread(self.s3_client.abort_multipart_upload, Bucket=self.bucket_name,
+                                            Key=object_name, UploadId=upload_id)
+                except Exception as e:
+                    logging.error(f"S3 Abort Error: {e}")
+            raise
+        try:
+            if self.index is not None:
+                etag = (await asyncio.to_thread(self.s3_client.head_object, Bucket=self.bucket_name, Key=object_name))["ETag"]
+                await asyncio.to_thread(self.index.remember_object, digest, backend, object_name, etag)
+            if spool is not None:
+                await asyncio.to_thread(spool.seek, 0)
+                await asyncio.to_thread(self._index_image, spool, object_name, backend, digest)
+        finally:
+            if spool is not None:
+                spool.close()
+        return {"object_name": object_name, "backend": backend, "size": size, "sha256": digest,
+                "method": method, "parts": number}
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "backend": f"s3:{self.bucket_name}" if self.use_s3 else "local",
+                "part_size": PART_SIZE, "upload_concurrency": UPLOAD_CONCURRENCY}
+
+    def _indexable(self, object_name: str) -> bool:
+        return self.phash_index is not None and os.path.splitext(object_name)[1].lower() in IMAGE_EXTENSIONS
+
+    def _index_image(self, path, object_name: str, backend: str, digest: Optional[str]):
+        """Incremental perceptual-hash insert; never fails the upload."""
+        if not self._indexable(object_name):
+            return
+        try:
+            self.phash_index.add_file(path, object_name, backend, sha256=digest)
+        except Exception as e:
+            logging.error(f"Perceptual Index Error: {e}")
+
+
+    @staticmethod
+    def _fingerprint(path: str) -> Optional[str]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return f"{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+    def _commit_local(self, tmp_path: str, target_path: str, object_name: str, digest: str) -> str:
+        """Moves a verified temp file into place (or hardlinks known bytes); returns the method."""
+        if self.index is not None and self._local_dedup(digest, target_path):
+            # Same bytes already stored: target is now a hardlink to them
+            os.unlink(tmp_path)
+            return "hardlink"
+        os.replace(tmp_path, target_path)
+        if self.index is not None:
+            self.index.remember_object(digest, "local", object_name, self._fingerprint(target_path))
+        return "stream"
+
+    def _local_dedup(self, digest: str, target_path: str) -> bool:
+        """Hardlinks target_path to a stored file with the same bytes, if one is still intact."""
+        known = self.index.object_for(digest, "local")
+        if not known:
+            return False
+        source_path = os.path.join(self.local_storage_path, known["name"])
+        if self._fingerprint(source_path) != known["fingerprint"]:
+            return False
+        if os.path.abspath(source_path) == os.path.abspath(target_path):
+            return True
+        tmp_path = f"{target_path}.{os.getpid()}.tmp"
+        try:
+            os.link(source_path, tmp_path)
+            os.replace(tmp_path, target_path)
+        except OSError:
+            return False
+        return True
+
+    def _s3_dedup(self, digest: str, backend: str, object_name: str) -> bool:
+        """Server-side copy from an object with the same bytes, if its ETag is unchanged."""
+        known = self.index.object_for(digest, backend)
+        if not known:
+            return False
+        try:
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=known["name"])
+        except Exception:
+            return False
+        if head["ETag"] != known["fingerprint"]:
+            return False
+        if known["name"] != object_name:
+            self.s3_client.copy_object(Bucket=self.bucket_name, Key=object_name,
+                                       CopySource={"Bucket": self.bucket_name, "Key": known["name"]})
+        return True
+
     def get_file_url(self, object_name: str) -> Optional[str]:
         """Returns a viewable URL for the file"""
         if self.use_s3:
@@ -6,85 +6,420 @@ Sovereign Forensic Analysis Tool
 - Metadata Extraction
 - Error Level Analysis (ELA) with visual mapping
 - Frequency-based Deepfake detection (FFT Artifact Analysis)
+
+Usage:
+  sherloq_cli.py IMAGE                      single JSON report
+  sherloq_cli.py --batch SOURCE [--workers N]
+      SOURCE is a directory (recursive), a glob pattern, or a manifest
+      (.txt/.lst one path per line, .json list, .jsonl {"path": ...} per line).
+      Emits one JSON report per line as each image completes.
+
+  Reports are cached by image SHA-256 under FORENSIC_CACHE_DIR
+  (disable with --no-cache or SHERLOQ_CACHE=off).
+  SHERLOQ_ELA_HEATMAP=full|downscale|tiles|none|auto selects the ELA map
+  output (default full resolution; auto: full up to SHERLOQ_ELA_MAX_SIDE px,
+  else downscaled).
+  Images of SHERLOQ_ELA_TILED_MIN_MP megapixels or more get tiled ELA with
+  per-region scores (SHERLOQ_ELA_REGION_TILE px, SHERLOQ_ELA_TILE_WORKERS threads)
+  and an ELA map assembled from the tiles; outlying regions are listed, the
+  status follows the global error level as for smaller images.
 """
 
 import sys
 import json
 import os
 import io
+import glob
+import math
 import base64
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from PIL import Image, ImageChops, ImageEnhance
+from PIL import Image
 import exifread
+from forensic_cache import ForensicCache, file_sha256
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.webp', '.gif', '.heic'}
+
+def load_image(image_path):
+    """
+    Reads the file once and decodes it once.
+    Returns (raw bytes, RGB image) so EXIF parsing, ELA and FFT share the same buffer.
+    """
+    with open(image_path, 'rb') as f:
+        data = f.read()
+    image = Image.open(io.BytesIO(data)).convert('RGB')
+    return data, image
+
+def open_reduced(image_path, size):
+    """
+    Opens an image for analyses that only need about `size` px per side.
+    JPEGs are scaled down by up to 8x inside the decoder (draft mode), so the
+    full-resolution pixels are never materialised; other formats decode normally.
+    """
+    image = Image.open(image_path)
+    image.draft('RGB', (size, size))
+    return image.convert('RGB')
+
+ELA_QUALITY = 90
+FFT_SIZE = 512
+FFT_MASK_RADIUS = 60
+# Bump when a kernel changes its output so cached reports are not reused
+ANALYSIS_VERSION = 3
+
+# ELA heatmap output: full | downscale | tiles | none | auto (full up to ELA_MAX_SIDE, else downscale)
+ELA_HEATMAP = os.getenv("SHERLOQ_ELA_HEATMAP", "full")
+ELA_MAX_SIDE = int(os.getenv("SHERLOQ_ELA_MAX_SIDE", "2048"))
+ELA_TILE = int(os.getenv("SHERLOQ_ELA_TILE", "512"))
+ELA_STRIP_ROWS = 256
 
-def analyze_ela(image_path, quality=90):
+_workspace = threading.local()
+
+def _buffer(name, shape, dtype=np.uint8):
+    """
+    Per-thread scratch buffer, reallocated only when a larger one is needed,
+    so strips of consecutive images reuse the same memory.
+    """
+    buffers = _workspace.__dict__.setdefault('buffers', {})
+    size = int(np.prod(shape))
+    buf = buffers.get(name)
+    if buf is None or buf.size < size or buf.dtype != dtype:
+        buf = buffers[name] = np.empty(size, dtype=dtype)
+    return buf[:size].reshape(shape)
+
+def _ela_strips(original, compressed, rows):
+    """Yields (top, |original - compressed|) one horizontal strip at a time."""
+    width, height = original.size
+    for top in range(0, height, rows):
+        bottom = min(top + rows, height)
+        a = np.asarray(original.crop((0, top, width, bottom)))
+        b = np.asarray(compressed.crop((0, top, width, bottom)))
+        diff = _buffer('ela_diff', a.shape)
+        lo = _buffer('ela_lo', a.shape)
+        # |a - b| on uint8 without widening: max(a, b) - min(a, b)
+        np.maximum(a, b, out=diff)
+        np.minimum(a, b, out=lo)
+        np.subtract(diff, lo, out=diff)
+        yield top, diff
+
+def _max_pool(block, factor):
+    """factor x factor max-pooling; partial edge blocks are padded with zeros."""
+    rows, cols, channels = block.shape
+    prows, pcols = -(-rows // factor) * factor, -(-cols // factor) * factor
+    if (prows, pcols) != (rows, cols):
+        padded = _buffer('ela_pool', (prows, pcols, channels))
+        padded[rows:] = 0
+        padded[:rows, cols:] = 0
+        padded[:rows, :cols] = block
+        block = padded
+    return block.reshape(prows // factor, factor, pcols // factor, factor, channels).max(axis=(1, 3))
+
+def _brightness_lut(max_diff):
+    # Same mapping as ImageEnhance.Brightness(diff).enhance(255 / max_diff)
+    scale = 255.0 / max_diff if max_diff > 0 else 1
+    return np.clip(np.arange(256) * scale, 0, 255).astype(np.uint8)
+
+def _apply_lut(lut, pixels, chunk_rows=64):
+    """In-place lut[pixels]; chunked because np.take widens the indices to intp."""
+    for top in range(0, pixels.shape[0], chunk_rows):
+        block = pixels[top:top + chunk_rows]
+        np.take(lut, block, out=block)
+
+def _png_base64(pixels):
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format='PNG')
+    return base64.b64encode(buf.getvalue()).decode('utf-8')
+
+def analyze_ela(image_path, quality=ELA_QUALITY, image=None, heatmap=None, max_side=None, tile_size=None):
     """
     Performs Error Level Analysis (ELA) to detect digital manipulation.
     Returns a base64 encoded heatmap and modification metrics.
+
+    The difference is computed strip by strip into reused buffers, so apart from
+    the two decoded images memory stays bounded by the heatmap that is requested:
+      full      - full-resolution PNG (original behaviour)
+      downscale - max-pooled so the longest side is at most `max_side`
+      tiles     - full-resolution PNG tiles of `tile_size` px, built in a second pass
+      none      - metrics only
     """
     try:
-        original = Image.open(image_path).convert('RGB')
-        
+        original = image if image is not None else Image.open(image_path).convert('RGB')
+        heatmap = heatmap or ELA_HEATMAP
+        max_side = max_side or ELA_MAX_SIDE
+        tile_size = tile_size or ELA_TILE
+        width, height = original.size
+        if heatmap == 'auto':
+            heatmap = 'full' if max(width, height) <= max_side else 'downscale'
+
         # Step 1: Save a compressed temporary version in memory
         buf = io.BytesIO()
         original.save(buf, 'JPEG', quality=quality)
         buf.seek(0)
         compressed = Image.open(buf)
-        
-        # Step 2: Calculate the absolute difference between original and resaved
-        diff = ImageChops.difference(original, compressed)
-        
+        compressed.load()
+        buf.close()
+
+        # Step 2: Absolute difference per strip, tracking the maximum and the heatmap
+        factor = 1
+        if heatmap == 'downscale':
+            factor = max(1, -(-max(width, height) // max_side))
+        rows = max(factor, ELA_STRIP_ROWS // factor * factor)
+        heat = None
+        if heatmap in ('full', 'downscale'):
+            heat = np.empty((-(-height // factor), -(-width // factor), 3), dtype=np.uint8)
+        max_diff = 0
+        for top, diff in _ela_strips(original, compressed, rows):
+            max_diff = max(max_diff, int(diff.max()))
+            if heat is not None:
+                pooled = diff if factor == 1 else _max_pool(diff, factor)
+                heat[top // factor:top // factor + pooled.shape[0]] = pooled
+
         # Step 3: Enhance the difference to make modification artifacts visible
-        extrema = diff.getextrema()
-        max_diff = max([ex[1] for ex in extrema])
-        scale = 255.0 / max_diff if max_diff > 0 else 1
-        enhanced_diff = ImageEnhance.Brightness(diff).enhance(scale)
-        
-        # Step 4: Encode the ELA map to base64 for direct frontend rendering
-        ela_buf = io.BytesIO()
-        enhanced_diff.save(ela_buf, format='PNG')
-        ela_base64 = base64.b64encode(ela_buf.getvalue()).decode('utf-8')
-        
+        lut = _brightness_lut(max_diff)
+
         # Heuristic for modification probability based on variance and max difference
         ela_score = max_diff / 255.0
-        
-        return {
-            "ela_map_base64": f"data:image/png;base64,{ela_base64}",
+        result = {
             "modification_probability": round(ela_score, 4),
             "integrity_status": "suspicious" if ela_score > 0.18 else "likely_original"
         }
+
+        # Step 4: Encode the ELA map to base64 for direct frontend rendering
+        if heat is not None:
+            _apply_lut(lut, heat)
+            result["ela_map_base64"] = f"data:image/png;base64,{_png_base64(heat)}"
+            if factor > 1:
+                result["ela_map_scale"] = factor
+        elif heatmap == 'tiles':
+            tiles = []
+            for top, diff in _ela_strips(original, compressed, tile_size):
+                _apply_lut(lut, diff)
+                for left in range(0, width, tile_size):
+                    tile = diff[:, left:left + tile_size]
+                    tiles.append({"x": left, "y": top, "width": tile.shape[1], "height": tile.shape[0],
+                                  "png_base64": _png_base64(tile)})
+            result["ela_tiles"] = tiles
+            result["tile_size"] = tile_size
+        return result
     except Exception as e:
         return {"error": str(e), "modification_probability": 0, "integrity_status": "error"}
 
-def detect_deepfake(image_path):
+# Tiled ELA for images too large to hold several decoded copies of
+# (satellite captures, high-resolution scans)
+ELA_REGION_TILE = int(os.getenv("SHERLOQ_ELA_REGION_TILE", "512"))
+ELA_TILE_WORKERS = int(os.getenv("SHERLOQ_ELA_TILE_WORKERS", "1"))
+ELA_TILED_MIN_MP = float(os.getenv("SHERLOQ_ELA_TILED_MIN_MP", "40"))
+JPEG_MCU = 16
+# Iglewicz-Hoaglin modified z-score above which a region is flagged
+REGION_Z_THRESHOLD = 3.5
+
+class _StagedPixels:
+    """
+    RGB pixels of an image file parked in an unlinked scratch file.
+    PIL cannot decode part of a JPEG, so the file is decoded once in full (the
+    peak of the tiled path: one decoded copy) and written out strip by strip,
+    then the decoded image is released; bands of rows are
+    read back with pread into one reused buffer. Written and read through the
+    page cache (no mmap), so none of it counts against the worker's RSS.
+    """
+    def __init__(self, image_path, scratch_dir=None):
+        self.file = tempfile.TemporaryFile(dir=scratch_dir or os.getenv("SHERLOQ_SCRATCH_DIR"))
+        with Image.open(image_path) as src:
+            self.width, self.height = src.size
+            src.load()
+            for top in range(0, self.height, ELA_STRIP_ROWS):
+                box = (0, top, self.width, min(top + ELA_STRIP_ROWS, self.height))
+                self.file.write(np.asarray(src.crop(box).convert('RGB')).tobytes())
+        self.file.flush()
+
+    def band(self, top, bottom):
+        row_bytes = self.width * 3
+        out = _buffer('ela_band', (bottom - top, self.width, 3))
+        view = memoryview(out.reshape(-1))
+        offset, done = top * row_bytes, 0
+        while done < len(view):
+            n = os.preadv(self.file.fileno(), [view[done:]], offset + done)
+            if n <= 0:
+                raise IOError("Scratch file truncated")
+            done += n
+        return out
+
+    def close(self):
+        self.file.close()
+
+class _ImageBands:
+    """Same band interface over an image that is already decoded."""
+    def __init__(self, image):
+        self.image = image
+        self.width, self.height = image.size
+
+    def band(self, top, bottom):
+        return np.asarray(self.image.crop((0, top, self.width, bottom)))
+
+    def close(self):
+        pass
+
+def _ela_tile(tile, quality, factor=0):
+    """
+    Re-saves one tile and returns (max, mean) of |tile - resaved|, the
+    tile's texture (mean absolute gradient of the green channel) and, if
+    `factor` is set, the difference max-pooled by `factor` for the ELA map.
+    """
+    buf = io.BytesIO()
+    Image.fromarray(np.ascontiguousarray(tile)).save(buf, 'JPEG', quality=quality)
+    buf.seek(0)
+    resaved = np.asarray(Image.open(buf).convert('RGB'))
+    diff = np.maximum(tile, resaved)
+    diff -= np.minimum(tile, resaved)
+    green = tile[:, :, 1].astype(np.int16)
+    texture = (np.abs(np.diff(green, axis=0)).mean() if green.shape[0] > 1 else 0.0) + \
+              (np.abs(np.diff(green, axis=1)).mean() if green.shape[1] > 1 else 0.0)
+    pooled = (diff if factor == 1 else _max_pool(diff, factor).copy()) if factor else None
+    return int(diff.max()), float(diff.mean()), float(texture), pooled
+
+def analyze_ela_tiled(image_path, quality=ELA_QUALITY, image=None, tile_size=None, workers=None):
+    """
+    Error Level Analysis in independent tiles with per-region suspicion scores.
+
+    Tiles are aligned to the 16 px JPEG MCU grid, so re-saving a tile lands on
+    the same block boundaries as re-saving the whole image. After the file is
+    staged (one full decode, see `_StagedPixels`) memory is bounded by one band
+    of tile rows plus one tile per worker and the ELA map; tiles of a band are
+    re-encoded in parallel threads (PIL and NumPy release the GIL).
+
+    Each region's mean error, relative to its texture, is compared with the
+    image-wide median (modified z-score over the MAD): a pasted or retouched
+    area that went through a different compression history stands out even
+    when the global maximum looks normal. Outlying regions are reported for
+    review; as in `analyze_ela`, integrity_status follows the global error
+    level only, since some tiles of any large natural image are outliers.
+
+    The ELA map is assembled from the tiles at full resolution, as in
+    `analyze_ela`; with SHERLOQ_ELA_HEATMAP=downscale, auto or tiles it is
+    max-pooled so its longest side is at most SHERLOQ_ELA_MAX_SIDE
+    (ela_map_scale), and none leaves it out.
+    """
+    try:
+        width, height = image.size if image is not None else Image.open(image_path).size
+        if ELA_HEATMAP in ('full', 'none'):
+            factor = int(ELA_HEATMAP == 'full')
+        else:
+            factor = max(1, -(-max(width, height) // ELA_MAX_SIDE))
+        # Tiles start on the MCU grid and on the pooling grid, so pooled tiles fit the map exactly
+        step = math.lcm(JPEG_MCU, factor or 1)
+        tile_size = max(step, -(-(tile_size or ELA_REGION_TILE) // step) * step)
+        workers = workers or ELA_TILE_WORKERS
+        source = _ImageBands(image) if image is not None else _StagedPixels(image_path)
+        executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        heat = np.zeros((-(-height // factor), -(-width // factor), 3), dtype=np.uint8) if factor else None
+        regions, levels = [], []
+        try:
+            for top in range(0, source.height, tile_size):
+                bottom = min(top + tile_size, source.height)
+                band = source.band(top, bottom)
+                lefts = list(range(0, source.width, tile_size))
+                tiles = [band[:, left:left + tile_size] for left in lefts]
+                if executor is not None:
+                    stats = executor.map(_ela_tile, tiles, [quality] * len(tiles), [factor] * len(tiles))
+                else:
+                    stats = (_ela_tile(tile, quality, factor) for tile in tiles)
+                for left, tile, (max_diff, mean_error, texture, pooled) in zip(lefts, tiles, stats):
+                    regions.append({"x": left, "y": top, "width": tile.shape[1], "height": tile.shape[0],
+                                    "max_diff": max_diff, "mean_error": round(mean_error, 6),
+                                    "texture": round(texture, 4)})
+                    if heat is not None:
+                        heat[top // factor:top // factor + pooled.shape[0],
+                             left // factor:left // factor + pooled.shape[1]] = pooled
+                    # Error level per unit of texture: busy areas re-compress worse than
+                    # flat ones, so raw error alone would flag every edge
+                    levels.append(mean_error / (texture + 1.0))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            source.close()
+
+        levels = np.array(levels)
+        median = float(np.median(levels))
+        mad = max(float(np.median(np.abs(levels - median))), 1e-6)
+        flagged = []
+        for region, level in zip(regions, levels):
+            z = 0.6745 * (level - median) / mad
+            region["z_score"] = round(float(z), 2)
+            region["suspicion"] = round(min(max(z / (2 * REGION_Z_THRESHOLD), 0.0), 1.0), 4)
+            if z > REGION_Z_THRESHOLD:
+                flagged.append(region)
+
+        max_diff = max(r["max_diff"] for r in regions)
+        ela_score = max_diff / 255.0
+        result = {
+            "modification_probability": round(ela_score, 4),
+            "integrity_status": "suspicious" if ela_score > 0.18 else "likely_original",
+            "tile_size": tile_size,
+            "grid": [-(-source.height // tile_size), -(-source.width // tile_size)],
+            "median_error_level": round(median, 6),
+            "suspicious_regions": len(flagged),
+            "flagged_regions": [{k: r[k] for k in ("x", "y", "width", "height", "z_score")} for r in flagged],
+            "regions": regions,
+        }
+        if heat is not None:
+            _apply_lut(_brightness_lut(max_diff), heat)
+            result["ela_map_base64"] = f"data:image/png;base64,{_png_base64(heat)}"
+            if factor > 1:
+                result["ela_map_scale"] = factor
+        return result
+    except Exception as e:
+        return {"error": str(e), "modification_probability": 0, "integrity_status": "error"}
+
+def _hermitian_weights(cols, n):
+    """
+    rfft2 keeps columns 0..n/2 of the full spectrum; every column except 0
+    (and n/2 for even n) stands for itself and its conjugate mirror.
+    """
+    weights = np.full(cols, 2.0)
+    weights[0] = 1.0
+    if n % 2 == 0:
+        weights[-1] = 1.0
+    return weights
+
+def detect_deepfake(image_path, image=None, size=FFT_SIZE, mask_radius=FFT_MASK_RADIUS):
     """
     Lightweight deepfake detection using Frequency-Domain analysis (Fast Fourier Transform).
     Detects 'checkerboard' artifacts typical in GAN and Diffusion-based generations.
     """
     try:
         # Load as grayscale and resize to standard dimensions for analysis
-        img = Image.open(image_path).convert('L')
-        img = img.resize((512, 512))
-        data = np.array(img)
-        
-        # Perform 2D Fast Fourier Transform
-        f_transform = np.fft.fft2(data)
-        f_shift = np.fft.fftshift(f_transform)
-        magnitude_spectrum = 20 * np.log(np.abs(f_shift) + 1)
-        
-        # Focus on high-frequency components (corners of the spectrum)
-        # Synthetic images often show unnatural regular peaks in these areas
-        rows, cols = data.shape
-        crow, ccol = rows // 2 , cols // 2
-        mask_radius = 60
-        
-        # Mask out the low-frequency center (natural features)
-        high_freq_only = magnitude_spectrum.copy()
-        high_freq_only[crow-mask_radius:crow+mask_radius, ccol-mask_radius:ccol+mask_radius] = 0
-        
+        img = (image if image is not None else Image.open(image_path)).convert('L')
+        img = img.resize((size, size))
+        data = np.asarray(img, dtype=np.float64)
+
+        # Real-input 2D FFT: half the spectrum, the other half is its conjugate mirror
+        magnitude = np.abs(np.fft.rfft2(data))
+        np.log1p(magnitude, out=magnitude)
+        magnitude *= 20
+
+        # std over the full, fftshift-ed spectrum with the low-frequency centre
+        # [c-r, c+r) x [c-r, c+r) set to zero, from sums over the half spectrum.
+        # Zeroed entries still count in n; their sums are subtracted instead of copying.
+        weights = _hermitian_weights(magnitude.shape[1], size)
+        total = weights @ magnitude.sum(axis=0)
+        total_sq = weights @ np.einsum('ij,ij->j', magnitude, magnitude)
+
+        # Centre frequencies (u, v) in [-r, r): columns v >= 0 are stored directly,
+        # v < 0 are read through the mirror (-u, -v)
+        r = mask_radius
+        centre = (magnitude[:r, :r], magnitude[size - r:, :r],
+                  magnitude[:r + 1, 1:r + 1], magnitude[size - r + 1:, 1:r + 1])
+        total -= sum(block.sum() for block in centre)
+        total_sq -= sum(np.einsum('ij,ij->', block, block) for block in centre)
+
         # Calculate standard deviation of high frequencies as a 'synthetic noise' metric
-        std_dev = np.std(high_freq_only)
-        
+        n = size * size
+        mean = total / n
+        std_dev = float(np.sqrt(max(total_sq / n - mean * mean, 0.0)))
+
         # Normalize score between 0 and 1
         # Empirically, values above 12-15 in high-freq STD indicate synthetic artifacts
         prob = min(max((std_dev - 5) / 20.0, 0.0), 1.0)
@@ -101,11 +436,11 @@ def detect_deepfake(image_path):
             "method": f"Deepfake Detection Error: {str(e)}"
         }
 
-def extract_metadata(image_path):
+def extract_metadata(image_path, data=None):
     """Extracts comprehensive EXIF metadata from the target image."""
     meta_dict = {}
     try:
-        with open(image_path, 'rb') as f:
+        with (io.BytesIO(data) if data is not None else open(image_path, 'rb')) as f:
             tags = exifread.process_file(f, details=False)
             for tag in tags.keys():
                 if tag not in ('JPEGThumbnail', 'TIFFThumbnail', 'Filename', 'EXIF MakerNote'):
@@ -114,26 +449,174 @@ def extract_metadata(image_path):
         meta_dict['error'] = str(e)
     return meta_dict
 
+def analysis_params():
+    """Every setting that changes a report; part of the result cache key."""
+    return {
+        "version": ANALYSIS_VERSION,
+        "ela_quality": ELA_QUALITY,
+        "ela_heatmap": ELA_HEATMAP,
+        "ela_max_side": ELA_MAX_SIDE,
+        "ela_tile": ELA_TILE,
+        "fft_size": FFT_SIZE,
+        "fft_mask_radius": FFT_MASK_RADIUS,
+        "ela_tiled_min_mp": ELA_TILED_MIN_MP,
+        "ela_region_tile": ELA_REGION_TILE,
+    }
+
+_cache = None
+
+def get_cache():
+    """Per-process handle on the shared on-disk result cache (None when SHERLOQ_CACHE=off)."""
+    global _cache
+    if _cache is None and os.getenv("SHERLOQ_CACHE", "on").lower() != "off":
+        _cache = ForensicCache()
+    return _cache
+
+def _report(image_path, digest, forensics, cached):
+    return {
+        "target": os.path.basename(image_path),
+        "path": image_path,
+        "sha256": digest,
+        "cached": cached,
+        "forensics": forensics,
+        "timestamp": "2025-05-20T10:00:00Z"
+    }
+
+def cached_report(image_path):
+    """The cached report for this image's bytes, or None (cheap: hashes the file, no decoding)."""
+    cache = get_cache()
+    if cache is None:
+        return None
+    try:
+        digest = file_sha256(image_path)
+    except OSError:
+        return None
+    forensics = cache.get(cache.key(digest, analysis_params()))
+    return _report(image_path, digest, forensics, True) if forensics is not None else None
+
+def analyze_file(image_path, use_cache=True):
+    """
+    Full forensic report for one image, decoding it only once.
+    Reports are cached by content hash, so a re-submitted image (any file name)
+    is answered from the cache without decoding it.
+    """
+    cache = get_cache() if use_cache else None
+    digest, key = None, None
+    try:
+        digest = file_sha256(image_path)
+        if cache is not None:
+            key = cache.key(digest, analysis_params())
+            forensics = cache.get(key)
+            if forensics is not None:
+                return _report(image_path, digest, forensics, True)
+    except OSError:
+        pass
+
+    try:
+        with Image.open(image_path) as probe:
+            megapixels = probe.size[0] * probe.size[1] / 1e6
+        if megapixels >= ELA_TILED_MIN_MP:
+            # Very large images are never decoded next to their copies: tiled ELA from
+            # staged pixels, FFT on a reduced decode, EXIF streamed from the file
+            forensics = {
+                "ela_analysis": analyze_ela_tiled(image_path),
+                "deepfake_detection": detect_deepfake(image_path, image=open_reduced(image_path, 2 * FFT_SIZE)),
+                "metadata": extract_metadata(image_path)
+            }
+        else:
+            data, image = load_image(image_path)
+            forensics = {
+                "ela_analysis": analyze_ela(image_path, image=image),
+                "deepfake_detection": detect_deepfake(image_path, image=image),
+                "metadata": extract_metadata(image_path, data=data)
+            }
+        if key is not None:
+            cache.put(key, forensics)
+    except Exception as e:
+        # Same per-analysis error fields as when each analysis opened the file itself
+        forensics = {
+            "ela_analysis": {"error": str(e), "modification_probability": 0, "integrity_status": "error"},
+            "deepfake_detection": {"fake_probability": 0.0, "is_synthetic": False,
+                                   "method": f"Deepfake Detection Error: {str(e)}"},
+            "metadata": extract_metadata(image_path)
+        }
+
+    return _report(image_path, digest, forensics, False)
+
+def iter_batch_entries(source):
+    """
+    Expands a directory, glob pattern or manifest file into image paths (lazily).
+    A manifest entry without a usable path yields an error report instead of
+    aborting the batch.
+    """
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    yield os.path.join(root, name)
+    elif os.path.isfile(source):
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, 'r', encoding='utf-8') as f:
+            if source.endswith('.json'):
+                entries = json.load(f)
+            elif source.endswith('.jsonl'):
+                entries = (json.loads(line) for line in f if line.strip())
+            else:
+                entries = (line.strip() for line in f if line.strip() and not line.startswith('#'))
+            for number, entry in enumerate(entries, 1):
+                path = entry.get('path') if isinstance(entry, dict) else entry
+                if not isinstance(path, str) or not path:
+                    yield {"error": f"Manifest entry {number} has no 'path'", "entry": entry}
+                    continue
+                yield path if os.path.isabs(path) else os.path.join(base, path)
+    else:
+        yield from sorted(glob.glob(source, recursive=True))
+
+def iter_batch_paths(source):
+    """Image paths of a batch source; entries without a path are skipped."""
+    return (entry for entry in iter_batch_entries(source) if isinstance(entry, str))
+
+def _analyze_entry(entry):
+    return entry if isinstance(entry, dict) else analyze_file(entry)
+
+def run_batch(source, workers=None, out=sys.stdout):
+    """Fans images out over a process pool and streams one JSON line per finished report."""
+    workers = workers or os.cpu_count() or 1
+    count = 0
+    with multiprocessing.Pool(processes=workers) as pool:
+        for report in pool.imap_unordered(_analyze_entry, iter_batch_entries(source), chunksize=1):
+            out.write(json.dumps(report) + "\n")
+            out.flush()
+            count += 1
+    return count
+
 def main():
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description="Sherloq forensic analysis (ELA, FFT deepfake, EXIF)")
+    parser.add_argument("image_path", nargs="?")
+    parser.add_argument("--batch", metavar="SOURCE", help="directory, glob pattern or manifest file")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="always recompute, ignoring the result cache")
+    args = parser.parse_args()
+
+    if args.no_cache:
+        os.environ["SHERLOQ_CACHE"] = "off"
+
+    if args.batch:
+        run_batch(args.batch, args.workers)
+        return
+
+    if not args.image_path:
         print(json.dumps({"error": "Missing image path argument"}))
         sys.exit(1)
 
-    image_path = sys.argv[1]
+    image_path = args.image_path
     if not os.path.exists(image_path):
         print(json.dumps({"error": f"Target file not found: {image_path}"}))
         sys.exit(1)
 
     # Compile the sovereign forensic report
-    report = {
-        "target": os.path.basename(image_path),
-        "forensics": {
-            "ela_analysis": analyze_ela(image_path),
-            "deepfake_detection": detect_deepfake(image_path),
-            "metadata": extract_metadata(image_path)
-        },
-        "timestamp": "2025-05-20T10:00:00Z"
-    }
+    report = analyze_file(image_path)
+    del report["path"]
 
     # Print pure JSON for the FastAPI backend to relay to React
     print(json.dumps(report))
@@ -0,0 +1,249 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional, Tuple
+
+# Rollups of each hypertable (db_schema.sql section 6), coarsest first: (bucket seconds, view)
+ROLLUPS: Dict[str, Tuple[Tuple[int, str], ...]] = {
+    "insight_indicators": ((86400, "insight_indicators_1d"), (3600, "insight_indicators_1h"),
+                           (60, "insight_indicators_1m")),
+    "insight_raw_signals": ((86400, "insight_raw_signals_1d"), (3600, "insight_raw_signals_1h"),
+                            (60, "insight_raw_signals_1m")),
+}
+
+# Retention policies of db_schema.sql section 7 (None = kept indefinitely)
+RETENTION: Dict[str, Optional[timedelta]] = {
+    "insight_indicators": timedelta(days=90),
+    "insight_raw_signals": timedelta(days=30),
+    "insight_indicators_1m": timedelta(days=30),
+    "insight_raw_signals_1m": timedelta(days=30),
+    "insight_indicators_1h": timedelta(days=365),
+    "insight_raw_signals_1h": timedelta(days=365),
+    "insight_indicators_1d": None,
+    "insight_raw_signals_1d": None,
+}
+
+# Group-by keys (also the accepted filters) and aggregates per table, for the raw
+# hypertable and for its rollups (which store counts and sums so they re-aggregate exactly)
+SERIES: Dict[str, Dict[str, Any]] = {
+    "insight_indicators": {
+        "keys": ("indicator_type", "location_id"),
+        "raw": "count(*) AS samples, avg(value) AS avg, min(value) AS min, max(value) AS max, "
+               "last(value, time) AS last",
+        "rollup": "sum(samples)::bigint AS samples, sum(sum_value) / NULLIF(sum(samples), 0) AS avg, "
+                  "min(min_value) AS min, max(max_value) AS max, last(last_value, bucket) AS last",
+        "sqlite": "count(*) AS samples, avg(value) AS avg, min(value) AS min, max(value) AS max, "
+                  "max(CASE WHEN rn = 1 THEN value END) AS last",
+    },
+    "insight_raw_signals": {
+        "keys": ("source", "category"),
+        "raw": "count(*) AS signals, avg(sentiment_score) AS avg_sentiment, "
+               "min(sentiment_score) AS min_sentiment, max(sentiment_score) AS max_sentiment",
+        "rollup": "sum(signals)::bigint AS signals, sum(sum_sentiment) / NULLIF(sum(scored), 0) AS avg_sentiment, "
+                  "min(min_sentiment) AS min_sentiment, max(max_sentiment) AS max_sentiment",
+        "sqlite": "count(*) AS signals, avg(sentiment_score) AS avg_sentiment, "
+                  "min(sentiment_score) AS min_sentiment, max(sentiment_score) AS max_sentiment",
+    },
+}
+
+# Resolutions picked when the caller only gives max_points
+NICE_RESOLUTIONS = (1, 5, 15, 30, 60, 300, 900, 3600, 21600, 86400, 604800)
+MAX_POINTS = 10000
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_resolution(value) -> int:
+    """'90' / 90 -> 90 s; '5m', '1h', '1d', '1w' -> seconds."""
+    text = str(value).strip().lower()
+    try:
+        seconds = int(text[:-1]) * _UNITS[text[-1]] if text[-1] in _UNITS else int(text)
+    except ValueError:
+        raise ValueError(f"Invalid resolution: {value!r} (use seconds or 30s/5m/1h/1d/1w)")
+    if seconds <= 0:
+        raise ValueError("Resolution must be positive")
+    return seconds
+
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def plan(table: str, resolution: int, start: datetime, now: Optional[datetime] = None,
+         rollups: bool = True) -> Dict[str, Any]:
+    """
+    Picks the coarsest source whose bucket width divides `resolution` and whose
+    retention still covers `start`: 1d, 1h, 1m rollup, then the raw hypertable.
+    When no such source holds the range any more (1-minute points three months
+    back), the finest source that does is used and the resolution is rounded up
+    to its bucket width (`degraded`).
+    """
+    if table not in SERIES:
+        raise ValueError(f"Unknown series table: {table}")
+    now = _utc(now or datetime.now(timezone.utc))
+    sources = (ROLLUPS[table] if rollups else ()) + ((0, table),)
+
+    def covers(source):
+        keep = RETENTION.get(source) if rollups else None
+        return keep is None or _utc(start) >= now - keep
+
+    for width, source in sources:
+        if (width == 0 or resolution % width == 0) and covers(source):
+            return {"source": source, "rollup": width > 0, "bucket_seconds": width, "resolution": resolution,
+                    "degraded": False}
+    for width, source in reversed(sources):
+        if covers(source):
+            return {"source": source, "rollup": width > 0, "bucket_seconds": width,
+                    "resolution": -(-resolution // width) * width if width else resolution, "degraded": True}
+    width, source = sources[0]
+    return {"source": source, "rollup": width > 0, "bucket_seconds": width,
+            "resolution": -(-resolution // width) * width if width else resolution, "degraded": True}
+
+
+class TimeSeriesReader:
+    """
+    قارئ السلاسل الزمنية (Time-Series Reader)
+    Serves bucketed series of insight_indicators / insight_raw_signals for
+    the dashboards. On TimescaleDB a query reads the coarsest continuous
+    aggregate that satisfies the requested resolution (see `plan`), so a
+    month of 1-hour points reads ~720 rollup rows per series instead of
+    every raw row. The SQLite stand-in has no rollups and buckets the raw
+    table.
+    """
+    def __init__(self, url: str, max_connections: int = 2):
+        self.url = url
+        self.pool = None
+        self.conn = None
+        if url.startswith(("postgres://", "postgresql://")):
+            from psycopg_pool import ConnectionPool
+            self.pool = ConnectionPool(url, min_size=1, max_size=max_connections, open=False)
+            self._opened = False
+        elif url.startswith("sqlite:///"):
+            self.conn = sqlite3.connect(url[len("sqlite:///"):], check_same_thread=False)
+        else:
+            raise ValueError(f"Unsupported time-series store URL: {url.split('://')[0]}://")
+        self._lock = threading.Lock()
+        self.stats = {"queries": 0, "rows_returned": 0, "by_source": {}, "degraded": 0, "last_query_ms": None}
+
+    @property
+    def rollups(self) -> bool:
+        return self.pool is not None
+
+    def query(self, table: str, start: datetime, end: Optional[datetime] = None, resolution=None,
+              max_points: int = 500, **filters) -> Dict[str, Any]:
+        """
+        Bucketed points of every (key, key) series in [start, end). Without
+        `resolution` it is chosen from NICE_RESOLUTIONS so that each series
+        has at most `max_points` points. `filters` are equality filters on
+        the table's keys (indicator_type/location_id or source/category).
+        """
+        spec = SERIES.get(table)
+        if spec is None:
+            raise ValueError(f"Unknown series table: {table}")
+        unknown = set(filters) - set(spec["keys"])
+        if unknown:
+            raise ValueError(f"Unknown filter(s) for {table}: {', '.join(sorted(unknown))}")
+        filters = {k: v for k, v in filters.items() if v is not None}
+        start, end = _utc(start), _utc(end or datetime.now(timezone.utc))
+        if end <= start:
+            raise ValueError("end must be after start")
+        span = (end - start).total_seconds()
+        if resolution is None:
+            wanted = span / max(max_points, 1)
+            resolution = next((r for r in NICE_RESOLUTIONS if r >= wanted),
+                              -(-int(wanted) // 604800) * 604800)
+        else:
+            resolution = parse_resolution(resolution)
+        chosen = plan(table, resolution, start, rollups=self.rollups)
+        if span / chosen["resolution"] > MAX_POINTS:
+            raise ValueError(f"{int(span // chosen['resolution'])} points per series requested (max {MAX_POINTS}); "
+                             f"use a coarser resolution or a shorter range")
+
+        started = time.perf_counter()
+        if self.rollups:
+            points = self._query_postgres(table, spec, chosen, start, end, filters)
+        else:
+            points = self._query_sqlite(table, spec, chosen, start, end, filters)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        with self._lock:
+            self.stats["queries"] += 1
+            self.stats["rows_returned"] += len(points)
+            self.stats["by_source"][chosen["source"]] = self.stats["by_source"].get(chosen["source"], 0) + 1
+            self.stats["degraded"] += chosen["degraded"]
+            self.stats["last_query_ms"] = elapsed_ms
+        return {
+            "table": table,
+            "source": chosen["source"],
+            "resolution_seconds": chosen["resolution"],
+            "degraded": chosen["degraded"],
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "points": points,
+            "query_ms": elapsed_ms,
+        }
+
+    def _query_postgres(self, table, spec, chosen, start, end, filters) -> List[Dict[str, Any]]:
+        from psycopg.rows import dict_row
+        keys = ", ".join(spec["keys"])
+        time_column = "bucket" if chosen["rollup"] else "time"
+        where = [f"{time_column} >= %(start)s", f"{time_column} < %(end)s"]
+        where += [f"{k} = %({k})s" for k in filters]
+        sql = (f"SELECT time_bucket(%(width)s, {time_column}) AS time, {keys}, "
+               f"{spec['rollup'] if chosen['rollup'] else spec['raw']} "
+               f"FROM {chosen['source']} WHERE {' AND '.join(where)} "
+               f"GROUP BY 1, {keys} ORDER BY {keys}, 1")
+        params = {"width": timedelta(seconds=chosen["resolution"]), "start": start, "end": end, **filters}
+        if not self._opened:
+            with self._lock:
+                if not self._opened:
+                    self.pool.open()
+                    self._opened = True
+        with self.pool.connection() as conn, conn.cursor(row_factory=dict_row) as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+    def _query_sqlite(self, table, spec, chosen, start, end, filters) -> List[Dict[str, Any]]:
+        # Rows are stored by timeseries_writer as UTC ISO 8601 text, so the range filter is a string compare
+        keys = ", ".join(spec["keys"])
+        width = int(chosen["resolution"])
+        bucket = f"(CAST(strftime('%s', time) AS INTEGER) / {width}) * {width}"
+        where = ["time >= ?", "time < ?"] + [f"{k} = ?" for k in filters]
+        sql = (f"SELECT bucket, {keys}, {spec['sqlite']} FROM ("
+               f"SELECT *, {bucket} AS bucket, ROW_NUMBER() OVER (PARTITION BY {bucket}, {keys} "
+               f"ORDER BY time DESC) AS rn FROM {table} WHERE {' AND '.join(where)}) "
+               f"GROUP BY bucket, {keys} ORDER BY {keys}, bucket")
+        params = [start.isoformat(), end.isoformat(), *filters.values()]
+        with self._lock:
+            cur = self.conn.execute(sql, params)
+            names = [d[0] for d in cur.description]
+            rows = cur.fetchall()
+        points = []
+        for row in rows:
+            point = dict(zip(names, row))
+            points.append({"time": datetime.fromtimestamp(point.pop("bucket"), timezone.utc), **point})
+        return points
+
+    def close(self):
+        if self.pool is not None and self._opened:
+            self.pool.close()
+        if self.conn is not None:
+            self.conn.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "store": "postgres" if self.rollups else "sqlite"}
+
+
+_reader: Optional[TimeSeriesReader] = None
+
+
+def get_reader() -> Optional[TimeSeriesReader]:
+    """Process-wide reader on TIMESERIES_URL (default DATABASE_URL); None when neither is set."""
+    global _reader
+    if _reader is None:
+        url = os.getenv("TIMESERIES_URL") or os.getenv("DATABASE_URL")
+        if not url:
+            return None
+        _reader = TimeSeriesReader(url, max_connections=int(os.getenv("TS_READER_POOL", "2")))
+    return _reader
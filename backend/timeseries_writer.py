@@ -0,0 +1,354 @@
+import os
+import json
+import time
+import glob
+import atexit
+import sqlite3
+import threading
+from datetime import datetime, date
+from typing import Dict, List, Any, Iterable, Optional, Sequence, Tuple
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Written columns of the db_schema.sql tables (insight_predictions.id is SERIAL)
+TABLES: Dict[str, Tuple[str, ...]] = {
+    "insight_raw_signals": ("time", "source", "category", "raw_data", "sentiment_score"),
+    "insight_indicators": ("time", "indicator_type", "value", "location_id", "confidence_interval"),
+    "insight_predictions": ("created_at", "target_event", "probability", "causal_factors",
+                            "time_window_start", "time_window_end", "threat_level"),
+    "audit_logs": ("timestamp", "user_id", "prompt_text", "model_response", "safety_flag",
+                   "flag_category", "human_override_reason"),
+}
+
+
+def _plain(value):
+    """JSON/JSONB columns are written as text; datetimes as ISO 8601."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class PostgresSink:
+    """
+    Writes batches to Postgres/TimescaleDB with COPY ... FROM STDIN, one
+    transaction per table batch, over a small psycopg connection pool.
+    """
+    name = "postgres"
+
+    def __init__(self, dsn: str, max_connections: int = 4):
+        from psycopg_pool import ConnectionPool
+        self.pool = ConnectionPool(dsn, min_size=1, max_size=max_connections, open=False)
+        self._opened = False
+
+    def write(self, table: str, columns: Sequence[str], rows: List[Sequence[Any]]):
+        if not self._opened:
+            self.pool.open()
+            self._opened = True
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row([_plain(v) for v in row])
+
+    def close(self):
+        if self._opened:
+            self.pool.close()
+
+
+class SQLiteSink:
+    """
+    In-process stand-in for local runs and benchmarks: same tables and
+    columns, multi-row inserts in one transaction per batch.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str = ":memory:", tables: Dict[str, Tuple[str, ...]] = TABLES):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        for table, columns in tables.items():
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+        self.conn.commit()
+
+    def write(self, table: str, columns: Sequence[str], rows: List[Sequence[Any]]):
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        with self._lock, self.conn:
+            self.conn.executemany(sql, ([_plain(v) for v in row] for row in rows))
+
+    def close(self):
+        self.conn.close()
+
+
+def make_sink(url: str):
+    """postgres(ql)://... -> PostgresSink; sqlite:///path.db or sqlite://:memory: -> SQLiteSink."""
+    if url.startswith(("postgres://", "postgresql://")):
+        return PostgresSink(url, max_connections=int(os.getenv("TS_WRITER_POOL", "4")))
+    if url.startswith("sqlite:///"):
+        return SQLiteSink(url[len("sqlite:///"):])  # sqlite:///relative.db, sqlite:////abs/path.db
+    if url in ("sqlite://", "sqlite://:memory:"):
+        return SQLiteSink(":memory:")
+    raise ValueError(f"Unsupported time-series store URL: {url.split('://')[0]}://")
+
+
+class BufferedWriter:
+    """
+    كاتب السلاسل الزمنية المُجمِّع (Buffered Time-Series Writer)
+    `add()` only appends to an in-memory buffer per table. A background
+    thread writes the buffers in bulk when `max_rows` are waiting or every
+    `flush_interval` seconds, whichever comes first. On a failed write the
+    rows go back to the front of the buffer and the flush is retried with
+    backoff. Nothing is dropped: past `max_buffered` rows (database down for
+    a long time), once flushes have failed for `spill_after` seconds (if set)
+    and at shutdown, unwritten rows are spilled to JSONL files in
+    `spill_dir`, which are replayed into the sink by the next writer.
+    """
+    def __init__(self, sink, tables: Dict[str, Tuple[str, ...]] = TABLES, max_rows: int = 5000,
+                 flush_interval: float = 1.0, max_buffered: int = 500000, spill_dir: Optional[str] = None,
+                 spill_after: Optional[float] = None, name: str = "ts-writer"):
+        self.sink = sink
+        self.tables = tables
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.spill_dir = spill_dir
+        self.spill_after = spill_after
+        self.name = name
+        self._buffers: Dict[str, List[tuple]] = {t: [] for t in tables}
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._failures = 0
+        self._failing_since: Optional[float] = None
+        # Spill files from earlier runs (or an outage) are replayed once the sink accepts writes
+        self._replay_due = bool(spill_dir)
+        self.stats = {"rows_added": 0, "rows_written": 0, "flushes": 0, "failed_flushes": 0,
+                      "rows_spilled": 0, "rows_replayed": 0, "last_flush_ms": None, "last_error": None}
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def add(self, table: str, row: Dict[str, Any]):
+        self.add_many(table, (row,))
+
+    def add_many(self, table: str, rows: Iterable[Dict[str, Any]]):
+        columns = self.tables[table]
+        values = [tuple(row.get(c) for c in columns) for row in rows]
+        if self._closed:
+            raise RuntimeError("Writer is closed")
+        with self._lock:
+            self._buffers[table].extend(values)
+            self._buffered += len(values)
+            self.stats["rows_added"] += len(values)
+            buffered = self._buffered
+        # While the sink is failing the flusher keeps its backoff instead of retrying per batch
+        if buffered >= self.max_rows and not self._failures:
+            self._wake.set()
+        if buffered > self.max_buffered:
+            self._spill_overflow()
+
+    def flush(self) -> bool:
+        """Writes everything buffered so far; False if some rows are still waiting (sink error)."""
+        with self._flush_lock:
+            with self._lock:
+                pending = {t: rows for t, rows in self._buffers.items() if rows}
+                for t in pending:
+                    self._buffers[t] = []
+                self._buffered = 0
+            if not pending:
+                return True
+            started = time.perf_counter()
+            failed: Dict[str, List[tuple]] = {}
+            for table, rows in pending.items():
+                if failed:
+                    failed[table] = rows
+                    continue
+                try:
+                    self.sink.write(table, self.tables[table], rows)
+                    self.stats["rows_written"] += len(rows)
+                except Exception as e:
+                    failed[table] = rows
+                    self.stats["last_error"] = f"{type(e).__name__}: {e}"
+            if failed:
+                with self._lock:
+                    for table, rows in failed.items():
+                        self._buffers[table][:0] = rows
+                        self._buffered += len(rows)
+                self._failures += 1
+                if self._failing_since is None:
+                    self._failing_since = time.monotonic()
+                self.stats["failed_flushes"] += 1
+                print(f"{self.name}: flush failed ({sum(map(len, failed.values()))} rows kept): {self.stats['last_error']}")
+                return False
+            self._failures = 0
+            self._failing_since = None
+            self.stats["flushes"] += 1
+            self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            return True
+
+    def _run(self):
+        while not self._closed:
+            # Back off while the database is failing: 1x, 2x, 4x ... the interval, at most 30 s
+            delay = min(self.flush_interval * (2 ** self._failures), 30.0)
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self._closed:
+                break
+            try:
+                if self.flush():
+                    if self._replay_due:
+                        self._replay_due = False
+                        self.replay_spill()
+                        if not self._replay_due:
+                            self._failures, self._failing_since = 0, None
+                elif self.spill_after is not None and time.monotonic() - self._failing_since >= self.spill_after:
+                    self._spill_buffered()
+            except Exception as e:
+                print(f"{self.name}: error: {e}")
+
+    def _spill_overflow(self):
+        """Moves the oldest rows to disk so the buffer stays bounded during a long outage."""
+        with self._lock:
+            excess = self._buffered - self.max_buffered // 2
+            spilled: Dict[str, List[tuple]] = {}
+            for table, rows in self._buffers.items():
+                if excess <= 0:
+                    break
+                take = rows[:excess]
+                if take:
+                    spilled[table] = take
+                    del rows[:len(take)]
+                    self._buffered -= len(take)
+                    excess -= len(take)
+        if spilled and self._spill(spilled):
+            self._replay_due = True
+        elif spilled:
+            with self._lock:
+                for table, rows in spilled.items():
+                    self._buffers[table][:0] = rows
+                    self._buffered += len(rows)
+
+    def _spill_buffered(self):
+        """Moves every buffered row to disk (sink failing for `spill_after` seconds)."""
+        with self._flush_lock, self._lock:
+            buffers = {t: rows for t, rows in self._buffers.items() if rows}
+            self._buffers = {t: [] for t in self.tables}
+            self._buffered = 0
+        if not buffers:
+            return
+        if self._spill(buffers):
+            self._replay_due = True
+        else:
+            with self._lock:
+                for table, rows in buffers.items():
+                    self._buffers[table][:0] = rows
+                    self._buffered += len(rows)
+
+    def _spill(self, buffers: Dict[str, List[tuple]]) -> bool:
+        if not self.spill_dir:
+            return False
+        entries = [{"table": table, "row": [_plain(v) for v in row]}
+                   for table, rows in buffers.items() for row in rows]
+        path = os.path.join(self.spill_dir, f"spill-{time.time_ns()}-{os.getpid()}.jsonl")
+        try:
+            self._write_spill(path, entries)
+        except OSError as e:
+            print(f"{self.name}: spill to {self.spill_dir} failed: {e}")
+            return False
+        self.stats["rows_spilled"] += len(entries)
+        print(f"{self.name}: spilled {len(entries)} rows to {path}")
+        return True
+
+    @staticmethod
+    def _write_spill(path: str, entries: List[Dict[str, Any]]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False))
+                f.write("\n")
+        os.replace(path + ".tmp", path)
+
+    def replay_spill(self) -> int:
+        """Writes rows spilled by earlier runs or outages; a file is deleted once fully written."""
+        if not self.spill_dir:
+            return 0
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.spill_dir, "spill-*.jsonl"))):
+            # Claim the file first: several worker processes may share the spill directory
+            claimed = f"{path}.replay-{os.getpid()}"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            with open(claimed, "r", encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            written = 0
+            try:
+                for start in range(0, len(entries), self.max_rows):
+                    chunk = entries[start:start + self.max_rows]
+                    by_table: Dict[str, List[list]] = {}
+                    for entry in chunk:
+                        by_table.setdefault(entry["table"], []).append(entry["row"])
+                    for table, rows in by_table.items():
+                        self.sink.write(table, self.tables[table], rows)
+                    written += len(chunk)
+            except Exception as e:
+                # Put back what is still unwritten (a chunk's tables may be written twice, never lost)
+                self._write_spill(path, entries[written:])
+                os.unlink(claimed)
+                print(f"{self.name}: spill replay of {path} stopped after {written} rows: {e}")
+                self._replay_due = True
+                # The sink is still failing: back off like a failed flush
+                self._failures += 1
+                break
+            finally:
+                replayed += written
+                self.stats["rows_replayed"] += written
+            os.unlink(claimed)
+        return replayed
+
+    def close(self, timeout: float = 10.0):
+        """Stops the flusher and writes what is left; rows the sink refuses are spilled."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout)
+        deadline = time.monotonic() + timeout
+        while not self.flush() and time.monotonic() < deadline:
+            time.sleep(min(0.5, max(deadline - time.monotonic(), 0)))
+        with self._lock:
+            left = {t: rows for t, rows in self._buffers.items() if rows}
+            self._buffers = {t: [] for t in self.tables}
+            self._buffered = 0
+        if left and not self._spill(left):
+            print(f"{self.name}: lost {sum(map(len, left.values()))} rows at shutdown (no spill dir)")
+        self.sink.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "sink": self.sink.name, "buffered": self._buffered, "consecutive_failures": self._failures}
+
+
+_writer: Optional[BufferedWriter] = None
+
+
+def get_writer() -> Optional[BufferedWriter]:
+    """
+    Process-wide writer on TIMESERIES_URL (default DATABASE_URL); None when neither is set.
+    It is flushed (or spilled) at interpreter exit.
+    """
+    global _writer
+    if _writer is None:
+        url = os.getenv("TIMESERIES_URL") or os.getenv("DATABASE_URL")
+        if not url:
+            return None
+        _writer = BufferedWriter(
+            make_sink(url),
+            max_rows=int(os.getenv("TS_WRITER_BATCH_ROWS", "5000")),
+            flush_interval=float(os.getenv("TS_WRITER_FLUSH_S", "1.0")),
+            max_buffered=int(os.getenv("TS_WRITER_MAX_BUFFERED", "500000")),
+            spill_dir=os.getenv("TS_WRITER_SPILL_DIR", os.path.join(DATA_DIR, "ts_spill")),
+        )
+        atexit.register(_writer.close)
+    return _writer
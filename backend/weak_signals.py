@@ -0,0 +1,194 @@
+import numpy as np
+from scipy import sparse
+from typing import Dict, List, Any, Optional
+
+from lexicon import Lexicon
+
+HOUR = 3600
+
+
+def keyword_counts(lexicon: Lexicon, texts, categories=None) -> sparse.csr_matrix:
+    """
+    Per-text term counts as a CSR matrix (texts x lexicon terms, int32); a term
+    inside a longer matched one ("انقطاع" in "انقطاع الكهرباء") is not counted.
+    Identical texts (reposts, forwarded messages) are scanned once and their
+    rows replicated by index.
+    """
+    unique: Dict[str, int] = {}
+    inverse = np.fromiter((unique.setdefault(t, len(unique)) for t in texts), dtype=np.int64, count=len(texts))
+    indptr = np.zeros(len(unique) + 1, dtype=np.int64)
+    cols: List[int] = []
+    term_index = lexicon.term_index
+    for row, text in enumerate(unique):
+        if text:
+            cols.extend(term_index[m["term"]] for m in lexicon.find(text, categories))
+        indptr[row + 1] = len(cols)
+    counts = sparse.csr_matrix(
+        (np.ones(len(cols), dtype=np.int32), np.asarray(cols, dtype=np.int64), indptr),
+        shape=(len(unique), len(lexicon.terms)),
+    )
+    counts.sum_duplicates()
+    return counts if len(unique) == len(texts) else counts[inverse]
+
+
+def batch_column(batch, name: str) -> np.ndarray:
+    if hasattr(batch, "column_names"):
+        # pyarrow Table / RecordBatch
+        return batch.column(name).to_numpy(zero_copy_only=False)
+    return np.asarray(batch[name])
+
+
+def _hours(timestamps: np.ndarray) -> np.ndarray:
+    """Epoch hour of each timestamp (datetime64 or epoch seconds)."""
+    if np.issubdtype(timestamps.dtype, np.datetime64):
+        return timestamps.astype("datetime64[h]").astype(np.int64)
+    return (timestamps.astype(np.float64) // HOUR).astype(np.int64)
+
+
+class RollingSignalWindow:
+    """
+    نافذة الإشارات المتحركة (Rolling Weak-Signal Window)
+    Per-location, per-hour aggregates over the last `window_hours` hours,
+    kept in ring buffers indexed by (location, hour % window_hours). Each
+    columnar batch {"text", "location", "timestamp"} (dict of arrays or a
+    pyarrow Table) is added once; hours leaving the window are subtracted as
+    the clock advances, so scoring never rescans old posts.
+    Score of a location = share of its posts carrying a signal term in the
+    window, relative to `saturation` (that share or more scores 1.0).
+    Posts older than the window are counted as late and dropped.
+    """
+    def __init__(self, lexicon: Lexicon, categories=("weak_signals",), window_hours: int = 24,
+                 saturation: float = 0.25):
+        self.lexicon = lexicon
+        self.categories = categories
+        self.window_hours = window_hours
+        self.saturation = saturation
+        self.n_terms = len(lexicon.terms)
+        self.locations: Dict[str, int] = {}
+        self.latest_hour: Optional[int] = None
+        self._slot_hour = np.full(window_hours, -1, dtype=np.int64)
+        self._texts = np.zeros((0, window_hours), dtype=np.int64)
+        self._hits = np.zeros((0, window_hours), dtype=np.int64)
+        self._slot_terms = [sparse.csr_matrix((0, self.n_terms), dtype=np.int64) for _ in range(window_hours)]
+        self._term_totals = sparse.csr_matrix((0, self.n_terms), dtype=np.int64)
+        self.stats = {"batches": 0, "texts": 0, "hit_texts": 0, "late": 0}
+
+    def _location_ids(self, locations: np.ndarray) -> np.ndarray:
+        names, inverse = np.unique(locations.astype(str), return_inverse=True)
+        ids = np.array([self.locations.setdefault(str(name), len(self.locations)) for name in names], dtype=np.int64)
+        rows = len(self.locations)
+        if rows > self._texts.shape[0]:
+            grow = max(rows, 2 * self._texts.shape[0])
+            pad = ((0, grow - self._texts.shape[0]), (0, 0))
+            self._texts, self._hits = np.pad(self._texts, pad), np.pad(self._hits, pad)
+            for m in self._slot_terms + [self._term_totals]:
+                m.resize((grow, self.n_terms))
+        return ids[inverse.ravel()]
+
+    def _advance(self, hour: int):
+        """Moves the window end to `hour`, expiring the hours that fall out of it."""
+        if self.latest_hour is not None and hour <= self.latest_hour:
+            return
+        start = hour - self.window_hours + 1
+        if self.latest_hour is not None:
+            start = max(start, self.latest_hour + 1)
+        for h in range(start, hour + 1):
+            slot = h % self.window_hours
+            if self._slot_hour[slot] >= 0:
+                self._term_totals = self._term_totals - self._slot_terms[slot]
+                self._slot_terms[slot] = sparse.csr_matrix(self._term_totals.shape, dtype=np.int64)
+                self._texts[:, slot] = 0
+                self._hits[:, slot] = 0
+            self._slot_hour[slot] = h
+        self.latest_hour = hour
+
+    def update(self, batch) -> Dict[str, Any]:
+        """Adds one columnar batch; returns per-batch counters."""
+        texts = batch_column(batch, "text")
+        hours = _hours(batch_column(batch, "timestamp"))
+        loc_ids = self._location_ids(batch_column(batch, "location"))
+        self.stats["batches"] += 1
+        if len(texts) == 0:
+            return {"texts": 0, "hit_texts": 0, "late": 0}
+
+        self._advance(int(hours.max()))
+        live = hours > self.latest_hour - self.window_hours
+        late = int(len(texts) - live.sum())
+        if late:
+            texts, hours, loc_ids = texts[live], hours[live], loc_ids[live]
+
+        counts = keyword_counts(self.lexicon, texts, self.categories).astype(np.int64)
+        hit = np.diff(counts.indptr) > 0
+        slots = hours % self.window_hours
+        cells = loc_ids * self.window_hours + slots
+        size = self._texts.size
+        self._texts += np.bincount(cells, minlength=size).reshape(self._texts.shape)
+        self._hits += np.bincount(cells, weights=hit, minlength=size).astype(np.int64).reshape(self._hits.shape)
+
+        # Term counts per (location, hour): one indicator-matrix product per hour present
+        rows = self._texts.shape[0]
+        for slot in np.unique(slots[hit]):
+            members = np.flatnonzero((slots == slot) & hit)
+            grouping = sparse.csr_matrix(
+                (np.ones(len(members), dtype=np.int64), (loc_ids[members], np.arange(len(members)))),
+                shape=(rows, len(members)),
+            )
+            by_location = grouping @ counts[members]
+            self._slot_terms[slot] = self._slot_terms[slot] + by_location
+            self._term_totals = self._term_totals + by_location
+
+        hit_texts = int(hit.sum())
+        self.stats["texts"] += len(texts)
+        self.stats["hit_texts"] += hit_texts
+        self.stats["late"] += late
+        return {"texts": len(texts), "hit_texts": hit_texts, "late": late}
+
+    def _score(self, texts, hits):
+        rate = np.divide(hits, texts, out=np.zeros(np.shape(texts), dtype=np.float64), where=np.asarray(texts) > 0)
+        return rate, np.minimum(rate / self.saturation, 1.0)
+
+    def scores(self, top_terms: int = 5) -> Dict[str, Dict[str, Any]]:
+        """Rolling score of every location over the whole window."""
+        texts = self._texts.sum(axis=1)
+        hits = self._hits.sum(axis=1)
+        rate, score = self._score(texts, hits)
+        result = {}
+        for name, loc in self.locations.items():
+            row = self._term_totals.getrow(loc)
+            order = np.argsort(row.data)[::-1][:top_terms]
+            result[name] = {
+                "texts": int(texts[loc]),
+                "hit_texts": int(hits[loc]),
+                "hit_rate": round(float(rate[loc]), 4),
+                "score": round(float(score[loc]), 4),
+                "top_terms": [(self.lexicon.terms[row.indices[i]][0], int(row.data[i])) for i in order],
+            }
+        return result
+
+    def hourly(self, location: str) -> List[Dict[str, Any]]:
+        """Per-hour series for one location, oldest hour first."""
+        loc = self.locations.get(location)
+        if loc is None or self.latest_hour is None:
+            return []
+        series = []
+        for hour in range(self.latest_hour - self.window_hours + 1, self.latest_hour + 1):
+            slot = hour % self.window_hours
+            if self._slot_hour[slot] != hour:
+                continue
+            rate, score = self._score(self._texts[loc, slot], self._hits[loc, slot])
+            series.append({
+                "hour_start": int(hour) * HOUR,
+                "texts": int(self._texts[loc, slot]),
+                "hit_texts": int(self._hits[loc, slot]),
+                "score": round(float(score), 4),
+            })
+        return series
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "locations": len(self.locations),
+            "window_hours": self.window_hours,
+            "latest_hour": self.latest_hour * HOUR if self.latest_hour is not None else None,
+            "term_cells": int(self._term_totals.nnz),
+        }
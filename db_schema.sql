@@ -38,14 +38,139 @@ VALUES
 (NOW() - INTERVAL '30 minutes', 'car_density', 0.85, 'Sana_Central_Market', 0.78);
 
 -- 5. جدول سجلات الحوكمة والمساءلة (Governance & Audit Logs)
+-- Written in bulk by backend/audit_log.py. A hypertable's primary key must include
+-- its time column, hence (id, timestamp).
 CREATE TABLE IF NOT EXISTS audit_logs (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INT NOT NULL,
-    timestamp TIMESTAMPTZ DEFAULT NOW(),
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     prompt_text TEXT,              -- ماذا سأل المستخدم؟
     model_response TEXT,           -- بماذا أجاب النظام؟
     safety_flag BOOLEAN DEFAULT FALSE, -- هل تم تفعيل حواجز الحماية؟
     flag_category TEXT,            -- تصنيف الخطر (Hate Speech, Deepfake, Privacy)
-    human_override_reason TEXT     -- إذا تدخل المشرف لتغيير القرار، لماذا؟
+    human_override_reason TEXT,    -- إذا تدخل المشرف لتغيير القرار، لماذا؟
+    PRIMARY KEY (id, timestamp)
 );
 SELECT create_hypertable('audit_logs', 'timestamp', if_not_exists => TRUE);
+
+-- 6. التجميعات المستمرة (Continuous Aggregates / Rollups)
+-- Dashboards read these instead of the raw hypertables (see backend/timeseries_query.py).
+-- Each rollup keeps re-aggregatable columns (counts and sums, not averages), so a
+-- coarser view or a query at any multiple of the bucket width stays exact.
+-- The 1h and 1d views are built on the finer view (hierarchical, TimescaleDB >= 2.9)
+-- and all views are real-time: the not-yet-materialized tail is read from the source.
+CREATE MATERIALIZED VIEW IF NOT EXISTS insight_indicators_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 minute', time) AS bucket,
+       indicator_type,
+       location_id,
+       count(*) AS samples,
+       sum(value) AS sum_value,
+       min(value) AS min_value,
+       max(value) AS max_value,
+       last(value, time) AS last_value
+FROM insight_indicators
+GROUP BY bucket, indicator_type, location_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS insight_indicators_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', bucket) AS bucket,
+       indicator_type,
+       location_id,
+       sum(samples) AS samples,
+       sum(sum_value) AS sum_value,
+       min(min_value) AS min_value,
+       max(max_value) AS max_value,
+       last(last_value, bucket) AS last_value
+FROM insight_indicators_1m
+GROUP BY 1, indicator_type, location_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS insight_indicators_1d
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', bucket) AS bucket,
+       indicator_type,
+       location_id,
+       sum(samples) AS samples,
+       sum(sum_value) AS sum_value,
+       min(min_value) AS min_value,
+       max(max_value) AS max_value,
+       last(last_value, bucket) AS last_value
+FROM insight_indicators_1h
+GROUP BY 1, indicator_type, location_id
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS insight_raw_signals_1m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 minute', time) AS bucket,
+       source,
+       category,
+       count(*) AS signals,
+       count(sentiment_score) AS scored,
+       sum(sentiment_score) AS sum_sentiment,
+       min(sentiment_score) AS min_sentiment,
+       max(sentiment_score) AS max_sentiment
+FROM insight_raw_signals
+GROUP BY bucket, source, category
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS insight_raw_signals_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 hour', bucket) AS bucket,
+       source,
+       category,
+       sum(signals) AS signals,
+       sum(scored) AS scored,
+       sum(sum_sentiment) AS sum_sentiment,
+       min(min_sentiment) AS min_sentiment,
+       max(max_sentiment) AS max_sentiment
+FROM insight_raw_signals_1m
+GROUP BY 1, source, category
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS insight_raw_signals_1d
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT time_bucket(INTERVAL '1 day', bucket) AS bucket,
+       source,
+       category,
+       sum(signals) AS signals,
+       sum(scored) AS scored,
+       sum(sum_sentiment) AS sum_sentiment,
+       min(min_sentiment) AS min_sentiment,
+       max(max_sentiment) AS max_sentiment
+FROM insight_raw_signals_1h
+GROUP BY 1, source, category
+WITH NO DATA;
+
+-- Incremental refresh: each job re-materializes only its recent window (late rows included).
+-- start_offset must stay inside the retention of the view it reads from.
+SELECT add_continuous_aggregate_policy('insight_indicators_1m', start_offset => INTERVAL '3 hours',
+    end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('insight_indicators_1h', start_offset => INTERVAL '3 days',
+    end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '30 minutes', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('insight_indicators_1d', start_offset => INTERVAL '7 days',
+    end_offset => INTERVAL '1 day', schedule_interval => INTERVAL '6 hours', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('insight_raw_signals_1m', start_offset => INTERVAL '3 hours',
+    end_offset => INTERVAL '1 minute', schedule_interval => INTERVAL '1 minute', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('insight_raw_signals_1h', start_offset => INTERVAL '3 days',
+    end_offset => INTERVAL '1 hour', schedule_interval => INTERVAL '30 minutes', if_not_exists => TRUE);
+SELECT add_continuous_aggregate_policy('insight_raw_signals_1d', start_offset => INTERVAL '7 days',
+    end_offset => INTERVAL '1 day', schedule_interval => INTERVAL '6 hours', if_not_exists => TRUE);
+
+-- 7. سياسات الضغط والاحتفاظ (Compression & Retention)
+-- Keep in step with RETENTION in backend/timeseries_query.py (used to pick a rollup that still holds the range).
+ALTER TABLE insight_indicators SET (timescaledb.compress,
+    timescaledb.compress_segmentby = 'indicator_type, location_id', timescaledb.compress_orderby = 'time DESC');
+SELECT add_compression_policy('insight_indicators', INTERVAL '7 days', if_not_exists => TRUE);
+ALTER TABLE insight_raw_signals SET (timescaledb.compress,
+    timescaledb.compress_segmentby = 'source, category', timescaledb.compress_orderby = 'time DESC');
+SELECT add_compression_policy('insight_raw_signals', INTERVAL '3 days', if_not_exists => TRUE);
+
+SELECT add_retention_policy('insight_raw_signals', INTERVAL '30 days', if_not_exists => TRUE);
+SELECT add_retention_policy('insight_indicators', INTERVAL '90 days', if_not_exists => TRUE);
+SELECT add_retention_policy('insight_indicators_1m', INTERVAL '30 days', if_not_exists => TRUE);
+SELECT add_retention_policy('insight_raw_signals_1m', INTERVAL '30 days', if_not_exists => TRUE);
+SELECT add_retention_policy('insight_indicators_1h', INTERVAL '1 year', if_not_exists => TRUE);
+SELECT add_retention_policy('insight_raw_signals_1h', INTERVAL '1 year', if_not_exists => TRUE);
+-- The 1d views are kept indefinitely.
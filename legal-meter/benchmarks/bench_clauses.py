@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Compliance-check latency for long articles against an embedded Qdrant
+(QDRANT_LOCATION=":memory:") holding synthetic constitution articles.
+  legacy:    one vector per article, encode + search inside the async handler
+             (what /analyze-compliance did before the clause mode)
+  document:  one vector per article, encode + search on a worker thread
+  clauses:   one vector per sentence/clause, one batched encode and one
+             batched search per article, on a worker thread
+  batch:     every article in one /analyze-compliance/batch call
+Concurrent requests are issued together; "loop stall" is the longest time a
+5 ms ticker on the event loop was kept waiting (other requests, health
+probes). Uses LEGAL_MODEL, or with --random-init a randomly initialised
+encoder with all-MiniLM-L6-v2's architecture (same cost, no download; its
+similarity scores are meaningless, so only timings are reported).
+Run from legal-meter/:  python benchmarks/bench_clauses.py --random-init
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+ARABIC_LETTERS = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+
+
+def build_random_encoder(directory, rng):
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer, models
+    words = {"".join(rng.choice(ARABIC_LETTERS) for _ in range(rng.randint(2, 6))) for _ in range(20000)}
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + list(ARABIC_LETTERS) + sorted(words)
+    hf_dir = os.path.join(directory, "hf")
+    os.makedirs(hf_dir)
+    with open(os.path.join(hf_dir, "vocab.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab))
+    BertTokenizerFast(vocab_file=os.path.join(hf_dir, "vocab.txt"), do_lower_case=False).save_pretrained(hf_dir)
+    BertModel(BertConfig(vocab_size=len(vocab), hidden_size=384, num_hidden_layers=6, num_attention_heads=12,
+                         intermediate_size=1536)).save_pretrained(hf_dir)
+    transformer = models.Transformer(hf_dir, max_seq_length=256)
+    encoder = SentenceTransformer(modules=[transformer, models.Pooling(384, "mean")])
+    out = os.path.join(directory, "encoder")
+    encoder.save(out)
+    return out, sorted(words)
+
+
+def sentence(words, rng):
+    return " ".join(rng.choice(words) for _ in range(rng.randint(8, 25))) + rng.choice([".", "،", "؛", "؟"])
+
+
+async def run_concurrent(handler, texts, concurrency):
+    stalls = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.005)
+            stalls.append(time.perf_counter() - t0 - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(text):
+        async with sem:
+            return await handler(text)
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(one(t) for t in texts))
+    elapsed = time.perf_counter() - t0
+    done.set()
+    await tick
+    return results, elapsed, max(stalls) if stalls else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--random-init", action="store_true")
+    parser.add_argument("--articles", type=int, default=300, help="constitution articles in the collection")
+    parser.add_argument("--docs", type=int, default=24, help="news articles checked")
+    parser.add_argument("--sentences", type=int, default=40, help="sentences per news article")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    os.environ["QDRANT_LOCATION"] = ":memory:"
+    words = [w for w in ("".join(rng.choice(ARABIC_LETTERS) for _ in range(4)) for _ in range(2000))]
+    if args.random_init:
+        os.environ["LEGAL_MODEL"], words = build_random_encoder(tempfile.mkdtemp(), rng)
+    import main as legal
+    from qdrant_client.models import Distance, PointStruct, VectorParams
+    if not (legal.warmup.load_now() and legal.qdrant_warmup.load_now()):
+        sys.exit("encoder or qdrant failed to load")
+    model, qdrant = legal.warmup.get(), legal.qdrant_warmup.get()
+
+    articles = [" ".join(sentence(words, rng) for _ in range(rng.randint(1, 3))) for _ in range(args.articles)]
+    vectors = model.encode(articles, batch_size=64, normalize_embeddings=True)
+    qdrant.create_collection(legal.COLLECTION, vectors_config=VectorParams(size=vectors.shape[1], distance=Distance.COSINE))
+    qdrant.upsert(legal.COLLECTION, points=[PointStruct(id=i, vector=v.tolist(), payload={"article_id": f"Art.{i + 1}"})
+                                            for i, v in enumerate(vectors)])
+    # Each news article quotes a few constitution articles among its own sentences
+    docs = []
+    for _ in range(args.docs):
+        body = [sentence(words, rng) for _ in range(args.sentences)]
+        for _ in range(3):
+            body.insert(rng.randrange(len(body)), rng.choice(articles))
+        docs.append(" ".join(body))
+    tokens = [len(model.tokenizer(d)["input_ids"]) for d in docs]
+    print(f"{args.docs} articles of ~{sum(map(len, docs)) // len(docs):,} chars (~{sum(tokens) // len(tokens)} tokens; "
+          f"a single vector sees the first {model.max_seq_length}), {args.articles} constitution articles, "
+          f"concurrency {args.concurrency}")
+
+    async def legacy(text):
+        embedding = model.encode(text)
+        return legal.search_batch(qdrant, embedding[None, :])
+
+    async def document(text):
+        return (await legal._analyze([text], "document"))[0]
+
+    async def clauses(text):
+        return (await legal._analyze([text], "clauses"))[0]
+
+    async def scenarios():
+        await clauses(docs[0])  # warm the thread pool and the encoder
+        for name, handler in (("legacy", legacy), ("document", document), ("clauses", clauses)):
+            results, elapsed, stall = await run_concurrent(handler, docs, args.concurrency)
+            vectors = len(docs) if name != "clauses" else sum(r["clauses"] for r in results)
+            print(f"  {name:<9} {elapsed:7.2f} s  {len(docs) / elapsed:6.2f} articles/s  "
+                  f"loop stall {stall * 1000:8.1f} ms  ({vectors:,} vectors)")
+        t0 = time.perf_counter()
+        results = await legal._analyze(docs, "clauses")
+        elapsed = time.perf_counter() - t0
+        print(f"  batch     {elapsed:7.2f} s  {len(docs) / elapsed:6.2f} articles/s  "
+              f"({sum(r['clauses'] for r in results):,} clauses in one call)")
+
+    asyncio.run(scenarios())
+
+
+if __name__ == "__main__":
+    main()
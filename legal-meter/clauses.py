@@ -0,0 +1,92 @@
+import re
+from typing import Dict, List, Any, Sequence, Tuple
+
+# Sentence ends (Latin and Arabic punctuation, line breaks) and, inside long sentences, clause separators
+SENTENCE_END = re.compile(r"[.!?؟\n]+")
+CLAUSE_BREAK = re.compile(r"[،,;؛:]+")
+
+
+def _pieces(text: str, start: int, end: int, pattern) -> List[Tuple[int, int]]:
+    spans, cursor = [], start
+    for m in pattern.finditer(text, start, end):
+        spans.append((cursor, m.end()))
+        cursor = m.end()
+    if cursor < end:
+        spans.append((cursor, end))
+    return spans
+
+
+def _strip(text: str, start: int, end: int) -> Tuple[int, int]:
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def split_clauses(text: str, max_chars: int = 300, min_chars: int = 20) -> List[Tuple[int, int]]:
+    """
+    (start, end) character spans of the sentences of `text`. Sentences longer
+    than `max_chars` are cut at clause separators, and what is still too long
+    at the last space before `max_chars`. Fragments shorter than `min_chars`
+    ("المادة 5." on its own line) are merged into the following span.
+    """
+    spans: List[Tuple[int, int]] = []
+    for s_start, s_end in _pieces(text, 0, len(text), SENTENCE_END):
+        parts = [(s_start, s_end)] if s_end - s_start <= max_chars else \
+            _pieces(text, s_start, s_end, CLAUSE_BREAK)
+        for start, end in parts:
+            while end - start > max_chars:
+                cut = text.rfind(" ", start + 1, start + max_chars)
+                cut = cut if cut > start else start + max_chars
+                spans.append((start, cut))
+                start = cut
+            spans.append((start, end))
+    merged: List[Tuple[int, int]] = []
+    pending = None
+    for start, end in spans:
+        start, end = _strip(text, start, end)
+        if start >= end:
+            continue
+        if pending is not None:
+            start, pending = pending, None
+        if end - start < min_chars:
+            pending = start
+            continue
+        merged.append((start, end))
+    if pending is not None:
+        if merged and len(text) - merged[-1][0] <= 2 * max_chars:
+            merged[-1] = (merged[-1][0], _strip(text, pending, len(text))[1])
+        else:
+            merged.append(_strip(text, pending, len(text)))
+    return merged
+
+
+def aggregate(text: str, spans: Sequence[Tuple[int, int]], hits: Sequence[Sequence[Any]],
+              max_spans: int = 5) -> Dict[str, Any]:
+    """
+    Per-article verdict from the Qdrant hits of each clause (hits[i] belongs to
+    spans[i], already filtered by score). An article is violated if any clause
+    matches it; the spans of its best-matching clauses are reported.
+    Same scoring as the whole-document check: 100 - 15 per violated article.
+    """
+    articles: Dict[Any, Dict[str, Any]] = {}
+    for (start, end), clause_hits in zip(spans, hits):
+        for hit in clause_hits:
+            article_id = hit.payload["article_id"]
+            entry = articles.setdefault(article_id, {"article_id": article_id, "max_score": 0.0,
+                                                     "clauses": 0, "spans": []})
+            entry["max_score"] = max(entry["max_score"], round(hit.score, 4))
+            entry["clauses"] += 1
+            entry["spans"].append({"start": start, "end": end, "text": text[start:end], "score": round(hit.score, 4)})
+    violations = sorted(articles.values(), key=lambda a: -a["max_score"])
+    for entry in violations:
+        entry["spans"] = sorted(entry["spans"], key=lambda s: -s["score"])[:max_spans]
+    score = 100 - (len(violations) * 15)
+    return {
+        "score": f"{max(score, 0)}%",
+        "violated_articles": [v["article_id"] for v in violations],
+        "status": "Verified" if score > 80 else "Potential Violation",
+        "clauses": len(spans),
+        "violations": violations,
+    }
@@ -1,39 +1,153 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
-from qdrant_client import QdrantClient
+from typing import List, Optional
 import os
+import asyncio
+
+from warmup import ModelWarmup
+from clauses import split_clauses, aggregate
+
+COLLECTION = "yemen_constitution"
+MATCH_THRESHOLD = float(os.getenv("LEGAL_MATCH_THRESHOLD", "0.8"))
+# "document": one vector for the whole text (the original check); "clauses": one vector
+# per sentence/clause, opt-in per request or with LEGAL_MODE=clauses
+DEFAULT_MODE = os.getenv("LEGAL_MODE", "document")
+CLAUSE_MAX_CHARS = int(os.getenv("LEGAL_CLAUSE_MAX_CHARS", "300"))
+MAX_CLAUSES = int(os.getenv("LEGAL_MAX_CLAUSES", "4096"))
+# Small batches: segments are length-sorted per batch, so padding stays short on CPU
+ENCODE_BATCH = int(os.getenv("LEGAL_ENCODE_BATCH", "16"))
+QDRANT_BATCH = int(os.getenv("LEGAL_QDRANT_BATCH", "256"))
+
+def _load_model():
+    warmup.timed_import("torch")
+    SentenceTransformer = warmup.timed_import("sentence_transformers").SentenceTransformer
+    return SentenceTransformer(os.getenv("LEGAL_MODEL", 'all-MiniLM-L6-v2'))
+
+def _connect_qdrant():
+    QdrantClient = qdrant_warmup.timed_import("qdrant_client").QdrantClient
+    if os.getenv("QDRANT_LOCATION"):
+        # ":memory:" or a local path (embedded mode, for development and benchmarks)
+        client = QdrantClient(location=os.getenv("QDRANT_LOCATION"))
+    else:
+        client = QdrantClient(host=os.getenv("QDRANT_HOST", "qdrant"), port=int(os.getenv("QDRANT_PORT", "6333")))
+    # Fail here (and retry in the background) rather than on the first request
+    client.get_collections()
+    return client
 
-app = FastAPI()
-model = SentenceTransformer('all-MiniLM-L6-v2')
-qdrant = QdrantClient(host="qdrant", port=6333)
+warmup = ModelWarmup("embedding model", _load_model, retry_interval=float(os.getenv("LEGAL_LOAD_RETRY_S", "15")))
+qdrant_warmup = ModelWarmup("qdrant", _connect_qdrant, retry_interval=5.0)
+
+# LEGAL_PRELOAD=true loads the encoder at import for pre-fork servers
+# (gunicorn --preload -k uvicorn.workers.UvicornWorker) so workers share its pages
+# copy-on-write; the Qdrant connection is always opened per worker.
+if os.getenv("LEGAL_PRELOAD", "false").lower() == "true":
+    warmup.load_now()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print(f"[startup] legal-meter app imported in {time.perf_counter() - _IMPORT_STARTED:.2f}s")
+    warmup.start()
+    qdrant_warmup.start()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 class AnalysisRequest(BaseModel):
     text: str
+    mode: Optional[str] = None
 
-@app.post("/analyze-compliance")
-async def analyze(request: AnalysisRequest):
+class BatchAnalysisRequest(BaseModel):
+    texts: List[str]
+    mode: Optional[str] = None
+
+def search_batch(qdrant, vectors, limit: int = 3):
+    """
+    Nearest articles for every vector: one batched round trip per QDRANT_BATCH
+    vectors, hits below MATCH_THRESHOLD filtered server-side.
+    """
+    hits = []
+    for start in range(0, len(vectors), QDRANT_BATCH):
+        chunk = vectors[start:start + QDRANT_BATCH]
+        if hasattr(qdrant, "search_batch"):
+            from qdrant_client.models import SearchRequest
+            hits += qdrant.search_batch(collection_name=COLLECTION, requests=[
+                SearchRequest(vector=v.tolist(), limit=limit, with_payload=True, score_threshold=MATCH_THRESHOLD)
+                for v in chunk])
+        else:
+            # Newer clients replace search_batch with the query API
+            from qdrant_client.models import QueryRequest
+            hits += [r.points for r in qdrant.query_batch_points(collection_name=COLLECTION, requests=[
+                QueryRequest(query=v.tolist(), limit=limit, with_payload=True, score_threshold=MATCH_THRESHOLD)
+                for v in chunk])]
+    return hits
+
+def analyze_texts(model, qdrant, texts: List[str], mode: str):
+    """
+    Segments every text, embeds all segments in one batched encode and checks
+    them in batched Qdrant searches; runs on a worker thread, never on the loop.
+    """
+    if mode not in ("clauses", "document"):
+        raise ValueError(f"Unknown mode: {mode} (clauses or document)")
+    segments = [(split_clauses(t, CLAUSE_MAX_CHARS) if mode == "clauses" else None) or [(0, len(t))]
+                for t in texts]
+    total = sum(map(len, segments))
+    if total > MAX_CLAUSES:
+        raise OverflowError(f"{total} clauses exceed LEGAL_MAX_CLAUSES={MAX_CLAUSES}")
+    flat = [t[a:b] for t, spans in zip(texts, segments) for a, b in spans]
+    vectors = model.encode(flat, batch_size=ENCODE_BATCH, convert_to_numpy=True)
+    hits = search_batch(qdrant, vectors)
+    results, cursor = [], 0
+    for text, spans in zip(texts, segments):
+        result = aggregate(text, spans, hits[cursor:cursor + len(spans)])
+        result["mode"] = mode
+        results.append(result)
+        cursor += len(spans)
+    return results
+
+def _services():
+    if not (warmup.ready and qdrant_warmup.ready):
+        raise HTTPException(status_code=503, detail=f"model is {warmup.state}, qdrant is {qdrant_warmup.state}",
+                            headers={"Retry-After": "5"})
+    return warmup.get(), qdrant_warmup.get()
+
+async def _analyze(texts: List[str], mode: Optional[str]):
+    model, qdrant = _services()
     try:
-        embedding = model.encode(request.text).tolist()
-        
-        # Search Qdrant for matching articles
-        search_result = qdrant.search(
-            collection_name="yemen_constitution",
-            query_vector=embedding,
-            limit=3
-        )
-        
-        violated = [res.payload['article_id'] for res in search_result if res.score > 0.8]
-        score = 100 - (len(violated) * 15)
-        
-        return {
-            "score": f"{max(score, 0)}%",
-            "violated_articles": violated,
-            "status": "Verified" if score > 80 else "Potential Violation"
-        }
+        # Encoding and the Qdrant round trips are blocking: keep them off the event loop
+        return await asyncio.to_thread(analyze_texts, model, qdrant, texts, mode or DEFAULT_MODE)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OverflowError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/analyze-compliance")
+async def analyze(request: AnalysisRequest):
+    return (await _analyze([request.text], request.mode))[0]
+
+@app.post("/analyze-compliance/batch")
+async def analyze_batch(request: BatchAnalysisRequest):
+    """Several articles in one call: one encode and one batched search for all their clauses."""
+    return {"results": await _analyze(request.texts, request.mode)}
+
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving, whether or not the model is loaded."""
+    return {"status": "alive"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 only once the encoder is loaded and Qdrant is reachable."""
+    is_ready = warmup.ready and qdrant_warmup.ready
+    return JSONResponse(status_code=200 if is_ready else 503,
+                        content={"ready": is_ready, "model": warmup.status(), "qdrant": qdrant_warmup.status()})
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
@@ -0,0 +1,102 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional
+
+
+class BatcherOverloaded(Exception):
+    pass
+
+
+class DynamicBatcher:
+    """
+    تجميع الطلبات (Dynamic Batcher)
+    Requests are queued; a single collector takes the first one, keeps
+    collecting for up to `max_wait_ms` or until `max_batch` texts, then runs
+    them as one `predict` call on a dedicated inference thread so the event
+    loop never blocks on the model. While a batch is running new requests
+    accumulate, so batches grow with load and stay at size 1 when idle
+    (apart from the short collection window).
+    """
+    def __init__(self, predict: Callable[[List[str]], List[Dict[str, Any]]],
+                 max_batch: int = 32, max_wait_ms: float = 5.0, max_queue: int = 1024):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # One forward pass at a time; torch parallelises inside the pass
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nlp-infer")
+        self.stats = {"requests": 0, "batches": 0, "items": 0, "rejected": 0, "errors": 0}
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = asyncio.create_task(self._collect())
+
+    def _enqueue(self, text: str) -> asyncio.Future:
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((text, fut))
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            raise BatcherOverloaded("Inference queue is full")
+        self.stats["requests"] += 1
+        return fut
+
+    async def submit(self, text: str) -> Dict[str, Any]:
+        self._ensure_started()
+        return await self._enqueue(text)
+
+    async def submit_many(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Enqueues a whole batch at once; it shares forward passes with concurrent single requests."""
+        self._ensure_started()
+        if self._queue.qsize() + len(texts) > self.max_queue:
+            self.stats["rejected"] += len(texts)
+            raise BatcherOverloaded("Inference queue is full")
+        return await asyncio.gather(*(self._enqueue(t) for t in texts))
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self._queue.get_nowait())
+
+            # Drop requests whose callers have gone away
+            batch = [(text, fut) for text, fut in batch if not fut.done()]
+            if not batch:
+                continue
+            try:
+                results = await loop.run_in_executor(self._executor, self.predict, [t for t, _ in batch])
+            except Exception as e:
+                self.stats["errors"] += 1
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.stats["batches"] += 1
+            self.stats["items"] += len(batch)
+            for (_, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
+
+    def metrics(self) -> Dict[str, Any]:
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "mean_batch_size": round(self.stats["items"] / batches, 2) if batches else 0.0,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
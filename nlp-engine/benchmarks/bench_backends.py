@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Latency and memory of the PyTorch backend versus the ONNX Runtime graphs
+(fp32 and dynamic int8) written by export_onnx.py. Each backend is measured
+in a fresh process: load time, resident memory after loading, p50/p99 latency
+for single short texts and throughput for full batches.
+
+  python benchmarks/bench_backends.py --model /models/marbert --onnx-dir models/marbert-onnx
+  python benchmarks/bench_backends.py --random-init     # untrained BERT-base, exported on the fly
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+NLP_ENGINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, NLP_ENGINE)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run_child(kind, model, onnx_dir, model_file, words, tokens, batch, requests):
+    t0 = time.perf_counter()
+    from inference import TorchSentimentBackend, OnnxSentimentBackend
+    if kind == "torch":
+        backend = TorchSentimentBackend(model, max_batch=batch)
+    else:
+        backend = OnnxSentimentBackend(onnx_dir, max_batch=batch, model_file=model_file)
+    load_s = time.perf_counter() - t0
+    loaded_mb = rss_mb()
+
+    rng = random.Random(2)
+    short = [" ".join(rng.choice(words) for _ in range(12)) for _ in range(requests)]
+    long = [" ".join(rng.choice(words) for _ in range(tokens)) for _ in range(batch * 4)]
+    backend.predict(short[:2])
+    latencies = []
+    for text in short:
+        t = time.perf_counter()
+        backend.predict([text])
+        latencies.append(time.perf_counter() - t)
+    t = time.perf_counter()
+    backend.predict(long)
+    throughput = len(long) / (time.perf_counter() - t)
+    lat = np.array(latencies) * 1000
+    print(json.dumps({"load_s": load_s, "rss_loaded_mb": loaded_mb, "rss_peak_mb": rss_mb(),
+                      "p50_ms": float(np.percentile(lat, 50)), "p99_ms": float(np.percentile(lat, 99)),
+                      "batch_texts_per_s": throughput}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default=os.getenv("NLP_MODEL", "UBC-NLP/MARBERT"))
+    parser.add_argument("--onnx-dir", default=os.getenv("NLP_ONNX_DIR", "models/marbert-onnx"))
+    parser.add_argument("--random-init", action="store_true")
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--child", nargs=2, metavar=("KIND", "FILE"), help=argparse.SUPPRESS)
+    parser.add_argument("--words", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        words = json.loads(args.words)
+        run_child(args.child[0], args.model, args.onnx_dir, args.child[1], words,
+                  args.tokens, args.batch, args.requests)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        words = ["خبر", "اليمن", "صنعاء", "عدن", "الحكومة", "اقتصاد", "تقرير", "سوق", "الريال", "المواطنين"]
+        if args.random_init:
+            from bench_batching import build_random_checkpoint
+            import export_onnx
+            words = build_random_checkpoint(tmp)[:2000]
+            args.model, args.onnx_dir = tmp, os.path.join(tmp, "onnx")
+            export_onnx.export(tmp, args.onnx_dir, 17, allow_download=False)
+            export_onnx.quantize(args.onnx_dir)
+
+        print(f"\nsingle texts ~12 tokens x{args.requests}; batch of {args.batch * 4} texts ~{args.tokens} tokens")
+        for kind, model_file in (("torch", "-"), ("onnx", "model.onnx"), ("onnx", "model.int8.onnx")):
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--model", args.model,
+                                  "--onnx-dir", args.onnx_dir, "--tokens", str(args.tokens),
+                                  "--batch", str(args.batch), "--requests", str(args.requests),
+                                  "--words", json.dumps(words), "--child", kind, model_file],
+                                 check=True, capture_output=True, text=True, cwd=NLP_ENGINE).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            label = kind if kind == "torch" else f"onnx {model_file}"
+            print(f"  {label:<22} load={r['load_s']:5.1f}s  rss={r['rss_loaded_mb']:6.0f} MB "
+                  f"(peak {r['rss_peak_mb']:6.0f})  p50={r['p50_ms']:7.1f} ms  p99={r['p99_ms']:7.1f} ms  "
+                  f"batch={r['batch_texts_per_s']:6.1f} texts/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+CPU throughput of the sentiment backend at several batch sizes and sequence
+lengths, and end-to-end latency of concurrent /analyze-news style requests
+served one at a time versus through the DynamicBatcher.
+
+Uses NLP_MODEL (a hub id or a local checkpoint directory). With --random-init
+a randomly initialised BERT-base (MARBERT's architecture) is built instead,
+which needs no download and times the same as the real weights.
+Run from nlp-engine/:  python benchmarks/bench_batching.py --random-init
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+ARABIC_LETTERS = "ابتثجحخدذرزسشصضطظعغفقكلمنهوي"
+
+
+def build_random_checkpoint(directory):
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+    rng = random.Random(0)
+    words = {"".join(rng.choice(ARABIC_LETTERS) for _ in range(rng.randint(2, 6))) for _ in range(20000)}
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + list(ARABIC_LETTERS) + sorted(words)
+    vocab_path = os.path.join(directory, "vocab.txt")
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab))
+    BertTokenizerFast(vocab_file=vocab_path, do_lower_case=False).save_pretrained(directory)
+    config = BertConfig(vocab_size=len(vocab), num_labels=2)
+    BertForSequenceClassification(config).save_pretrained(directory)
+    return sorted(words)
+
+
+def make_texts(words, count, tokens, rng):
+    return [" ".join(rng.choice(words) for _ in range(tokens)) for _ in range(count)]
+
+
+def bench_throughput(backend, words, batch_sizes, lengths, rng):
+    print("\npredict() throughput (texts/s)")
+    print("  tokens " + "".join(f"{f'batch={b}':>12}" for b in batch_sizes))
+    for tokens in lengths:
+        row = []
+        for batch in batch_sizes:
+            texts = make_texts(words, max(batch * 4, 16), tokens, rng)
+            backend.predict(texts[:batch])  # warm-up
+            t0 = time.perf_counter()
+            for start in range(0, len(texts), batch):
+                backend.predict(texts[start:start + batch])
+            row.append(len(texts) / (time.perf_counter() - t0))
+        print(f"  {tokens:6d} " + "".join(f"{v:12.1f}" for v in row))
+
+
+async def bench_serving(backend, words, clients, tokens, wait_ms, rng):
+    from batcher import DynamicBatcher
+    texts = make_texts(words, clients, tokens, rng)
+
+    async def unbatched():
+        # Old handler: one forward pass per request, serialised on the model
+        lock = asyncio.Lock()
+        async def one(text):
+            async with lock:
+                return await asyncio.to_thread(backend.predict, [text])
+        return await timed(one)
+
+    async def batched():
+        batcher = DynamicBatcher(backend.predict, max_batch=backend.max_batch, max_wait_ms=wait_ms)
+        result = await timed(batcher.submit)
+        print(f"    batcher: {batcher.metrics()}")
+        return result
+
+    async def timed(call):
+        latencies = []
+        async def one(text):
+            t0 = time.perf_counter()
+            await call(text)
+            latencies.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(t) for t in texts))
+        return time.perf_counter() - t0, latencies
+
+    print(f"\n{clients} concurrent requests of ~{tokens} tokens")
+    for label, run in (("one request per pass", unbatched), (f"dynamic batcher {wait_ms:g} ms", batched)):
+        wall, latencies = await run()
+        lat = np.array(latencies) * 1000
+        print(f"  {label:<24} {clients / wall:8.1f} req/s  p50={np.percentile(lat, 50):8.1f} ms  "
+              f"p99={np.percentile(lat, 99):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--random-init", action="store_true")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--lengths", type=int, nargs="+", default=[16, 64, 128])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.random_init:
+            words = build_random_checkpoint(tmp)
+            os.environ["NLP_MODEL"] = tmp
+        else:
+            words = ["خبر", "اليمن", "صنعاء", "عدن", "الحكومة", "اقتصاد", "مشقاص", "حَنق", "تقرير", "سوق"]
+        from inference import load_backend
+        backend = load_backend()
+        bench_throughput(backend, words, args.batch_sizes, args.lengths, rng)
+        asyncio.run(bench_serving(backend, words, args.clients, 32, args.wait_ms, rng))
+
+
+if __name__ == "__main__":
+    main()
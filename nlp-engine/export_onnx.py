@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Exports the sentiment model to ONNX, quantises it to dynamic int8 and checks
+parity against the PyTorch path. The result is what NLP_BACKEND=onnx loads.
+
+Needs requirements-onnx.txt (onnx, onnxruntime, tokenizers).
+
+Usage (from nlp-engine/):
+  python export_onnx.py                                   # NLP_MODEL from the local HF cache
+  python export_onnx.py --model /models/marbert --out models/marbert-onnx
+  python export_onnx.py --validate-only --texts samples.txt
+
+Writes into --out: model.onnx (fp32), model.int8.onnx, tokenizer files,
+config.json and parity.json. Exits non-zero when the quantised graph
+disagrees with PyTorch on more than (1 - --min-agreement) of the texts.
+"""
+
+import os
+import sys
+import json
+import inspect
+import argparse
+import numpy as np
+
+SAMPLE_TEXTS = [
+    "ارتفاع أسعار الوقود في صنعاء يثير غضب المواطنين",
+    "افتتاح مدرسة جديدة في عدن بدعم من المجتمع المحلي",
+    "الحكومة تعلن عن خطة لدعم صغار المزارعين في تهامة",
+    "انقطاع الكهرباء لساعات طويلة في تعز وسط موجة حر",
+    "منظمة دولية تحذر من تفاقم أزمة الغذاء في اليمن",
+    "فريق طبي ينجح في إجراء عملية نادرة بمستشفى الثورة",
+    "جُباة الضرائب يضاعفون الرسوم على التجار في السوق",
+    "مشقاص يتحدث عن الحَنق الشعبي من تأخر الرواتب",
+    "الخبير الاقتصادي يتوقع تحسن سعر الريال خلال الأشهر القادمة",
+    "احتفالات في حضرموت بمناسبة المهرجان الثقافي السنوي",
+    "سيول جارفة تقطع الطرق وتعزل قرى في محافظة إب",
+    "صاحبي قال إن الوضع في الحديدة أصبح أفضل من قبل",
+    "تقرير يكشف عن تزايد حالات الكوليرا في المناطق الريفية",
+    "إطلاق مبادرة شبابية لتنظيف شواطئ المكلا",
+    "تراجع حاد في واردات القمح عبر ميناء الحديدة",
+    "نجاح موسم البن اليمني وارتفاع الطلب عليه عالميا",
+]
+
+
+def export(model_name, out_dir, opset, allow_download):
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=not allow_download)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name, local_files_only=not allow_download)
+    model.eval()
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer.save_pretrained(out_dir)
+    model.config.save_pretrained(out_dir)
+
+    sample = tokenizer(SAMPLE_TEXTS[:2], padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False  # TorchScript exporter: stable dynamic axes for BERT
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    with torch.inference_mode():
+        torch.onnx.export(model, tuple(sample[name] for name in input_names), fp32_path,
+                          input_names=input_names, output_names=["logits"],
+                          dynamic_axes=dynamic_axes, opset_version=opset, **kwargs)
+    print(f"Exported {fp32_path}")
+    return fp32_path
+
+
+def quantize(out_dir):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    int8_path = os.path.join(out_dir, "model.int8.onnx")
+    # Int8 MatMul weights; activations are quantised per batch at run time
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8, op_types_to_quantize=["MatMul", "Gemm"])
+    print(f"Quantised {int8_path} ({os.path.getsize(fp32_path) / 1e6:.0f} MB -> {os.path.getsize(int8_path) / 1e6:.0f} MB)")
+    return int8_path
+
+
+def validate(model_name, out_dir, texts, max_length, allow_download):
+    from inference import TorchSentimentBackend, OnnxSentimentBackend
+
+    if not allow_download:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    reference = TorchSentimentBackend(model_name, max_length=max_length).probabilities(texts)
+    report = {"model": model_name, "texts": len(texts), "max_length": max_length, "graphs": {}}
+    for model_file in ("model.onnx", "model.int8.onnx"):
+        if not os.path.exists(os.path.join(out_dir, model_file)):
+            continue
+        probs = OnnxSentimentBackend(out_dir, max_length=max_length, model_file=model_file).probabilities(texts)
+        diff = np.abs(probs - reference)
+        report["graphs"][model_file] = {
+            "label_agreement": float((probs.argmax(-1) == reference.argmax(-1)).mean()),
+            "max_abs_prob_diff": float(diff.max()),
+            "mean_abs_prob_diff": float(diff.mean()),
+        }
+    with open(os.path.join(out_dir, "parity.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and validate the ONNX/int8 sentiment backend")
+    parser.add_argument("--model", default=os.getenv("NLP_MODEL", "UBC-NLP/MARBERT"),
+                        help="hub id (resolved from the local cache) or checkpoint directory")
+    parser.add_argument("--out", default=os.getenv("NLP_ONNX_DIR", "models/marbert-onnx"))
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--max-length", type=int, default=int(os.getenv("NLP_MAX_LENGTH") or 0) or None,
+                        help="truncation for the parity check (default: the model's limit)")
+    parser.add_argument("--texts", help="file with one validation text per line (default: built-in sample)")
+    parser.add_argument("--min-agreement", type=float, default=0.98)
+    parser.add_argument("--validate-only", action="store_true")
+    parser.add_argument("--allow-download", action="store_true", help="fetch the checkpoint if it is not cached")
+    args = parser.parse_args()
+
+    if not args.validate_only:
+        export(args.model, args.out, args.opset, args.allow_download)
+        quantize(args.out)
+
+    texts = SAMPLE_TEXTS
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    report = validate(args.model, args.out, texts, args.max_length, args.allow_download)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    int8 = report["graphs"].get("model.int8.onnx")
+    if int8 is None or int8["label_agreement"] < args.min_agreement:
+        print("Parity check FAILED", file=sys.stderr)
+        sys.exit(1)
+    print("Parity check passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import os
+import re
+import json
+import importlib.util
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+
+class _FastTokenizer:
+    """Minimal stand-in for a transformers fast tokenizer call returning NumPy arrays."""
+    def __init__(self, model_dir: str):
+        from tokenizers import Tokenizer
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        pad_token = "[PAD]"
+        special_path = os.path.join(model_dir, "special_tokens_map.json")
+        if os.path.exists(special_path):
+            with open(special_path, "r", encoding="utf-8") as f:
+                pad = json.load(f).get("pad_token", pad_token)
+            pad_token = pad["content"] if isinstance(pad, dict) else pad
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+    def __call__(self, texts: List[str], max_length: int = 512, **_) -> Dict[str, np.ndarray]:
+        self.tokenizer.enable_truncation(max_length)
+        encodings = self.tokenizer.encode_batch(texts)
+        return {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    e = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+class SentimentBackend:
+    """
+    Shared batching for the inference backends; subclasses provide `_logits`.
+    Texts are sorted by length and cut into micro-batches of `max_batch`,
+    so each forward pass is padded only to its own longest member. Texts are
+    truncated at `max_length` tokens, by default the model's own limit, as
+    `pipeline("sentiment-analysis")` does.
+    """
+    name = "base"
+    max_length = 512
+    max_batch = 32
+
+    def _logits(self, enc) -> np.ndarray:
+        raise NotImplementedError
+
+    def probabilities(self, texts: List[str]) -> np.ndarray:
+        """Full class distribution per text, in input order (used by the parity check)."""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = np.zeros((len(texts), len(self.id2label)), dtype=np.float32)
+        for start in range(0, len(order), self.max_batch):
+            idx = order[start:start + self.max_batch]
+            enc = self.tokenizer([texts[i] for i in idx], padding=True, truncation=True,
+                                 max_length=self.max_length, return_tensors="np")
+            out[idx] = _softmax(self._logits(enc))
+        return out
+
+    def predict(self, texts: List[str]) -> List[Dict[str, Any]]:
+        probs = self.probabilities(texts)
+        labels = probs.argmax(axis=-1)
+        return [{"label": self.id2label[int(label)], "score": float(p[label])}
+                for p, label in zip(probs, labels)]
+
+
+class TorchSentimentBackend(SentimentBackend):
+    """
+    محرك التصنيف (PyTorch Sentiment Backend)
+    Same model and labels as `pipeline("sentiment-analysis")`, but a list of
+    texts runs as padded forward passes.
+    """
+    name = "torch"
+
+    def __init__(self, model_name: str, max_length: Optional[int] = None, max_batch: int = 32,
+                 mmap_weights: bool = False):
+        import torch
+        from transformers import AutoTokenizer
+        self.torch = torch
+        self.model_name = model_name
+        self.max_batch = max_batch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = self._load_model(model_name, mmap_weights)
+        self.model.eval()
+        self.id2label = self.model.config.id2label
+        self.max_length = max_length or _model_max_length(
+            self.tokenizer.model_max_length, getattr(self.model.config, "max_position_embeddings", None))
+
+    def _load_model(self, model_name: str, mmap_weights: bool):
+        from transformers import AutoConfig, AutoModelForSequenceClassification
+        path = _local_safetensors(model_name) if mmap_weights else None
+        if path is None:
+            if mmap_weights:
+                print(f"No local model.safetensors for {model_name}; loading weights into private memory")
+            return AutoModelForSequenceClassification.from_pretrained(model_name)
+
+        # safetensors maps the file and the tensors point into the mapping; assign=True
+        # keeps them as the parameters, so every worker process reads the same
+        # page-cache pages instead of holding its own copy of the weights
+        from safetensors.torch import load_file
+        model = AutoModelForSequenceClassification.from_config(AutoConfig.from_pretrained(model_name))
+        state = load_file(path)
+        prefix = model.base_model_prefix + "."
+        if not any(k.startswith(prefix) for k in state):
+            # Checkpoint of the bare encoder (e.g. saved from BertModel)
+            state = {prefix + k: v for k, v in state.items()}
+        # Heads absent from the checkpoint keep their fresh init, as from_pretrained does;
+        # anything else missing or left over means the file does not match the config
+        # (less the keys the model itself declares ignorable, as from_pretrained does)
+        result = model.load_state_dict(state, strict=False, assign=True)
+        missing = _unignored(result.missing_keys, getattr(model, "_keys_to_ignore_on_load_missing", None))
+        encoder_missing = [k for k in missing if k.startswith(prefix)]
+        unexpected = _unignored(result.unexpected_keys, getattr(model, "_keys_to_ignore_on_load_unexpected", None))
+        if encoder_missing or unexpected:
+            print(f"{path} does not match {model_name} (missing {encoder_missing[:5]}, "
+                  f"unexpected {unexpected[:5]}); loading with from_pretrained")
+            return AutoModelForSequenceClassification.from_pretrained(model_name)
+        return model
+
+    def _logits(self, enc) -> np.ndarray:
+        with self.torch.inference_mode():
+            return self.model(**{k: self.torch.from_numpy(v) for k, v in enc.items()}).logits.numpy()
+
+
+def _model_max_length(tokenizer_limit: Optional[float], max_positions: Optional[int]) -> int:
+    # Tokenizers saved without a limit report a huge sentinel (int(1e30))
+    if tokenizer_limit and tokenizer_limit < 1e6:
+        return int(tokenizer_limit)
+    return int(max_positions or 512)
+
+
+def _unignored(keys: List[str], patterns: Optional[List[str]]) -> List[str]:
+    return [k for k in keys if not any(re.search(p, k) for p in patterns or ())]
+
+
+def _local_safetensors(model_name: str) -> Optional[str]:
+    if os.path.isdir(model_name):
+        path = os.path.join(model_name, "model.safetensors")
+        return path if os.path.exists(path) else None
+    from huggingface_hub import try_to_load_from_cache
+    path = try_to_load_from_cache(model_name, "model.safetensors")
+    return path if isinstance(path, str) else None
+
+
+class OnnxSentimentBackend(SentimentBackend):
+    """
+    محرك التصنيف المُكمَّم (ONNX Runtime Sentiment Backend)
+    Runs the graph written by export_onnx.py (by default the dynamically
+    int8-quantised one) on CPU through onnxruntime. Tokenisation uses the
+    `tokenizers` library on the exported tokenizer.json: transformers (which
+    pulls in torch) and the full-precision weights are never loaded.
+    """
+    name = "onnx"
+
+    def __init__(self, model_dir: str, max_length: Optional[int] = None, max_batch: int = 32,
+                 model_file: str = "model.int8.onnx", threads: int = 0):
+        import onnxruntime as ort
+        self.model_name = model_dir
+        self.max_batch = max_batch
+        self.tokenizer = _FastTokenizer(model_dir)
+        with open(os.path.join(model_dir, "config.json"), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        tokenizer_config = {}
+        if os.path.exists(os.path.join(model_dir, "tokenizer_config.json")):
+            with open(os.path.join(model_dir, "tokenizer_config.json"), "r", encoding="utf-8") as f:
+                tokenizer_config = json.load(f)
+        self.max_length = max_length or _model_max_length(
+            tokenizer_config.get("model_max_length"), config.get("max_position_embeddings"))
+        # save_pretrained omits the default LABEL_0..LABEL_n mapping
+        self.id2label = {int(k): v for k, v in config.get("id2label", {}).items()} or \
+            {i: f"LABEL_{i}" for i in range(config.get("num_labels", 2))}
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(os.path.join(model_dir, model_file), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _logits(self, enc) -> np.ndarray:
+        feed = {k: v for k, v in enc.items() if k in self.input_names}
+        return self.session.run(["logits"], feed)[0]
+
+
+def backend_kind() -> str:
+    """
+    NLP_BACKEND, except that onnx falls back to torch when onnxruntime or
+    tokenizers is not installed (see requirements-onnx.txt).
+    """
+    kind = os.getenv("NLP_BACKEND", "torch").lower()
+    if kind == "onnx":
+        missing = [m for m in ("onnxruntime", "tokenizers") if importlib.util.find_spec(m) is None]
+        if missing:
+            print(f"Warning: NLP_BACKEND=onnx needs {', '.join(missing)}; using the torch backend")
+            return "torch"
+    return kind
+
+
+def load_backend(kind: Optional[str] = None):
+    """
+    NLP_BACKEND=torch (default) or onnx (graph exported by export_onnx.py into NLP_ONNX_DIR).
+    NLP_MAX_LENGTH truncates texts below the model's limit (e.g. 128 for
+    headlines and short posts, trading recall on long texts for speed).
+    """
+    kind = kind or backend_kind()
+    max_length = int(os.getenv("NLP_MAX_LENGTH") or 0) or None
+    max_batch = int(os.getenv("NLP_MAX_BATCH", "32"))
+    if kind == "onnx":
+        return OnnxSentimentBackend(
+            os.getenv("NLP_ONNX_DIR", "models/marbert-onnx"),
+            max_length=max_length,
+            max_batch=max_batch,
+            model_file=os.getenv("NLP_ONNX_FILE", "model.int8.onnx"),
+            threads=int(os.getenv("NLP_ONNX_THREADS", "0")),
+        )
+    if kind != "torch":
+        raise ValueError(f"Unknown NLP_BACKEND: {kind}")
+    return TorchSentimentBackend(os.getenv("NLP_MODEL", "UBC-NLP/MARBERT"), max_length=max_length, max_batch=max_batch,
+                                 mmap_weights=os.getenv("NLP_MMAP_WEIGHTS", "true").lower() == "true")
@@ -1,33 +1,149 @@
-from fastapi import FastAPI
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from transformers import pipeline
+from typing import List
 import os
+import sys
+
+from batcher import DynamicBatcher, BatcherOverloaded
+from warmup import ModelWarmup
+
+def _load_analyzer():
+    # Heavy imports happen here, off the startup path, and are timed
+    warmup.timed_import("numpy")
+    from inference import backend_kind, load_backend
+    kind = backend_kind()
+    for module in ("tokenizers", "onnxruntime") if kind == "onnx" else ("torch", "transformers"):
+        warmup.timed_import(module)
+    backend = load_backend(kind)
+    if not PRELOAD:
+        # Pay first-call costs now rather than on the first request. Skipped when
+        # preloading: the forked workers must not inherit torch/ORT thread pools
+        backend.predict(["تهيئة"])
+    return backend
 
-app = FastAPI()
 # Assuming MARBERT is used for sentiment
-analyzer = pipeline("sentiment-analysis", model="UBC-NLP/MARBERT")
+warmup = ModelWarmup("sentiment model", _load_analyzer, retry_interval=float(os.getenv("NLP_LOAD_RETRY_S", "15")))
+batcher = DynamicBatcher(
+    lambda texts: warmup.get().predict(texts),
+    max_batch=int(os.getenv("NLP_MAX_BATCH", "32")),
+    max_wait_ms=float(os.getenv("NLP_BATCH_WAIT_MS", "5")),
+    max_queue=int(os.getenv("NLP_MAX_QUEUE", "1024")),
+)
+MAX_BATCH_TEXTS = int(os.getenv("NLP_MAX_BATCH_TEXTS", "256"))
+
+# NLP_PRELOAD=true loads the model while this module is imported, for pre-fork servers
+# (gunicorn --preload -k uvicorn.workers.UvicornWorker): workers share the parent's
+# pages copy-on-write. Without it, each worker loads in the background; with the torch
+# backend the weights are mmap'd from model.safetensors (NLP_MMAP_WEIGHTS) and shared
+# through the page cache either way.
+PRELOAD = os.getenv("NLP_PRELOAD", "false").lower() == "true"
+if PRELOAD:
+    warmup.load_now()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print(f"[startup] nlp-engine app imported in {time.perf_counter() - _IMPORT_STARTED:.2f}s")
+    warmup.start()
+    yield
+
+app = FastAPI(lifespan=lifespan)
+
+def _require_model():
+    if not warmup.ready:
+        raise HTTPException(status_code=503, detail=f"sentiment model is {warmup.state}", headers={"Retry-After": "5"})
 
 class SentimentRequest(BaseModel):
     text: str
 
+class BatchSentimentRequest(BaseModel):
+    texts: List[str]
+
+# Fallback when the shared lexicon (backend/lexicon.py + backend/data/lexicon) is not available
 YEMENI_KEYWORDS = ["جُباة", "حَنق", "مشقاص", "خبير", "صاحبي"]
 
-@app.post("/analyze-news")
-async def analyze(request: SentimentRequest):
-    result = analyzer(request.text)[0]
+def _load_lexicon():
+    try:
+        from lexicon import Lexicon
+    except ImportError:
+        # Shared with the backend: ../backend in the repo, /app/backend in the container
+        sys.path.append(os.getenv("BACKEND_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")))
+        try:
+            from lexicon import Lexicon
+        except ImportError as e:
+            print(f"Warning: Lexicon engine unavailable, using built-in keywords: {e}")
+            return None
+    try:
+        return Lexicon.load()
+    except (OSError, ValueError) as e:
+        print(f"Warning: Lexicon not loaded, using built-in keywords: {e}")
+        return None
+
+lexicon = _load_lexicon()
+KEYWORD_CATEGORIES = set(os.getenv("NLP_KEYWORD_CATEGORIES", "dialect").split(","))
+
+def build_report(text: str, result: dict) -> dict:
     sentiment = result['label']
     score = result['score']
     
-    detected_keywords = [k for k in YEMENI_KEYWORDS if k in request.text]
+    if lexicon is not None:
+        matches = lexicon.find(text)
+        detected_keywords = []
+        for m in matches:
+            if m["term"] not in detected_keywords and not KEYWORD_CATEGORIES.isdisjoint(m["categories"]):
+                detected_keywords.append(m["term"])
+    else:
+        matches = []
+        detected_keywords = [k for k in YEMENI_KEYWORDS if k in text]
     alert = "High Alert" if sentiment == "NEGATIVE" and len(detected_keywords) > 0 else "Normal"
     
     return {
         "sentiment": sentiment,
         "confidence": f"{score:.2f}",
         "yemeni_keywords_found": detected_keywords,
+        "lexicon_matches": matches,
         "alert_status": alert
     }
 
+@app.post("/analyze-news")
+async def analyze(request: SentimentRequest):
+    _require_model()
+    try:
+        result = await batcher.submit(request.text)
+    except BatcherOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return build_report(request.text, result)
+
+@app.post("/analyze-news/batch")
+async def analyze_batch(request: BatchSentimentRequest):
+    if len(request.texts) > MAX_BATCH_TEXTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_TEXTS} texts per batch")
+    _require_model()
+    try:
+        results = await batcher.submit_many(request.texts)
+    except BatcherOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return {"results": [build_report(t, r) for t, r in zip(request.texts, results)]}
+
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving, whether or not the model is loaded."""
+    return {"status": "alive"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 only once the model can answer requests."""
+    return JSONResponse(status_code=200 if warmup.ready else 503, content={"ready": warmup.ready, "model": warmup.status()})
+
+@app.get("/metrics")
+async def metrics():
+    return {"batcher": batcher.metrics(), "model": warmup.status(),
+            "lexicon": lexicon.metrics() if lexicon is not None else None}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
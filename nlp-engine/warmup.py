@@ -0,0 +1,87 @@
+import time
+import threading
+import importlib
+from typing import Callable, Dict, Any, Optional
+
+
+class ModelNotReady(Exception):
+    pass
+
+
+class ModelWarmup:
+    """
+    تحميل النموذج في الخلفية (Background Model Warm-up)
+    Runs `loader` on a daemon thread so the HTTP server answers liveness
+    probes immediately. A failed load (missing model, unreachable store) is
+    recorded and retried every `retry_interval` seconds instead of killing
+    the process. `load_now()` loads synchronously, for pre-fork servers that
+    must hold the weights before forking workers.
+    """
+    def __init__(self, name: str, loader: Callable[[], Any], retry_interval: float = 15.0):
+        self.name = name
+        self.loader = loader
+        self.retry_interval = retry_interval
+        self.value: Any = None
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.attempts = 0
+        self.load_seconds: Optional[float] = None
+        self.import_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def timed_import(self, module: str):
+        """Imports a heavy dependency and records how long it took (startup profiling)."""
+        started = time.perf_counter()
+        mod = importlib.import_module(module)
+        self.import_seconds.setdefault(module, round(time.perf_counter() - started, 3))
+        return mod
+
+    def load_now(self) -> bool:
+        with self._lock:
+            if self.ready:
+                return True
+            self.state = "loading"
+            self.attempts += 1
+            started = time.perf_counter()
+            try:
+                self.value = self.loader()
+            except Exception as e:
+                self.state = "failed"
+                self.error = f"{type(e).__name__}: {e}"
+                print(f"[startup] {self.name} load failed (attempt {self.attempts}): {self.error}")
+                return False
+            self.load_seconds = round(time.perf_counter() - started, 3)
+            self.state = "ready"
+            self.error = None
+            imports = ", ".join(f"{m} {s:.2f}s" for m, s in self.import_seconds.items())
+            print(f"[startup] {self.name} ready in {self.load_seconds:.2f}s (imports: {imports or 'cached'})")
+            return True
+
+    def start(self):
+        """Loads in the background, retrying until it succeeds."""
+        if self.ready or (self._thread is not None and self._thread.is_alive()):
+            return
+        def run():
+            while not self.load_now():
+                time.sleep(self.retry_interval)
+        self._thread = threading.Thread(target=run, name=f"warmup-{self.name}", daemon=True)
+        self._thread.start()
+
+    def get(self) -> Any:
+        if not self.ready:
+            raise ModelNotReady(f"{self.name} is {self.state}")
+        return self.value
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "attempts": self.attempts,
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+            "import_seconds": self.import_seconds,
+        }
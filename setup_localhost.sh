@@ -23,6 +23,7 @@ echo "🔵 [2/5] Setting up Python Backend..."
 python3 -m venv venv
 source venv/bin/activate
 pip install -r backend/requirements.txt
+pip install -r nlp-engine/requirements-onnx.txt
 
 # 3. AI Model Setup
 echo "🔵 [3/5] Configuring Constitutional AI (Ollama)..."